@@ -0,0 +1,228 @@
+"""
+Adapt the number of running tasks to measured throughput and CPU use
+
+The threaded scheduler runs as many tasks at once as its pool has threads,
+one per core.  This is not always right:
+
+*   Tasks that call multithreaded BLAS, like ``dot`` or ``tensordot``, start
+    another thread per core each, so we run many more threads than cores.
+*   Tasks that hold the GIL do not run in parallel, extra threads only add
+    contention.
+*   Tasks that wait on disk or network leave cores idle.
+
+With ``Adaptive`` the scheduler measures how many tasks finish per second,
+and how many cores the process keeps busy, in short windows during the
+computation.  After each window it changes the number of tasks that it keeps
+running, up to the size of the pool, and keeps the change if throughput
+improved.  When it can, through the optional ``threadpoolctl`` package, it
+also sets the number of BLAS and OpenMP threads so that tasks times BLAS
+threads matches the number of cores.  Without ``threadpoolctl`` we lower the
+number of tasks instead when we find tasks using more than a core each on a
+busy machine.
+
+>>> adaptive = Adaptive()
+>>> x.dot(x.T).sum().compute(adaptive=adaptive)  # doctest: +SKIP
+>>> print(adaptive.report())  # doctest: +SKIP
+Adaptive concurrency: 2 of 8 workers, 4 BLAS threads, 11 windows
+    time  workers  blas   tasks/s   cores
+   0.100        8     1    151.20    7.95
+   ...
+
+``set_options(adaptive=True)`` adapts every computation.
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import namedtuple
+import multiprocessing
+import os
+from timeit import default_timer
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+
+Window = namedtuple('Window', ['time', 'workers', 'blas', 'throughput',
+                               'cores'])
+
+
+def _cpu_time():
+    """ User and system time of this process, summed over all its threads """
+    t = os.times()
+    return t[0] + t[1]
+
+
+class Adaptive(object):
+    """ Choose how many tasks to run at once from measurements
+
+    Parameters
+    ----------
+
+    maximum: int, optional
+        Most tasks to run at once, by default the number of workers of the
+        scheduler
+    minimum: int, optional
+        Fewest tasks to run at once
+    interval: float, optional
+        Seconds per measurement window
+    tolerance: float, optional
+        Relative change of throughput that we count as a change rather than
+        noise
+    ncores: int, optional
+        Number of cores, by default ``multiprocessing.cpu_count()``
+    blas: bool, optional
+        Whether to set the number of BLAS and OpenMP threads, which needs
+        ``threadpoolctl``
+
+    Examples
+    --------
+
+    Each window reports the tasks finished, seconds passed, CPU seconds and
+    average number of running tasks.  Here throughput falls as we go from
+    four workers to three, so we go back up.
+
+    >>> adaptive = Adaptive(ncores=4, blas=False)
+    >>> adaptive.start(4)
+    4
+    >>> adaptive.record(completed=100, elapsed=1.0, cpu=4.0, running=4)
+    3
+    >>> adaptive.record(completed=60, elapsed=1.0, cpu=3.0, running=3)
+    4
+    """
+    def __init__(self, maximum=None, minimum=1, interval=0.1, tolerance=0.05,
+                 ncores=None, blas=True):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.interval = interval
+        self.tolerance = tolerance
+        self.ncores = ncores or multiprocessing.cpu_count()
+        self.blas = blas and threadpool_limits is not None
+        self.history = []
+        self.limit = None
+        self.blas_threads = None
+        self._limits = None
+
+    def start(self, num_workers):
+        """ Start a computation on ``num_workers`` workers
+
+        Returns the number of tasks to run at first.
+        """
+        self.num_workers = num_workers
+        self.upper = max(self.minimum, min(self.maximum or num_workers,
+                                           num_workers))
+        self.limit = self.upper
+        self.history = []
+        self.direction = -1     # Try fewer tasks first
+        self.previous = None    # (limit, throughput) before the last change
+        self._set_blas()
+        self._begin = self._time = default_timer()
+        self._cpu = _cpu_time()
+        self._completed = 0
+        self._running = 0
+        self._samples = 0
+        return self.limit
+
+    def update(self, completed, running):
+        """ Count finished tasks, returns the number of tasks to run
+
+        Call on every response of the workers with the number of tasks that
+        it finished and the number of tasks still running.
+        """
+        self._completed += completed
+        self._running += running
+        self._samples += 1
+        now = default_timer()
+        elapsed = now - self._time
+        if elapsed < self.interval:
+            return self.limit
+        cpu = _cpu_time()
+        limit = self.record(self._completed, elapsed, cpu - self._cpu,
+                            self._running / self._samples,
+                            now - self._begin)
+        self._time, self._cpu = now, cpu
+        self._completed = self._running = self._samples = 0
+        return limit
+
+    def record(self, completed, elapsed, cpu, running, time=None):
+        """ Decide on the number of tasks to run from one window """
+        throughput = completed / elapsed
+        cores = cpu / elapsed
+        if time is None:
+            time = sum(w.time for w in self.history[-1:]) + elapsed
+        self.history.append(Window(time, self.limit, self.blas_threads,
+                                   throughput, cores))
+        limit = self.limit
+        per_task = cores / running if running else 0
+
+        if (not self.blas and per_task > 1.25 and
+                cores > 0.9 * self.ncores):
+            # Tasks run threads of their own and fill the machine
+            limit = int(self.ncores / per_task)
+            self.direction, self.previous = -1, None
+        elif self.previous is None:
+            self.previous = (limit, throughput)
+            limit += self.direction * self._step()
+        else:
+            last_limit, last_throughput = self.previous
+            if throughput > last_throughput * (1 + self.tolerance):
+                # Better, keep going
+                self.previous = (limit, throughput)
+                limit += self.direction * self._step()
+            elif (throughput < last_throughput * (1 - self.tolerance) or
+                  self.direction > 0):
+                # Worse, or more tasks for nothing: go back and try the other
+                # way next time
+                self.previous = None
+                self.direction = -self.direction
+                limit = last_limit
+            else:
+                # As good with fewer tasks, keep going
+                self.previous = (limit, throughput)
+                limit += self.direction * self._step()
+
+        limit = max(self.minimum, min(self.upper, limit))
+        if limit == self.limit and self.previous is not None:
+            # At a bound, turn around
+            self.previous = None
+            self.direction = -self.direction
+        self.limit = limit
+        self._set_blas()
+        return limit
+
+    def _step(self):
+        return max(1, self.limit // 4)
+
+    def _set_blas(self):
+        if not self.blas:
+            return
+        threads = max(1, self.ncores // self.limit)
+        if threads != self.blas_threads:
+            if self._limits is None:
+                self._limits = threadpool_limits(limits=threads)
+            else:
+                threadpool_limits(limits=threads)
+            self.blas_threads = threads
+
+    def finish(self):
+        """ Restore the BLAS and OpenMP threads of before the computation """
+        if self._limits is not None:
+            self._limits.restore_original_limits()
+            self._limits = None
+        self.blas_threads = None
+
+    def report(self):
+        """ What we chose in the last computation, window by window """
+        if not self.history:
+            return ("Adaptive concurrency: %s workers, no measurements"
+                    % self.limit)
+        lines = ["Adaptive concurrency: %d of %d workers, %s BLAS threads, "
+                 "%d windows" % (self.limit, self.num_workers,
+                                 self.history[-1].blas or 'default',
+                                 len(self.history)),
+                 "    time  workers  blas   tasks/s   cores"]
+        for w in self.history:
+            lines.append("%8.3f %8d %5s %9.2f %7.2f"
+                         % (w.time, w.workers, w.blas or '-', w.throughput,
+                            w.cores))
+        return '\n'.join(lines)
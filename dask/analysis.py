@@ -0,0 +1,179 @@
+"""
+Analyze a graph once and share the analysis between passes
+
+``cull``, ``fuse``, ``inline``, ``order`` and the scheduler all need the
+dependencies of every task.  Each finds them by walking every task with
+``get_dependencies``, so computing one collection walks the whole graph five
+or more times.
+
+A ``GraphAnalysis`` holds the dependencies and dependents of a graph, its
+fan-in and fan-out and its ``dask.order``.  Passes take it as the
+``analysis=`` keyword and call ``update`` with their input graph.  Each pass
+returns a new graph but keeps the task objects that it did not change, so
+``update`` only walks the tasks that are new objects and drops the keys that
+are gone.
+
+>>> from dask.optimize import cull, fuse
+>>> dsk = {'x': 1, 'y': (inc, 'x'), 'z': (inc, 'y'), 'w': (inc, 'x')}
+>>> analysis = GraphAnalysis(dsk)
+>>> dsk2 = cull(dsk, 'z', analysis=analysis)
+>>> dsk3 = fuse(dsk2, analysis=analysis)    # skips the walk of 'x' and 'y'
+>>> sorted(analysis.dependencies)
+['x', 'y', 'z']
+
+``compute`` builds one analysis per computation and passes it through the
+optimizations of the collection to the scheduler.
+"""
+from __future__ import absolute_import, division, print_function
+
+from .core import get_dependencies, add, inc
+
+
+_missing = object()
+
+class GraphAnalysis(object):
+    """ Dependencies, dependents and order of a graph, kept up to date
+
+    Parameters
+    ----------
+
+    dsk: dict, optional
+        Graph to analyze now
+
+    Attributes
+    ----------
+
+    dependencies: dict
+        Keys on which each key depends
+    dependents: dict
+        Keys that depend on each key
+    repeated: set
+        Keys whose task refers to one of its dependencies more than once
+
+    Treat these as read only, ``update`` changes them in place.
+
+    Examples
+    --------
+
+    >>> dsk = {'x': 1, 'y': (inc, 'x'), 'z': (add, 'x', 'y')}
+    >>> analysis = GraphAnalysis(dsk)
+    >>> sorted(analysis.dependents['x'])
+    ['y', 'z']
+    >>> analysis.fan_in['z'], analysis.fan_out['x']
+    (2, 2)
+    >>> analysis.toposort().index('x') < analysis.toposort().index('y')
+    True
+    """
+    def __init__(self, dsk=None):
+        self.tasks = dict()
+        self.dependencies = dict()
+        self.dependents = dict()
+        self.repeated = set()
+        self.walked = 0     # Number of tasks that we walked
+        self._derived = dict()
+        if dsk is not None:
+            self.update(dsk)
+
+    def update(self, dsk):
+        """ Bring the analysis up to date with ``dsk``, returns self
+
+        Only walks the tasks that are not the same objects as before.
+        """
+        tasks = self.tasks
+        get = tasks.get
+        changed = [k for k, v in dsk.items() if get(k, _missing) is not v]
+        if not tasks or any(k not in tasks for k in changed):
+            # New keys may be dependencies of tasks that did not change
+            return self._rebuild(dsk)
+        removed = []
+        if len(dsk) < len(tasks):
+            removed = [k for k in tasks if k not in dsk]
+        if not changed and not removed:
+            return self
+        self._derived.clear()
+        dependencies, dependents = self.dependencies, self.dependents
+        for k in removed:
+            for dep in dependencies.pop(k):
+                if dep in dependents:
+                    dependents[dep].discard(k)
+            for parent in dependents.pop(k):
+                if parent in dependencies:
+                    dependencies[parent].discard(k)
+            del tasks[k]
+            self.repeated.discard(k)
+        for k in changed:
+            for dep in dependencies[k]:
+                if dep in dependents:
+                    dependents[dep].discard(k)
+            deps = self._walk(dsk, k)
+            for dep in deps:
+                dependents[dep].add(k)
+            tasks[k] = dsk[k]
+        return self
+
+    def _walk(self, dsk, key):
+        """ Find the dependencies of a key and note repeated references """
+        self.walked += 1
+        deps = get_dependencies(dsk, key, as_list=True)
+        result = set(deps)
+        if len(result) < len(deps):
+            self.repeated.add(key)
+        else:
+            self.repeated.discard(key)
+        self.dependencies[key] = result
+        return result
+
+    def _rebuild(self, dsk):
+        self._derived.clear()
+        self.tasks = dict(dsk)
+        self.dependencies = dict()
+        self.repeated = set()
+        for k in dsk:
+            self._walk(dsk, k)
+        self.dependents = dict((k, set()) for k in dsk)
+        for k, deps in self.dependencies.items():
+            for dep in deps:
+                self.dependents[dep].add(k)
+        return self
+
+    def _cached(self, name, compute):
+        if name not in self._derived:
+            self._derived[name] = compute()
+        return self._derived[name]
+
+    @property
+    def fan_in(self):
+        """ Number of dependencies of each key """
+        return self._cached('fan_in', lambda: dict(
+            (k, len(v)) for k, v in self.dependencies.items()))
+
+    @property
+    def fan_out(self):
+        """ Number of dependents of each key """
+        return self._cached('fan_out', lambda: dict(
+            (k, len(v)) for k, v in self.dependents.items()))
+
+    def order(self):
+        """ ``dask.order.order`` of the graph """
+        from .order import order
+        return self._cached('order', lambda: order(self.tasks, analysis=self))
+
+    def toposort(self):
+        """ Keys with every key after its dependencies """
+        return self._cached('toposort', self._toposort)
+
+    def _toposort(self):
+        remaining = self.fan_in.copy()
+        ready = [k for k, n in remaining.items() if not n]
+        result = []
+        while ready:
+            key = ready.pop()
+            result.append(key)
+            for parent in self.dependents[key]:
+                remaining[parent] -= 1
+                if not remaining[parent]:
+                    ready.append(parent)
+        if len(result) < len(remaining):
+            raise RuntimeError("Cycle detected in dask graph")
+        return result
+
@@ -27,6 +27,7 @@ from ..utils import (deepmap, ignoring, repr_long_list, concrete, is_integer,
         IndexCallable)
 from ..compatibility import unicode, long, getargspec, zip_longest
 from .. import threaded, core
+from ..layers import Layer, LayeredGraph, Deferred
 
 
 def getarray(a, b, lock=None):
@@ -75,6 +76,23 @@ def slices_from_chunks(chunks):
                 for start, shape in zip(starts, shapes)]
 
 
+def chunk_nbytes(x):
+    """ Bytes of each block of an array, by key
+
+    Pass these as ``sizes`` to compute so that ``dask.order`` orders the
+    graph for low peak memory, e.g. ``y.compute(sizes=chunk_nbytes(x))``
+    where ``y`` reduces the large blocks of ``x``.
+
+    >>> x = from_array(np.ones((4, 4)), chunks=(2, 4), name='x')
+    >>> sorted(chunk_nbytes(x).items())
+    [(('x', 0, 0), 64), (('x', 1, 0), 64)]
+    """
+    itemsize = x.dtype.itemsize
+    blocks = product(*[range(n) for n in x.numblocks])
+    return dict(((x.name,) + idx, int(np.prod(shape)) * itemsize)
+                for idx, shape in zip(blocks, product(*x.chunks)))
+
+
 def getem(arr, chunks, shape=None):
     """ Dask getting various chunks from an array-like
 
@@ -320,40 +338,95 @@ def top(func, output, out_indices, *arrind_pairs, **kwargs):
      ('z', 1, 0): (add, ('x', 0, 0), ('y', 1, 0)),
      ('z', 1, 1): (add, ('x', 0, 1), ('y', 1, 1))}
     """
-    numblocks = kwargs['numblocks']
-    argpairs = list(partition(2, arrind_pairs))
+    return Blockwise(func, output, out_indices, *arrind_pairs, **kwargs)._build()
 
-    assert set(numblocks) == set(pluck(0, argpairs))
 
-    all_indices = pipe(argpairs, pluck(1), concat, set)
-    dummy_indices = all_indices - set(out_indices)
+class Blockwise(Layer):
+    """ The tasks of ``top`` as a symbolic layer
 
-    # Dictionary mapping {i: 3, j: 4, ...} for i, j, ... the dimensions
-    dims = broadcast_dimensions(argpairs, numblocks)
+    Takes the arguments of ``top``.  We build the task of a single key when
+    it is asked for, and all tasks when the layer is iterated.  We keep the
+    tasks that we build, so that every lookup of a key gives the same task
+    object, as ``GraphCache`` and ``GraphAnalysis`` expect.
 
-    # (0, 0), (0, 1), (0, 2), (1, 0), ...
-    keytups = list(product(*[range(dims[i]) for i in out_indices]))
-    # {i: 0, j: 0}, {i: 0, j: 1}, ...
-    keydicts = [dict(zip(out_indices, tup)) for tup in keytups]
-
-    # {j: [1, 2, 3], ...}  For j a dummy index of dimension 3
-    dummies = dict((i, list(range(dims[i]))) for i in dummy_indices)
-
-    # Create argument lists
-    valtups = []
-    for kd in keydicts:
+    >>> layer = Blockwise(operator.neg, 'z', 'i', 'x', 'i',
+    ...                   numblocks={'x': (1000,)})
+    >>> len(layer), ('z', 999) in layer, ('z', 1000) in layer
+    (1000, True, False)
+    >>> layer[('z', 5)]
+    (<built-in function neg>, ('x', 5))
+    """
+    def __init__(self, func, output, out_indices, *arrind_pairs, **kwargs):
+        numblocks = kwargs['numblocks']
+        argpairs = list(partition(2, arrind_pairs))
+
+        assert set(numblocks) == set(pluck(0, argpairs))
+
+        all_indices = pipe(argpairs, pluck(1), concat, set)
+        dummy_indices = all_indices - set(out_indices)
+
+        # Dictionary mapping {i: 3, j: 4, ...} for i, j, ... the dimensions
+        dims = broadcast_dimensions(argpairs, numblocks)
+
+        self.func = func
+        self.output = output
+        self.out_indices = tuple(out_indices)
+        self.argpairs = argpairs
+        self.numblocks = numblocks
+        self.shape = tuple(dims[i] for i in out_indices)
+        # {j: [1, 2, 3], ...}  For j a dummy index of dimension 3
+        self.dummies = dict((i, list(range(dims[i]))) for i in dummy_indices)
+        self._built = dict()
+
+    def _task(self, idx):
+        # {i: 0, j: 0}
+        kd = dict(zip(self.out_indices, idx))
         args = []
-        for arg, ind in argpairs:
-            tups = lol_tuples((arg,), ind, kd, dummies)
-            tups2 = zero_broadcast_dimensions(tups, numblocks[arg])
-            args.append(tups2)
-        valtups.append(tuple(args))
+        for arg, ind in self.argpairs:
+            tups = lol_tuples((arg,), ind, kd, self.dummies)
+            args.append(zero_broadcast_dimensions(tups, self.numblocks[arg]))
+        return (self.func,) + tuple(args)
+
+    def _indices(self):
+        # (0, 0), (0, 1), (0, 2), (1, 0), ...
+        return product(*[range(n) for n in self.shape])
+
+    def _build(self):
+        built = self._built
+        tasks = dict()
+        for idx in self._indices():
+            key = (self.output,) + idx
+            tasks[key] = built[key] if key in built else self._task(idx)
+        return tasks
+
+    def __contains__(self, key):
+        if self._tasks is not None:
+            return key in self._tasks
+        if (type(key) is not tuple or len(key) != len(self.shape) + 1 or
+                key[0] != self.output):
+            return False
+        for i, n in zip(key[1:], self.shape):
+            if not (is_integer(i) and 0 <= i < n):
+                return False
+        return True
+
+    def __getitem__(self, key):
+        if self._tasks is not None:
+            return self._tasks[key]
+        if key in self._built:
+            return self._built[key]
+        if key not in self:
+            raise KeyError(key)
+        task = self._built[key] = self._task(key[1:])
+        return task
 
-    # Add heads to tuples
-    keys = [(output,) + kt for kt in keytups]
-    vals = [(func,) + vt for vt in valtups]
+    def __len__(self):
+        return int(np.prod(self.shape))
 
-    return dict(zip(keys, vals))
+    def __getstate__(self):
+        state = Layer.__getstate__(self)
+        state['_built'] = dict()
+        return state
 
 
 def _concatenate2(arrays, axes=[]):
@@ -523,7 +596,7 @@ def map_blocks(func, *args, **kwargs):
     argindsstr = list(concat([(a.name, ind) for a, ind in arginds]))
     out_ind = tuple(range(max(a.ndim for a in arrs)))[::-1]
 
-    dsk = top(func, name, out_ind, *argindsstr, numblocks=numblocks)
+    dsk = Blockwise(func, name, out_ind, *argindsstr, numblocks=numblocks)
 
     # If func has block_id as an argument then swap out func
     # for func with block_id partialed in
@@ -538,8 +611,8 @@ def map_blocks(func, *args, **kwargs):
         except AttributeError:
             pass
         if 'block_id' in args:
-            for k in dsk.keys():
-                dsk[k] = (partial(func, block_id=k[1:]),) + dsk[k][1:]
+            dsk = dict((k, (partial(func, block_id=k[1:]),) + v[1:])
+                       for k, v in dsk.items())
 
     numblocks = list(arrs[0].numblocks)
 
@@ -566,7 +639,8 @@ def map_blocks(func, *args, **kwargs):
     else:
         chunks = broadcast_chunks(*[a.chunks for a in arrs])
 
-    return Array(merge(dsk, *[a.dask for a in arrs]), name, chunks, dtype)
+    return Array(LayeredGraph.from_collections(name, dsk, arrs), name, chunks,
+                 dtype)
 
 
 def broadcast_chunks(*chunkss):
@@ -654,7 +728,8 @@ def topk(k, x):
                         slice(-1, -k - 1, -1))
     chunks = ((k,),)
 
-    return Array(merge(dsk, x.dask), name2, chunks, dtype=x.dtype)
+    return Array(LayeredGraph.from_collections(name2, dsk, [x]), name2, chunks,
+                 dtype=x.dtype)
 
 
 def store(sources, targets, **kwargs):
@@ -978,7 +1053,8 @@ class Array(Base):
 
         dsk, chunks = slice_array(out, self.name, self.chunks, index)
 
-        return Array(merge(self.dask, dsk), out, chunks, dtype=self._dtype)
+        return Array(LayeredGraph.from_collections(out, dsk, [self]), out,
+                     chunks, dtype=self._dtype)
 
     def _vindex(self, key):
         if (not isinstance(key, tuple) or
@@ -1625,11 +1701,11 @@ def atop(func, out_ind, *args, **kwargs):
     if not out:
         out = 'atop-' + tokenize(func, out_ind, argindsstr, dtype)
 
-    dsk = top(func, out, out_ind, *argindsstr, numblocks=numblocks)
-    dsks = [a.dask for a, _ in arginds]
+    layer = Blockwise(func, out, out_ind, *argindsstr, numblocks=numblocks)
+    dsk = LayeredGraph.from_collections(out, layer, [a for a, _ in arginds])
     chunks = tuple(chunkss[i] for i in out_ind)
 
-    return Array(merge(dsk, *dsks), out, chunks, dtype=dtype)
+    return Array(dsk, out, chunks, dtype=dtype)
 
 
 def unpack_singleton(x):
@@ -1708,7 +1784,7 @@ def stack(seq, axis=0):
                 for inp in inputs]
 
     dsk = dict(zip(keys, values))
-    dsk2 = merge(dsk, *[a.dask for a in seq])
+    dsk2 = LayeredGraph.from_collections(name, dsk, seq)
 
     if all(a._dtype is not None for a in seq):
         dt = reduce(np.promote_types, [a._dtype for a in seq])
@@ -1783,7 +1859,7 @@ def concatenate(seq, axis=0):
                 for key in keys]
 
     dsk = dict(zip(keys, values))
-    dsk2 = merge(dsk, *[a.dask for a in seq])
+    dsk2 = LayeredGraph.from_collections(name, dsk, seq)
 
     if all(a._dtype is not None for a in seq):
         dt = reduce(np.promote_types, [a._dtype for a in seq])
@@ -2333,7 +2409,8 @@ def coarsen(reduction, x, axes, trim_excess=False):
         dt = reduction(np.empty((1,) * x.ndim, dtype=x.dtype)).dtype
     else:
         dt = None
-    return Array(merge(x.dask, dsk), name, chunks, dtype=dt)
+    return Array(LayeredGraph.from_collections(name, dsk, [x]), name, chunks,
+                 dtype=dt)
 
 
 def split_at_breaks(array, breaks, axis=0):
@@ -2420,7 +2497,8 @@ def broadcast_to(x, shape):
                  shape[:ndim_new] +
                  tuple(bd[i] for i, bd in zip(key[1:], chunks[ndim_new:]))))
                for key in core.flatten(x._keys()))
-    return Array(merge(dsk, x.dask), name, chunks, dtype=x.dtype)
+    return Array(LayeredGraph.from_collections(name, dsk, [x]), name, chunks,
+                 dtype=x.dtype)
 
 
 @wraps(np.ravel)
@@ -2436,7 +2514,8 @@ def ravel(array):
         chunks = (tuple(c * trailing_size for c in array.chunks[0]),)
         dsk = dict(((name, key[1]), (np.ravel, key))
                    for key in core.flatten(array._keys()))
-        return Array(merge(dsk, array.dask), name, chunks, dtype=array.dtype)
+        return Array(LayeredGraph.from_collections(name, dsk, [array]), name,
+                     chunks, dtype=array.dtype)
     else:
         # we need to do an expensive shuffling of the data
         return concatenate([ravel(a) for a in array])
@@ -2458,7 +2537,8 @@ def unravel(array, shape):
             dsk = dict(((name, key[1]) + (0,) * (len(shape) - 1),
                         (np.reshape, key, (c,) + shape[1:]))
                        for key, c in zip(array._keys(), chunks[0]))
-            return Array(merge(dsk, array.dask), name, chunks, dtype=array.dtype)
+            return Array(LayeredGraph.from_collections(name, dsk, [array]),
+                         name, chunks, dtype=array.dtype)
         else:
             # we need to shuffle
             # nb. this doesn't always work, stack requires aligned chunks
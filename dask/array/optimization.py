@@ -6,8 +6,10 @@ import numpy as np
 from toolz import valmap, partial
 
 from .core import getarray
+from ..context import _globals
 from ..core import flatten
-from ..optimize import cull, fuse, dealias, inline_functions
+from ..optimize import (cull, fuse, dealias, inline_functions,
+                        fuse_subgraphs)
 from ..rewrite import RuleSet, RewriteRule
 
 
@@ -17,14 +19,24 @@ def optimize(dsk, keys, **kwargs):
     1.  Cull tasks not necessary to evaluate keys
     2.  Remove full slicing, e.g. x[:]
     3.  Inline fast functions like getitem and np.transpose
+    4.  With ``fuse_subgraphs=True``, given here or to ``set_options``, fuse
+        small subgraphs, never across ``fuse_boundaries`` or tasks that use
+        ``resources``
     """
     fast_functions=kwargs.get('fast_functions',
                              set([getarray, getitem, np.transpose]))
-    dsk2 = cull(dsk, list(flatten(keys)))
-    dsk3 = remove_full_slices(dsk2)
-    dsk4 = fuse(dsk3)
+    analysis = kwargs.get('analysis')
+    dsk2 = cull(dsk, list(flatten(keys)), analysis=analysis)
+    dsk3 = remove_full_slices(dsk2, keys)
+    dsk4 = fuse(dsk3, keys, analysis=analysis)
     dsk5 = valmap(rewrite_rules.rewrite, dsk4)
-    dsk6 = inline_functions(dsk5, fast_functions=fast_functions)
+    dsk6 = inline_functions(dsk5, fast_functions=fast_functions,
+                            output=keys, analysis=analysis)
+    if kwargs.get('fuse_subgraphs', _globals.get('fuse_subgraphs')):
+        dsk6 = fuse_subgraphs(dsk6, keys,
+                              boundaries=kwargs.get('fuse_boundaries'),
+                              resources=kwargs.get('resources'),
+                              analysis=analysis)
     return dsk6
 
 
@@ -45,8 +57,8 @@ def is_full_slice(task):
              all(ind == slice(None, None, None) for ind in task[2])))
 
 
-def remove_full_slices(dsk):
-    """ Remove full slices from dask
+def remove_full_slices(dsk, keys=None):
+    """ Remove full slices from dask, keeping the keys in ``keys``
 
     See Also:
         dask.optimize.inline
@@ -67,7 +79,7 @@ def remove_full_slices(dsk):
     full_slice_keys = set(k for k, task in dsk.items() if is_full_slice(task))
     dsk2 = dict((k, task[1] if k in full_slice_keys else task)
                  for k, task in dsk.items())
-    dsk3 = dealias(dsk2)
+    dsk3 = dealias(dsk2, keys)
     return dsk3
 
 
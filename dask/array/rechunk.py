@@ -11,9 +11,10 @@ from itertools import product, chain
 from operator import getitem, add
 
 import numpy as np
-from toolz import merge, accumulate
+from toolz import accumulate
 
 from ..base import tokenize
+from ..layers import Deferred, LayeredGraph
 from .core import concatenate3, Array, normalize_chunks
 
 
@@ -204,29 +205,36 @@ def rechunk(x, chunks):
     if not len(chunks) == x.ndim or tuple(map(sum, chunks)) != x.shape:
         raise ValueError("Provided chunks are not consistent with shape")
 
-    crossed = intersect_chunks(x.chunks, chunks)
-    x2 = dict()
     temp_name = 'rechunk-' + tokenize(x, chunks)
+    layer = Deferred(_rechunk_tasks, x.name, x.chunks, chunks, temp_name)
+    x2 = LayeredGraph.from_collections(temp_name, layer, [x])
+    return Array(x2, temp_name, chunks, dtype=x.dtype)
+
+
+def _rechunk_tasks(name, old_chunks, chunks, temp_name):
+    """ Tasks of the blocks of ``rechunk`` """
+    ndim = len(chunks)
+    crossed = intersect_chunks(old_chunks, chunks)
+    x2 = dict()
     new_index = tuple(product(*(tuple(range(len(n))) for n in chunks)))
     for flat_idx, cross1 in enumerate(crossed):
         new_idx = new_index[flat_idx]
         key = (temp_name,) + new_idx
         cr2 = iter(cross1)
         old_blocks = tuple(tuple(ind  for ind,_ in cr) for cr in cross1)
-        subdims = tuple(len(set(ss[i] for ss in old_blocks)) for i in range(x.ndim))
+        subdims = tuple(len(set(ss[i] for ss in old_blocks)) for i in range(ndim))
         rec_cat_arg =np.empty(subdims).tolist()
         inds_in_block = product(*(range(s) for s in subdims))
         for old_block in old_blocks:
             ind_slics = next(cr2)
-            old_inds = tuple(tuple(s[0] for s in ind_slics) for i in range(x.ndim))
+            old_inds = tuple(tuple(s[0] for s in ind_slics) for i in range(ndim))
             # list of nd slices
-            slic = tuple(tuple(s[1] for s in ind_slics)  for i in range(x.ndim))
+            slic = tuple(tuple(s[1] for s in ind_slics)  for i in range(ndim))
             ind_in_blk = next(inds_in_block)
             temp = rec_cat_arg
-            for i in range(x.ndim -1):
+            for i in range(ndim -1):
                 temp = getitem(temp, ind_in_blk[i])
             for ind, slc in zip(old_inds, slic):
-                temp[ind_in_blk[-1]] = (getitem, (x.name,) + ind, slc)
+                temp[ind_in_blk[-1]] = (getitem, (name,) + ind, slc)
         x2[key] = (concatenate3, rec_cat_arg)
-    x2 = merge(x.dask, x2)
-    return Array(x2, temp_name, chunks, dtype=x.dtype)
+    return x2
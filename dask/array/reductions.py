@@ -5,7 +5,7 @@ from itertools import product
 from math import factorial, log, ceil
 
 import numpy as np
-from toolz import compose, partition_all, merge, get
+from toolz import compose, partition_all, get
 
 from . import chunk
 from .core import _concatenate2, Array, atop, sqrt, lol_tuples
@@ -13,6 +13,7 @@ from .numpy_compat import divide
 from ..compatibility import getargspec, builtins
 from ..base import tokenize
 from ..context import _globals
+from ..layers import Deferred, LayeredGraph
 from ..utils import ignoring
 
 
@@ -92,13 +93,20 @@ def partial_reduce(func, x, split_every, keepdims=False, dtype=None, name=None):
         getter = lambda k: get(out_axis, k)
         keys = map(getter, keys)
         out_chunks = list(getter(out_chunks))
+    layer = Deferred(_partial_reduce_tasks, func, name, x.name, x.ndim,
+                     list(keys), parts)
+    return Array(LayeredGraph.from_collections(name, layer, [x]), name,
+                 out_chunks, dtype=dtype)
+
+
+def _partial_reduce_tasks(func, name, input_name, ndim, keys, parts):
     dsk = {}
     for k, p in zip(keys, product(*parts)):
         decided = dict((i, j[0]) for (i, j) in enumerate(p) if len(j) == 1)
         dummy = dict(i for i in enumerate(p) if i[0] not in decided)
-        g = lol_tuples((x.name,), range(x.ndim), decided, dummy)
+        g = lol_tuples((input_name,), range(ndim), decided, dummy)
         dsk[(name,) + k] = (func, g)
-    return Array(merge(dsk, x.dask), name, out_chunks, dtype=dtype)
+    return dsk
 
 
 @wraps(chunk.sum)
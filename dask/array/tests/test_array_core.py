@@ -1213,6 +1213,43 @@ def test_nbytes():
     assert x.nbytes == np.array(x).nbytes
 
 
+def test_chunk_nbytes():
+    x = da.ones((10, 2), chunks=(3, 1), dtype='i4')
+    sizes = chunk_nbytes(x)
+    assert set(sizes) == set(core.flatten(x._keys()))
+    assert sizes[(x.name, 0, 0)] == 12
+    assert sizes[(x.name, 3, 1)] == 4
+    assert sum(sizes.values()) == x.nbytes
+
+
+def test_graphs_share_layers():
+    x = da.ones((20, 4), chunks=(2, 2))
+    y = (x + 1) * 2
+    z = y.rechunk((5, 4)).sum(axis=0)
+    assert isinstance(z.dask, LayeredGraph)
+    assert isinstance(y.dask.layers[y.name], Blockwise)
+    assert z.dask.layers[x.name] is x.dask
+    assert len(y.dask) == 3 * len(x.dask)
+    assert eq(z, ((np.ones((20, 4)) + 1) * 2).sum(axis=0))
+    assert eq(y[:2, :2], np.full((2, 2), 4.0))
+
+
+def test_graph_cache_hits_on_recompute():
+    from dask.graphcache import GraphCache
+    x = da.ones((20, 4), chunks=(2, 2))
+    y = (x + 1) * 2
+    layer = y.dask.layers[y.name]
+    assert layer[(y.name, 0, 0)] is layer[(y.name, 0, 0)]
+
+    s = y.sum()
+    gc = GraphCache()
+    with dask.set_options(graph_cache=gc):
+        assert s.compute(get=get_sync) == 320
+        assert gc.info().hits == 0
+        assert s.compute(get=get_sync) == 320
+    assert gc.info().hits > 0
+
+
 def test_Array_normalizes_dtype():
     x = da.ones((3,), chunks=(1,), dtype=int)
     assert isinstance(x.dtype, np.dtype)
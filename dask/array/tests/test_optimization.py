@@ -1,6 +1,9 @@
+from operator import add, mul
+
 import pytest
 pytest.importorskip('numpy')
 
+import dask
 from dask.array.optimization import (getitem, rewrite_rules, optimize,
         remove_full_slices, fuse_slice)
 from dask.utils import raises
@@ -101,3 +104,21 @@ def test_hard_fuse_slice_cases():
     term = (getarray, (getarray, 'x', (None, slice(None, None))),
                      (slice(None, None), 5))
     assert rewrite_rules.rewrite(term) == (getarray, 'x', (None, 5))
+
+
+def test_optimize_fuse_subgraphs_options():
+    dsk = {'x': 1, 'b': (add, 'x', 1), ('c', 0): (mul, 'x', 2),
+           'd': (add, 'b', ('c', 0))}
+    assert 'b' in optimize(dsk, ['d'])
+    assert sorted(optimize(dsk, ['d'], fuse_subgraphs=True)) == ['d', 'x']
+    assert 'b' in optimize(dsk, ['d'], fuse_subgraphs=True,
+                           fuse_boundaries=['b'])
+    assert 'b' in optimize(dsk, ['d'], fuse_subgraphs=True,
+                           resources={'b': {'io': 1}})
+
+    with dask.set_options(fuse_subgraphs=True, fuse_boundaries=['c']):
+        assert sorted(optimize(dsk, ['d']), key=str) == [('c', 0), 'd', 'x']
+        assert 'b' in optimize(dsk, ['d'], fuse_boundaries=[add])
+        assert 'b' in optimize(dsk, ['d'], fuse_subgraphs=False)
+    with dask.set_options(fuse_subgraphs=True, resources={'b': {'io': 1}}):
+        assert 'b' in optimize(dsk, ['d'])
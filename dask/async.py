@@ -114,15 +114,24 @@ See the function ``inline_functions`` for more information.
 """
 from __future__ import absolute_import, division, print_function
 
+from collections import deque, namedtuple
+from functools import partial
+import heapq
+from itertools import count
 import sys
+import threading
 import traceback
 from operator import add
+from timeit import default_timer
 from .core import (istask, flatten, reverse_dict, get_dependencies, ishashable,
         _deps)
 from .context import _globals
+from .graphcache import current_graph_cache
 from .order import order
 from .callbacks import unpack_callbacks
-from .optimize import cull
+from .optimize import cull, precompile as precompile_graph
+from .compatibility import Empty
+from .utils import key_split
 
 def inc(x):
     return x + 1
@@ -131,9 +140,13 @@ def inc(x):
 DEBUG = False
 
 
-def start_state_from_dask(dsk, cache=None, sortkey=None):
+def start_state_from_dask(dsk, cache=None, sortkey=None, dependencies=None,
+                          dependents=None):
     """ Start state from a dask
 
+    Pass ``dependencies`` and ``dependents`` as found by ``analyze`` to skip
+    finding them again.
+
     Examples
     --------
 
@@ -170,14 +183,15 @@ def start_state_from_dask(dsk, cache=None, sortkey=None):
             cache[k] = v
             data_keys.add(k)
 
-    dsk2 = dsk.copy()
-    dsk2.update(cache)
-
-    dependencies = dict((k, get_dependencies(dsk2, k)) for k in dsk)
+    if dependencies is None:
+        dsk2 = dsk.copy()
+        dsk2.update(cache)
+        dependencies = dict((k, get_dependencies(dsk2, k)) for k in dsk)
     waiting = dict((k, v.copy()) for k, v in dependencies.items()
                                  if k not in data_keys)
 
-    dependents = reverse_dict(dependencies)
+    if dependents is None:
+        dependents = reverse_dict(dependencies)
     for a in cache:
         for b in dependents.get(a, ()):
             waiting[b].remove(a)
@@ -200,6 +214,160 @@ def start_state_from_dask(dsk, cache=None, sortkey=None):
     return state
 
 
+def analyze(dsk, keys):
+    """ Cull a graph, order it and find its dependencies and dependents
+
+    Returns the culled keys, the ``dask.order`` of each and the dependencies
+    and dependents of each, the part of the scheduler start state that only
+    depends on the graph.  ``get_async`` keeps them in a ``GraphCache``.
+
+    >>> dsk = {'x': 1, 'y': (inc, 'x'), 'z': (inc, 'x')}
+    >>> keys, keyorder, dependencies, dependents = analyze(dsk, ['y'])
+    >>> sorted(keys)
+    ['x', 'y']
+    >>> sorted(dependents['x'])
+    ['y']
+    """
+    dsk = cull(dsk, list(keys))
+    dependencies = dict((k, get_dependencies(dsk, k)) for k in dsk)
+    return list(dsk), order(dsk), dependencies, reverse_dict(dependencies)
+
+
+class ReadyHeap(object):
+    """ Ready tasks in a heap, lowest priority value first
+
+    A drop-in replacement for the ``ready`` stack of the scheduler state.  Like
+    the stack we ``pop`` the next task to run from the end and ``ready[-1]``
+    is the next task, but the choice is global over all ready tasks rather
+    than last-in-first-out.  ``update`` recomputes the priority of a task.
+
+    >>> priority = {'w': 3, 'x': 2, 'y': 0, 'z': 1}
+    >>> ready = ReadyHeap(['x', 'y', 'z'], priority=priority.get)
+    >>> ready.append('w')
+    >>> ready.pop()
+    'y'
+    >>> ready[-1]
+    'z'
+    >>> len(ready)
+    3
+    """
+    def __init__(self, keys=(), priority=None):
+        self.priority = priority
+        self.counter = count()
+        self.entries = dict()
+        self.heap = []
+        self.extend(keys)
+
+    def _entry(self, key):
+        entry = (self.priority(key), next(self.counter), key)
+        self.entries[key] = entry
+        return entry
+
+    def append(self, key):
+        heapq.heappush(self.heap, self._entry(key))
+
+    def extend(self, keys):
+        if not self.entries:
+            self.heap = [self._entry(key) for key in keys]
+            heapq.heapify(self.heap)
+        else:
+            for key in keys:
+                self.append(key)
+
+    def update(self, key):
+        """ Recompute the priority of a ready task """
+        self.append(key)
+
+    def _clean(self):
+        # Discard outdated entries of removed or updated keys
+        heap, entries = self.heap, self.entries
+        while heap and entries.get(heap[0][2]) is not heap[0]:
+            heapq.heappop(heap)
+
+    def pop(self):
+        self._clean()
+        key = heapq.heappop(self.heap)[2]
+        del self.entries[key]
+        return key
+
+    def remove(self, key):
+        del self.entries[key]
+
+    def __getitem__(self, i):
+        if i != -1:
+            raise IndexError("Only the next task, ready[-1], is accessible")
+        self._clean()
+        return self.heap[0][2]
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(sorted(self.entries, key=self.entries.get, reverse=True))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return 'ReadyHeap(%s)' % list(self)
+
+
+def releases(key, state):
+    """ Number of dependencies of key not needed by any other waiting task
+
+    Running this task allows us to release these from memory.
+
+    >>> dsk = {'x': 1, 'y': (inc, 'x'), 'z': (add, 'x', 'y')}
+    >>> state = start_state_from_dask(dsk)
+    >>> releases('y', state)
+    0
+    """
+    waiting_data = state['waiting_data']
+    return sum(1 for dep in state['dependencies'][key]
+                 if len(waiting_data.get(dep, ())) == 1)
+
+
+def ready_queue(priority, state, keyorder):
+    """ The ready tasks of state held as the ``priority`` policy needs
+
+    See the ``priority`` keyword of ``get_async``.
+
+    >>> dsk = {'x': 1, 'y': 2, 'a': (inc, 'x'), 'b': (inc, 'y')}
+    >>> state = start_state_from_dask(dsk)
+    >>> ready_queue('order', state, {'a': 1, 'b': 0}).pop()
+    'b'
+    >>> ready_queue(lambda k, state: k, state, {}).pop()
+    'a'
+    """
+    if priority is None:
+        return state['ready']
+    if priority == 'order':
+        return ReadyHeap(state['ready'], keyorder.get)
+    if priority == 'memory':
+        score = lambda k: (-releases(k, state), keyorder[k])
+        return ReadyHeap(state['ready'], score)
+    if callable(priority):
+        return ReadyHeap(state['ready'], lambda k: priority(k, state))
+    raise ValueError("priority must be one of None, 'order', 'memory' or a "
+                     "callable, got %r" % (priority,))
+
+
+def reprioritize(key, state):
+    """ Raise the priority of tasks that now release dependencies of key """
+    ready, waiting_data = state['ready'], state['waiting_data']
+    for dep in state['dependencies'][key]:
+        s = waiting_data.get(dep)
+        if s and len(s) == 1:
+            k, = s
+            if k in ready:
+                ready.update(k)
+
+
 '''
 Running tasks
 -------------
@@ -252,14 +420,20 @@ def _execute_task(arg, cache, dsk=None):
         return arg
 
 
-def execute_task(key, task, data, queue, get_id, raise_on_exception=False):
+def execute_task(key, task, data, queue, get_id, raise_on_exception=False,
+                 cancel=None):
     """
     Compute task and handle all administration
 
+    We skip the task if the ``CancelToken`` cancel is cancelled by the time
+    that a worker gets to it.
+
     See Also
     --------
     _execute_task - actually execute task
     """
+    if cancel is not None and cancel.cancelled:
+        return
     try:
         result = _execute_task(task, data)
         id = get_id()
@@ -280,6 +454,56 @@ def execute_task(key, task, data, queue, get_id, raise_on_exception=False):
         queue.put((key, e, tb, None))
 
 
+BatchResult = namedtuple('BatchResult', ['results', 'duration', 'worker_id'])
+
+
+def execute_batch(batch, queue, get_id, raise_on_exception=False,
+                  cancel=None):
+    """
+    Compute a batch of tasks and send all of their results in one message
+
+    ``batch`` is a list of ``(key, task, data)`` triples run in order.  A task
+    may depend on the results of tasks earlier in the same batch.  We stop at
+    the first failing task.
+
+    The message put on the queue is a ``BatchResult`` holding a list of
+    ``(key, result, traceback)`` triples, the time spent computing and the
+    worker id.
+
+    See Also
+    --------
+    execute_task - compute a single task
+    """
+    if cancel is not None and cancel.cancelled:
+        return
+    results = []
+    local = dict()
+    start = default_timer()
+    for key, task, data in batch:
+        try:
+            if local:
+                data.update(local)
+            result = _execute_task(task, data)
+            local[key] = result
+            results.append((key, result, None))
+        except Exception as e:
+            if raise_on_exception:
+                raise
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            tb = ''.join(traceback.format_tb(exc_traceback))
+            results.append((key, e, tb))
+            break
+    duration = default_timer() - start
+    try:
+        queue.put(BatchResult(results, duration, get_id()))
+    except Exception as e:
+        if raise_on_exception:
+            raise
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        tb = ''.join(traceback.format_tb(exc_traceback))
+        queue.put((batch[0][0], e, tb, None))
+
+
 def release_data(key, state, delete=True):
     """ Remove data from temporary storage
 
@@ -303,7 +527,10 @@ def finish_task(dsk, key, state, results, sortkey, delete=True,
 
     Mutates.  This should run atomically (with a lock).
     """
-    for dep in sorted(state['dependents'][key], key=sortkey, reverse=True):
+    dependents = state['dependents'][key]
+    if isinstance(state['ready'], list):
+        dependents = sorted(dependents, key=sortkey, reverse=True)
+    for dep in dependents:
         s = state['waiting'][dep]
         s.remove(key)
         if not s:
@@ -364,6 +591,166 @@ We currently select tasks that have recently been made ready.  We hope that
 this first-in-first-out policy reduces memory footprint
 '''
 
+'''
+Batching
+--------
+
+Submitting a task to a pool and receiving its result costs roughly the same
+regardless of the size of the task.  For very small tasks this overhead
+dominates.  In batching mode we send several ready tasks to a worker at once,
+along with short chains of tasks that will become ready as soon as those tasks
+finish.  We choose the number of tasks per batch so that each batch takes
+roughly ``batch_duration`` seconds, based on the measured duration of previous
+tasks, while leaving enough work to keep every worker busy.
+'''
+
+def batch_size(duration, batch_duration, nready, nidle, maxsize=1000):
+    """ Number of ready tasks to send in the next batch
+
+    Parameters
+    ----------
+
+    duration: float or None
+        Average measured duration of a task in seconds (None if unknown)
+    batch_duration: float
+        Desired duration of a batch in seconds
+    nready: int
+        Number of ready tasks
+    nidle: int
+        Number of idle workers
+
+    Examples
+    --------
+
+    >>> batch_size(None, 0.01, 100, 4)  # no measurements yet
+    1
+    >>> batch_size(0.001, 0.01, 100, 4)
+    10
+    >>> batch_size(0.0001, 0.01, 100, 4)  # share ready tasks among workers
+    25
+    """
+    if not duration:
+        return 1
+    n = min(int(batch_duration / duration), maxsize)
+    share = -(-nready // max(nidle, 1))  # ceiling division
+    return max(1, min(n, share))
+
+
+def batch_chain(key, state, size, claimed):
+    """ Dependents that become runnable after ``key`` alone finishes
+
+    Follows the chain of single dependents of ``key`` whose only outstanding
+    dependency is the previous task in the chain, up to ``size`` tasks.
+
+    Examples
+    --------
+
+    >>> dsk = {'a': 1, 'b': (inc, 'a'), 'c': (inc, 'b'), 'd': (add, 'c', 'e'),
+    ...        'e': (inc, 'a')}
+    >>> state = start_state_from_dask(dsk)
+    >>> batch_chain('b', state, 10, set())
+    ['c']
+    """
+    chain = []
+    while len(chain) < size:
+        dependents = state['dependents'][key]
+        if len(dependents) != 1:
+            break
+        dep, = dependents
+        if dep in claimed or len(state['waiting'].get(dep, ())) != 1:
+            break
+        chain.append(dep)
+        key = dep
+    return chain
+
+
+class TaskTimeoutError(Exception):
+    """ A task ran longer than its timeout """
+
+
+class CancelledError(Exception):
+    """ The computation was cancelled with a ``CancelToken`` """
+
+
+class CancelToken(object):
+    """ Cancel a running computation, e.g. from another thread
+
+    Pass the token to a ``get_async``-based scheduler, or to ``.compute()``,
+    with ``cancel=``.  Once we call ``cancel`` the scheduler stops sending
+    tasks to the pool, workers skip the tasks that they have not yet started,
+    intermediate results are released and the computation raises a
+    ``CancelledError`` without waiting for running tasks to finish.
+
+    >>> token = CancelToken()
+    >>> timer = threading.Timer(10, token.cancel)  # doctest: +SKIP
+    >>> timer.start()  # doctest: +SKIP
+    >>> x.compute(cancel=token)  # doctest: +SKIP
+    Traceback (most recent call last):
+    ...
+    CancelledError: Computation cancelled
+
+    A token cancels every computation that uses it, now and later.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._queues = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            queues = list(self._queues)
+        for queue in queues:
+            queue.put(None)     # Wake up the scheduler
+
+    def _register(self, queue):
+        """ Wake up the scheduler reading from queue when cancelled """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._queues.append(queue)
+            return True
+
+    def _unregister(self, queue):
+        with self._lock:
+            if queue in self._queues:
+                self._queues.remove(queue)
+
+    def __reduce__(self):
+        # Tokens do not cross processes, see ``ProcessPool.cancel``
+        return (CancelToken, ())
+
+
+def task_policy(policy, key, default=None):
+    """ Value of a per-task policy like ``retries`` or ``timeout`` for key
+
+    A policy is either a single value or a dict of values for keys or for key
+    names as given by ``key_split``.
+
+    >>> task_policy(3, ('x', 1))
+    3
+    >>> task_policy({'x': 3, ('y', 1): 2}, ('x', 1))
+    3
+    >>> task_policy({'x': 3, ('y', 1): 2}, ('y', 1))
+    2
+    >>> task_policy({'x': 3}, 'z', default=0)
+    0
+    """
+    if isinstance(policy, dict):
+        if key in policy:
+            return policy[key]
+        return policy.get(key_split(key), default)
+    return default if policy is None else policy
+
+
+# Seconds between checks for timeouts and stragglers
+check_interval = 0.05
+
+
 '''
 `get`
 -----
@@ -373,7 +760,12 @@ The main function of the scheduler.  Get is the main entry point.
 
 def get_async(apply_async, num_workers, dsk, result, cache=None,
               queue=None, get_id=default_get_id, raise_on_exception=False,
-              rerun_exceptions_locally=None, callbacks=None, **kwargs):
+              rerun_exceptions_locally=None, callbacks=None, compact=None,
+              batch=None, batch_duration=0.01, memory_limit=None,
+              priority=None, retries=None, timeout=None, speculative=None,
+              release_results=False, checkpoint=None, cancel=None,
+              precompile=None, adaptive=None, resources=None,
+              capacity=None, analysis=None, sizes=None, **kwargs):
     """ Asynchronous get function
 
     This is a general version of various asynchronous schedulers for dask.  It
@@ -397,7 +789,9 @@ def get_async(apply_async, num_workers, dsk, result, cache=None,
     result : key or list of keys
         Keys corresponding to desired data
     cache : dict-like, optional
-        Temporary storage of results
+        Temporary storage of results.  A cache with a ``fetch(key)`` method
+        holds results elsewhere, like the one of resident mode in
+        ``dask.multiprocessing``, we fetch each result for posttask callbacks.
     get_id : callable, optional
         Function to return the worker id, takes no arguments. Examples are
         `threading.current_thread` and `multiprocessing.current_process`.
@@ -405,9 +799,90 @@ def get_async(apply_async, num_workers, dsk, result, cache=None,
         Whether to rerun failing tasks in local process to enable debugging
         (False by default)
     callbacks : tuple or list of tuples, optional
-        Callbacks are passed in as tuples of length 4. Multiple sets of
+        Callbacks are passed in as tuples of length 4 or 5. Multiple sets of
         callbacks may be passed in as a list of tuples. For more information,
         see the dask.diagnostics documentation.
+    compact : bool, optional
+        Whether to hold scheduler state in integer-interned NumPy arrays (see
+        ``dask.compact``).  Useful for graphs with millions of tasks.  Requires
+        NumPy.  (False by default)
+    batch : bool, optional
+        Whether to send groups of ready tasks, and short chains of tasks that
+        they enable, to workers as a single unit.  This amortizes pool overhead
+        for graphs of many very small tasks.  (False by default)
+    batch_duration : float, optional
+        Target duration of a batch in seconds when batching.  The number of
+        tasks per batch adapts to the measured task duration.
+    memory_limit : int, optional
+        Bytes of intermediate results to hold in memory.  Above this limit we
+        hold back tasks without dependencies and spill the results needed
+        last to local disk (see ``dask.spill``).  Spilled results are loaded
+        back when a task needs them, and a given ``cache`` holds all results
+        at the end as without a limit.  (No limit by default)
+    priority : {None, 'order', 'memory'} or callable, optional
+        How to choose among ready tasks.  By default we run the tasks that
+        became ready most recently, sorted by ``dask.order``.  With 'order' we
+        keep all ready tasks in a heap (see ``ReadyHeap``) and always run the
+        one with the lowest ``dask.order`` value.  With 'memory' we first
+        prefer tasks that release the most data from memory, as counted by
+        ``releases``, and break ties by ``dask.order``.  A callable
+        ``priority(key, state)`` gives a sort value, lowest first.
+    retries : int or dict, optional
+        How many times to run a failing task again before we raise its error.
+        A dict maps keys, or key names as given by ``dask.utils.key_split``,
+        to their number of retries.  We call ``retry`` callbacks before each
+        retry.  (0 by default)
+    timeout : float or dict, optional
+        Seconds after which we consider a running task failed with a
+        ``TaskTimeoutError``, given as for ``retries``.  A retry starts a new
+        copy of the task, the old copy keeps running in its worker and
+        whichever copy finishes first wins.  (No timeout by default)
+    speculative : float, optional
+        Start a second copy of a running task on an idle worker once it has
+        run this many times longer than the median duration of the finished
+        tasks with the same key name.  The first copy to finish wins.  (Off by
+        default)
+
+    release_results : bool, optional
+        Release each requested result once the ``posttask`` callbacks have
+        seen it and no other task needs it, rather than holding all results
+        until the end.  We then return None.  See ``as_completed``.
+    checkpoint : str or Checkpoint, optional
+        Directory in which to save the results of slow tasks, or a
+        ``dask.checkpoint.Checkpoint`` to choose which results to save.  When
+        we run the same graph again we load these results rather than
+        recompute them and everything upstream of them.  (Off by default)
+    cancel : CancelToken, optional
+        Token to cancel the computation with, see ``CancelToken``.  We also
+        cancel on KeyboardInterrupt.
+    precompile : bool, optional
+        Compile each task into a flat list of calls before we run it (see
+        ``dask.optimize.precompile``).  Compiling costs about as much as one
+        execution, so this pays off for deeply nested tasks that we run
+        again, e.g. with ``graph_cache`` which keeps the compiled graph.
+        (False by default)
+    adaptive : bool or Adaptive, optional
+        Change the number of tasks that we run at once, up to
+        ``num_workers``, as we measure throughput and CPU use, and set the
+        number of BLAS threads to match (see ``dask.adaptive``).  Pass an
+        ``Adaptive`` to read its ``report()`` afterwards.  (Off by default)
+    resources : dict, optional
+        Resources that tasks use, e.g. ``{'load': {'hdf5-io': 1}}``, by key,
+        key name or function.  Functions may also carry them with
+        ``dask.resources.requires``.
+    capacity : dict, optional
+        Amount of each resource available at once, e.g. ``{'hdf5-io': 1}``.
+        We run other ready tasks while the resources of a task are in use
+        (see ``dask.resources``).  (Unlimited by default)
+    analysis : GraphAnalysis, optional
+        Dependencies of the graph found by earlier passes, which we use and
+        update rather than find again, see ``dask.analysis``
+    sizes : dict or callable, optional
+        Size of the result of each task, by key or key name, e.g. from
+        ``dask.benchmarks.task_sizes`` of an earlier run.  We then order the
+        graph for low peak memory (see ``dask.order``).
+
+    Retries, timeouts, speculation and resource capacities turn off batching.
 
     See Also
     --------
@@ -418,23 +893,98 @@ def get_async(apply_async, num_workers, dsk, result, cache=None,
 
     if callbacks is None:
         callbacks = _globals['callbacks']
-    start_cbs, pretask_cbs, posttask_cbs, finish_cbs = unpack_callbacks(callbacks)
+    if checkpoint is None:
+        checkpoint = _globals.get('checkpoint')
+    if checkpoint is not None:
+        from .checkpoint import Checkpoint
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint(checkpoint)
+        callbacks = list(callbacks) + [checkpoint._callback]
+    (start_cbs, pretask_cbs, posttask_cbs, finish_cbs,
+     retry_cbs) = unpack_callbacks(callbacks)
 
     if isinstance(result, list):
         result_flat = set(flatten(result))
     else:
         result_flat = set([result])
     results = set(result_flat)
+    # Keys to hold until the end
+    kept = set() if release_results else results
 
     dsk = dsk.copy()
     for f in start_cbs:
         f(dsk)
 
-    dsk = cull(dsk, list(results))
-
-    keyorder = order(dsk)
+    if compact is None:
+        compact = _globals.get('compact', False)
+    graph = None
+
+    graph_cache = current_graph_cache()
+    if graph_cache is not None:
+        culled, keyorder, dependencies, dependents = graph_cache.get(
+                get_async, dsk, result, partial(analyze, dsk, results))
+        dsk = dict((k, dsk[k]) for k in culled)
+    elif analysis is not None:
+        dsk = cull(dsk, list(results), analysis=analysis)
+        analysis.update(dsk)
+        keyorder = analysis.order()
+        dependencies, dependents = analysis.dependencies, analysis.dependents
+    elif compact:
+        # Cull and order on the integer arrays of the compact state
+        from .compact import CSRGraph
+        extra = cache if cache is not None else _globals['cache']
+        graph = CSRGraph.from_dask(dsk, extra=extra).cull(results)
+        dsk = dict((k, dsk[k]) for k in graph.keys[:graph.ngraph])
+        keyorder = graph.order()
+        dependencies = dependents = None
+    else:
+        dsk = cull(dsk, list(results))
+        keyorder = order(dsk)
+        dependencies = dependents = None
+    if sizes is None:
+        sizes = _globals.get('sizes')
+    if sizes is not None:
+        keyorder = order(dsk, analysis=analysis, sizes=sizes)
+
+    if precompile is None:
+        precompile = _globals.get('precompile', False)
+    if precompile and graph_cache is not None:
+        dsk = graph_cache.get(precompile_graph, dsk, result,
+                              partial(precompile_graph, dsk))
+    elif precompile:
+        dsk = precompile_graph(dsk)
+
+    if compact:
+        from .compact import start_state_from_dask as start_state
+        from .compact import finish_task as finish
+        from .compact import release_data as release
+    else:
+        start_state, finish = start_state_from_dask, finish_task
+        release = release_data
+
+    if memory_limit is None:
+        memory_limit = _globals.get('memory_limit')
+    if memory_limit:
+        from .spill import Spill
+        if cache is None:
+            cache = _globals['cache']
+        cache = Spill(cache)
+
+    # Keys that the caller put in the cache, which we keep on abort
+    given = cache if cache is not None else _globals['cache']
+    given = set(given) if given else set()
+
+    if dependencies is not None and not compact and not given:
+        # Results in the cache would change the dependencies
+        state = start_state(dsk, cache=cache, sortkey=keyorder.get,
+                            dependencies=dependencies, dependents=dependents)
+    elif graph is not None:
+        state = start_state(dsk, cache=cache, sortkey=keyorder.get,
+                            graph=graph)
+    else:
+        state = start_state(dsk, cache=cache, sortkey=keyorder.get)
 
-    state = start_state_from_dask(dsk, cache=cache, sortkey=keyorder.get)
+    fetch = getattr(state['cache'], 'fetch', None)
 
     if rerun_exceptions_locally is None:
         rerun_exceptions_locally = _globals.get('rerun_exceptions_locally', False)
@@ -442,58 +992,308 @@ def get_async(apply_async, num_workers, dsk, result, cache=None,
     if state['waiting'] and not state['ready']:
         raise ValueError("Found no accessible jobs in dask")
 
+    if priority is None:
+        priority = _globals.get('priority')
+    state['ready'] = ready_queue(priority, state, keyorder)
+
+    if batch is None:
+        batch = _globals.get('batch', False)
+    if retries is None:
+        retries = _globals.get('retries')
+    if timeout is None:
+        timeout = _globals.get('timeout')
+    if speculative is None:
+        speculative = _globals.get('speculative')
+    resilient = bool(retries or timeout or speculative)
+    if resilient:
+        batch = False
+
+    if resources is None:
+        resources = _globals.get('resources')
+    if capacity is None:
+        capacity = _globals.get('capacity')
+    if capacity:
+        from .resources import ResourcePool
+        resource_pool = ResourcePool(capacity, resources)
+        batch = False
+    else:
+        resource_pool = None
+
+    if adaptive is None:
+        adaptive = _globals.get('adaptive')
+    if adaptive is True:
+        from .adaptive import Adaptive
+        adaptive = Adaptive()
+    # Number of calls to apply_async that we keep running
+    active = [adaptive.start(num_workers) if adaptive else num_workers]
+
+    # Number of submitted calls to apply_async without a response
+    inflight = [0]
+    # Average task duration as measured by batches
+    duration = [None]
+    # Tasks sent within a batch before they were ready
+    chained = set()
+
+    # Bookkeeping of retries, timeouts and speculation, see ``on_result``
+    launched = dict()       # key -> time we last started a copy of key
+    outstanding = dict()    # key -> number of copies without a response
+    abandoned = dict()      # key -> number of copies that timed out
+    attempts = dict()       # key -> number of retries so far
+    durations = dict()      # key name -> durations of finished tasks
+    speculated = set()
+
     def fire_task():
-        """ Fire off a task to the thread pool """
+        """ Fire off a task (or a batch of tasks) to the thread pool """
+        if batch:
+            return fire_batch()
         # Choose a good task to compute
         key = state['ready'].pop()
+        if resource_pool is not None and not resource_pool.acquire(key,
+                                                                   dsk[key]):
+            return  # Back to ready once a task releases its resources
         state['running'].add(key)
         for f in pretask_cbs:
             f(key, dsk, state)
+        submit(key)
 
+    def submit(key):
+        """ Send a copy of a running task to the pool """
         # Prep data to send
         data = dict((dep, state['cache'][dep])
-                    for dep in get_dependencies(dsk, key))
+                    for dep in state['dependencies'][key])
         # Submit
+        inflight[0] += 1
+        if resilient:
+            launched[key] = default_timer()
+            outstanding[key] = outstanding.get(key, 0) + 1
         apply_async(execute_task, args=[key, dsk[key], data, queue,
-                                        get_id, raise_on_exception])
-
-    # Seed initial tasks into the thread pool
-    while state['ready'] and len(state['running']) < num_workers:
-        fire_task()
-
-    # Main loop, wait on tasks to finish, insert new ones
-    while state['waiting'] or state['ready'] or state['running']:
-        try:
-            key, res, tb, worker_id = queue.get()
-        except KeyboardInterrupt:
-            for f in finish_cbs:
-                f(dsk, state, True)
-            raise
+                                        get_id, raise_on_exception, stop])
+
+    def retry(key, exc):
+        """ Run key again if it has retries left """
+        attempt = attempts.get(key, 0) + 1
+        if attempt > task_policy(retries, key, 0):
+            return False
+        attempts[key] = attempt
+        for f in retry_cbs:
+            f(key, exc, dsk, state, attempt)
+        submit(key)
+        return True
+
+    def live_copies(key):
+        return outstanding.get(key, 0) - abandoned.get(key, 0)
+
+    def on_result(key, res):
+        """ Handle a response in resilient mode, return whether to use it """
+        outstanding[key] -= 1
+        if abandoned.get(key):
+            # Attribute the response to a copy that timed out, which we no
+            # longer count as inflight
+            abandoned[key] -= 1
+        else:
+            inflight[0] -= 1
+        if key in state['finished']:
+            return False    # Another copy finished first
         if isinstance(res, Exception):
-            for f in finish_cbs:
-                f(dsk, state, True)
-            if rerun_exceptions_locally:
-                data = dict((dep, state['cache'][dep])
-                            for dep in get_dependencies(dsk, key))
-                task = dsk[key]
-                _execute_task(task, data)  # Re-execute locally
-            else:
-                raise(remote_exception(res, tb))
-        state['cache'][key] = res
-        finish_task(dsk, key, state, results, keyorder.get)
-        for f in posttask_cbs:
-            f(key, res, dsk, state, worker_id)
-        while state['ready'] and len(state['running']) < num_workers:
-            fire_task()
+            return not retry(key, res) and not live_copies(key)
+        durations.setdefault(key_split(key), []).append(
+                default_timer() - launched[key])
+        return True
+
+    def check_running():
+        """ Time out or speculatively copy slow tasks """
+        now = default_timer()
+        for key in list(state['running']):
+            if key in state['finished'] or not live_copies(key):
+                continue
+            elapsed = now - launched[key]
+            limit = task_policy(timeout, key)
+            if limit is not None and elapsed > limit:
+                abandoned[key] = abandoned.get(key, 0) + 1
+                inflight[0] -= 1
+                exc = TaskTimeoutError("Task %s ran longer than %s seconds"
+                                       % (str(key), limit))
+                if not retry(key, exc) and not live_copies(key):
+                    for f in finish_cbs:
+                        f(dsk, state, True)
+                    raise exc
+            elif (speculative and key not in speculated and
+                  inflight[0] < active[0]):
+                ds = durations.get(key_split(key))
+                if (ds and len(ds) >= 3 and
+                        elapsed > speculative * sorted(ds)[len(ds) // 2]):
+                    speculated.add(key)
+                    submit(key)
+
+    def fire_batch():
+        """ Fire off a batch of ready tasks and their chains """
+        n = batch_size(duration[0], batch_duration, len(state['ready']),
+                       active[0] - inflight[0])
+        keys = []
+        claimed = set()
+        while state['ready'] and len(keys) < n:
+            key = state['ready'].pop()
+            keys.append(key)
+            claimed.add(key)
+            chain = batch_chain(key, state, n - len(keys), claimed)
+            keys.extend(chain)
+            claimed.update(chain)
+            chained.update(chain)
+
+        tasks = []
+        for key in keys:
+            state['running'].add(key)
+            for f in pretask_cbs:
+                f(key, dsk, state)
+            data = dict((dep, state['cache'][dep])
+                        for dep in state['dependencies'][key]
+                        if dep not in claimed)
+            tasks.append((key, dsk[key], data))
+        inflight[0] += 1
+        apply_async(execute_batch, args=[tasks, queue, get_id,
+                                         raise_on_exception, stop])
+
+    if memory_limit:
+        data_keys = set(cache)
+        roots = set(k for k in dsk if k not in data_keys and
+                    all(dep in data_keys for dep in state['dependencies'][k]))
+    # Root tasks held back while memory use is above the limit
+    held = deque()
+
+    def next_use(key):
+        """ Priority of the first waiting task that needs key """
+        deps = state['waiting_data'].get(key)
+        if not deps:
+            return float('inf')
+        return min(map(keyorder.get, deps))
+
+    def throttle():
+        """ Hold back or release root tasks depending on memory use """
+        ready = state['ready']
+        if cache.memory_bytes > memory_limit:
+            cache.spill_to(memory_limit * 3 // 4, next_use)
+        if cache.memory_bytes > memory_limit:
+            while ready and ready[-1] in roots:
+                held.append(ready.pop())
+            if not ready and not inflight[0] and held:
+                ready.append(held.popleft())
+        elif held:
+            ready.extend(reversed(held))
+            held.clear()
+
+    # Workers skip the tasks that they start after we stop
+    stop = CancelToken()
+
+    def abort(exc):
+        """ Stop dispatching, release the results of this run and raise """
+        stop.cancel()
+        for f in finish_cbs:
+            f(dsk, state, True)
+        for key in list(state['cache']):
+            if key in dsk and key not in given:
+                del state['cache'][key]
+        raise exc
 
-    # Final reporting
-    while state['running'] or not queue.empty():
-        key, res, tb, worker_id = queue.get()
-
-    for f in finish_cbs:
-        f(dsk, state, False)
+    try:
+        if cancel is not None and not cancel._register(queue):
+            abort(CancelledError("Computation cancelled"))
+        if memory_limit:
+            throttle()
+        # Seed initial tasks into the thread pool
+        while state['ready'] and inflight[0] < active[0]:
+            fire_task()
 
-    return nested_get(result, state['cache'])
+        # Main loop, wait on tasks to finish, insert new ones
+        while (state['waiting'] or state['ready'] or state['running'] or
+               held):
+            try:
+                if resilient:
+                    msg = queue.get(timeout=check_interval)
+                else:
+                    msg = queue.get()
+            except Empty:
+                check_running()
+                continue
+            except KeyboardInterrupt as e:
+                abort(e)
+            if cancel is not None and cancel.cancelled:
+                abort(CancelledError("Computation cancelled"))
+            if msg is None:
+                continue    # Late wake up call of a ``CancelToken``
+            if resilient:
+                key, res, tb, worker_id = msg
+                if not on_result(key, res):
+                    check_running()
+                    continue
+            else:
+                inflight[0] -= 1
+            if isinstance(msg, BatchResult):
+                items, worker_id = msg.results, msg.worker_id
+                if items:
+                    d = msg.duration / len(items)
+                    duration[0] = (d if duration[0] is None
+                                   else (duration[0] + d) / 2)
+            else:
+                key, res, tb, worker_id = msg
+                items = [(key, res, tb)]
+            for key, res, tb in items:
+                if isinstance(res, Exception):
+                    for f in finish_cbs:
+                        f(dsk, state, True)
+                    if rerun_exceptions_locally:
+                        data = dict((dep, state['cache'][dep])
+                                    for dep in get_dependencies(dsk, key))
+                        task = dsk[key]
+                        _execute_task(task, data)  # Re-execute locally
+                    else:
+                        raise(remote_exception(res, tb))
+                if key in chained:
+                    # Finishing its predecessor marked this task as ready
+                    chained.remove(key)
+                    if state['ready'][-1] == key:
+                        state['ready'].pop()
+                    else:
+                        state['ready'].remove(key)
+                state['cache'][key] = res
+                finish(dsk, key, state, kept, keyorder.get)
+                if resource_pool is not None:
+                    state['ready'].extend(reversed(resource_pool.release(key)))
+                if priority == 'memory':
+                    reprioritize(key, state)
+                if posttask_cbs and fetch is not None:
+                    res = fetch(key)
+                for f in posttask_cbs:
+                    f(key, res, dsk, state, worker_id)
+                if release_results and not state['dependents'][key]:
+                    # Callbacks have seen the result, nothing else needs it
+                    release(key, state)
+            if resilient:
+                check_running()
+            if memory_limit:
+                throttle()
+            if adaptive:
+                active[0] = adaptive.update(len(items), inflight[0])
+            while state['ready'] and inflight[0] < active[0]:
+                fire_task()
+
+        # Final reporting
+        while state['running'] or (not resilient and not queue.empty()):
+            queue.get()
+
+        for f in finish_cbs:
+            f(dsk, state, False)
+
+        if release_results:
+            return None
+        return nested_get(result, state['cache'])
+    finally:
+        stop.cancel()
+        if cancel is not None:
+            cancel._unregister(queue)
+        if memory_limit:
+            cache.close()
+        if adaptive:
+            adaptive.finish()
 
 
 """ Synchronous concrete version of get_async
@@ -515,6 +1315,111 @@ def get_sync(dsk, keys, **kwargs):
     return get_async(apply_sync, 1, dsk, keys, queue=queue,
                      raise_on_exception=True, **kwargs)
 
+get_sync._takes_analysis = True  # see dask.base._scheduler_kwargs
+
+
+class _Stop(Exception):
+    """ Stops a computation whose results nobody consumes anymore """
+
+
+def as_completed(get, dsk, keys, maxsize=0, **kwargs):
+    """ Iterate over ``(key, result)`` pairs as requested keys complete
+
+    Runs ``get`` in a background thread.  ``get`` must pass its keyword
+    arguments on to ``get_async``, like the threaded, multiprocessing and
+    synchronous schedulers do.  The scheduler releases each result as soon as
+    we hand it to the iterator and no other task needs it, so results don't
+    pile up in memory unless the consumer falls behind.
+
+    Parameters
+    ----------
+
+    get : callable
+        A scheduler get function, e.g. ``dask.threaded.get``
+    dsk : dict
+        A dask graph
+    keys : key or list of keys
+        Keys to compute, nested lists are flattened
+    maxsize : int, optional
+        Hold at most this many finished results for the consumer.  The
+        scheduler waits when the buffer is full.  (Unbounded by default)
+
+    Examples
+    --------
+
+    >>> dsk = {'x': 1, 'y': (inc, 'x'), 'z': (add, 'y', 10)}
+    >>> sorted(as_completed(get_sync, dsk, ['y', 'z']))
+    [('y', 2), ('z', 12)]
+
+    Stop early by leaving the loop, the computation stops soon after
+
+    >>> for key, result in as_completed(get_sync, dsk, ['y', 'z']):
+    ...     break
+    """
+    import threading
+    from .compatibility import Queue
+
+    flat = list(flatten(keys)) if isinstance(keys, list) else [keys]
+    wanted = set(flat)
+
+    # Data in the graph is never computed, hand it out first
+    for key in flat:
+        if key in wanted and key in dsk:
+            v = dsk[key]
+            if not (istask(v) or _deps(dsk, v)):
+                wanted.remove(key)
+                yield key, v
+    if not wanted:
+        return
+
+    results = Queue(maxsize)
+    stopped = threading.Event()
+
+    def posttask(key, result, dsk, state, id):
+        if stopped.is_set():
+            raise _Stop()
+        if key in wanted:
+            results.put((key, result, None))
+
+    callbacks = kwargs.pop('callbacks', None)
+    if callbacks is None:
+        callbacks = _globals['callbacks']
+    callbacks = list(callbacks) + [(None, None, posttask, None)]
+
+    def run():
+        try:
+            get(dsk, list(wanted), callbacks=callbacks, release_results=True,
+                **kwargs)
+            results.put((None, None, None))
+        except _Stop:
+            pass
+        except Exception as e:
+            results.put((None, None, e))
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        remaining = len(wanted)
+        while remaining:
+            key, result, exc = results.get()
+            if exc is not None:
+                raise exc
+            if key is None:
+                break
+            remaining -= 1
+            yield key, result
+            del result
+    finally:
+        stopped.set()
+        # Unblock the scheduler if it waits on a full buffer
+        try:
+            while True:
+                results.get_nowait()
+        except Empty:
+            pass
+
 
 def sortkey(item):
     """ Sorting key function that is robust to different types
@@ -0,0 +1,213 @@
+"""
+An asyncio scheduler for I/O-bound graphs
+
+Tasks whose function is a coroutine function run concurrently on an event
+loop, so thousands of requests may be in flight at once without a thread for
+each.  Plain functions run in a thread pool as in the threaded scheduler.
+
+The scheduler shares its state, priorities and callbacks with
+``dask.async.get_async``.  It is written with futures and done-callbacks
+rather than coroutines so that it only depends on the ``asyncio`` library.
+
+Example
+-------
+
+>>> dsk = {'x': (asyncio.sleep, 0.01, 1),   # coroutine, runs on the loop
+...        'y': (add, 'x', 10)}              # plain function, runs in a thread
+>>> get(dsk, 'y')
+11
+"""
+from __future__ import absolute_import, division, print_function
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from multiprocessing import cpu_count
+from operator import add
+from threading import current_thread
+
+from .async import (start_state_from_dask, finish_task, _execute_task,
+                    nested_get)
+from .callbacks import unpack_callbacks
+from .context import _globals
+from .core import flatten
+from .optimize import cull
+from .order import order
+
+
+default_executor = ThreadPoolExecutor(cpu_count())
+
+
+def _execute(task, data):
+    """ Run a plain task in a thread, return result and thread id """
+    return _execute_task(task, data), current_thread().ident
+
+
+def _exception(fut):
+    if fut.cancelled():
+        return asyncio.CancelledError()
+    return fut.exception()
+
+
+def get_future(dsk, result, loop=None, executor=None, cache=None,
+               callbacks=None, max_inflight=10000):
+    """ Schedule a dask graph on a running event loop
+
+    Returns an ``asyncio.Future`` of the results.  See ``get`` for the
+    parameters.
+
+    Examples
+    --------
+
+    >>> loop = asyncio.new_event_loop()
+    >>> dsk = {'x': 1, 'y': (add, 'x', 'x')}
+    >>> future = get_future(dsk, 'y', loop=loop)
+    >>> loop.run_until_complete(future)
+    2
+    >>> loop.close()
+    """
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    if executor is None:
+        executor = default_executor
+    if callbacks is None:
+        callbacks = _globals['callbacks']
+    start_cbs, pretask_cbs, posttask_cbs, finish_cbs = unpack_callbacks(callbacks)[:4]
+
+    if isinstance(result, list):
+        result_flat = set(flatten(result))
+    else:
+        result_flat = set([result])
+    results = set(result_flat)
+
+    dsk = dsk.copy()
+    for f in start_cbs:
+        f(dsk)
+
+    dsk = cull(dsk, list(results))
+    keyorder = order(dsk)
+    state = start_state_from_dask(dsk, cache=cache, sortkey=keyorder.get)
+
+    if state['waiting'] and not state['ready']:
+        raise ValueError("Found no accessible jobs in dask")
+
+    future = asyncio.Future(loop=loop)
+    loop_id = current_thread().ident
+
+    def fail(exc):
+        if not future.done():
+            for f in finish_cbs:
+                f(dsk, state, True)
+            future.set_exception(exc)
+
+    def fire_task():
+        key = state['ready'].pop()
+        state['running'].add(key)
+        for f in pretask_cbs:
+            f(key, dsk, state)
+
+        task = dsk[key]
+        data = dict((dep, state['cache'][dep])
+                    for dep in state['dependencies'][key])
+        if asyncio.iscoroutinefunction(task[0]):
+            try:
+                args = [_execute_task(a, data) for a in task[1:]]
+                fut = asyncio.ensure_future(task[0](*args), loop=loop)
+            except Exception as e:
+                fut = asyncio.Future(loop=loop)
+                fut.set_exception(e)
+            fut.add_done_callback(partial(on_done, key, loop_id))
+        else:
+            fut = loop.run_in_executor(executor, _execute, task, data)
+            fut.add_done_callback(partial(on_thread_done, key))
+
+    def on_thread_done(key, fut):
+        if future.done():
+            return
+        if fut.cancelled() or fut.exception() is not None:
+            return fail(_exception(fut))
+        res, worker_id = fut.result()
+        if asyncio.iscoroutine(res):
+            # Plain functions may return coroutines, e.g. partials
+            fut = asyncio.ensure_future(res, loop=loop)
+            fut.add_done_callback(partial(on_done, key, worker_id))
+        else:
+            finish(key, res, worker_id)
+
+    def on_done(key, worker_id, fut):
+        if future.done():
+            return
+        if fut.cancelled() or fut.exception() is not None:
+            return fail(_exception(fut))
+        finish(key, fut.result(), worker_id)
+
+    def finish(key, res, worker_id):
+        state['cache'][key] = res
+        finish_task(dsk, key, state, results, keyorder.get)
+        for f in posttask_cbs:
+            f(key, res, dsk, state, worker_id)
+        fire_tasks()
+
+    def fire_tasks():
+        try:
+            while state['ready'] and len(state['running']) < max_inflight:
+                fire_task()
+        except Exception as e:
+            return fail(e)
+        if not (state['waiting'] or state['ready'] or state['running']):
+            for f in finish_cbs:
+                f(dsk, state, False)
+            future.set_result(nested_get(result, state['cache']))
+
+    fire_tasks()
+    return future
+
+
+def get(dsk, result, cache=None, num_workers=None, max_inflight=10000,
+        **kwargs):
+    """ Asyncio implementation of dask.get
+
+    Runs a new event loop in the calling thread until the results are
+    ready.  Use ``get_future`` to run within an event loop that is already
+    running.
+
+    Parameters
+    ----------
+
+    dsk: dict
+        A dask dictionary specifying a workflow
+    result: key or list of keys
+        Keys corresponding to desired data
+    cache: dict-like (optional)
+        Temporary storage of results
+    num_workers: integer (optional)
+        The number of threads to run plain (non-coroutine) functions
+    max_inflight: integer (optional)
+        The maximum number of tasks running at once
+    executor: concurrent.futures.Executor (optional)
+        Executor for plain functions, overrides ``num_workers``
+    callbacks: tuple or list of tuples (optional)
+        Callbacks as in ``get_async``
+
+    Examples
+    --------
+
+    >>> dsk = {'x': 1, 'y': 2, 'z': (add, 'x', 'y'), 'w': (sum, ['x', 'z'])}
+    >>> get(dsk, 'w')
+    4
+    >>> get(dsk, ['w', 'y'])
+    (4, 2)
+    """
+    executor = kwargs.pop('executor', None)
+    own_executor = executor is None and num_workers
+    if own_executor:
+        executor = ThreadPoolExecutor(num_workers)
+    loop = asyncio.new_event_loop()
+    try:
+        future = get_future(dsk, result, loop=loop, executor=executor,
+                            cache=cache, max_inflight=max_inflight, **kwargs)
+        return loop.run_until_complete(future)
+    finally:
+        loop.close()
+        if own_executor:
+            executor.shutdown()
@@ -28,9 +28,11 @@ with ignoring(ImportError):
 from ..base import Base, normalize_token
 from ..compatibility import (apply, BytesIO, unicode, urlopen, urlparse,
         StringIO)
-from ..core import list2, quote, istask, get_dependencies, reverse_dict
+from ..context import _globals
+from ..core import (list2, quote, istask, get_dependencies, reverse_dict,
+                    flatten)
 from ..multiprocessing import get as mpget
-from ..optimize import fuse, cull, inline
+from ..optimize import fuse, cull, inline, fuse_subgraphs
 from ..utils import (tmpfile, file_size, textblock,
         takes_multiple_arguments)
 
@@ -77,8 +79,8 @@ def lazify(dsk):
     return valmap(lazify_task, dsk)
 
 
-def inline_singleton_lists(dsk):
-    """ Inline lists that are only used once
+def inline_singleton_lists(dsk, keys=None, analysis=None):
+    """ Inline lists that are only used once, except those in ``keys``
 
     >>> d = {'b': (list, 'a'),
     ...      'c': (f, 'b', 1)}     # doctest: +SKIP
@@ -87,22 +89,32 @@ def inline_singleton_lists(dsk):
 
     Pairs nicely with lazify afterwards
     """
+    if analysis is not None:
+        dependents = analysis.update(dsk).dependents
+    else:
+        dependencies = dict((k, get_dependencies(dsk, k)) for k in dsk)
+        dependents = reverse_dict(dependencies)
 
-    dependencies = dict((k, get_dependencies(dsk, k)) for k in dsk)
-    dependents = reverse_dict(dependencies)
-
+    output = set(flatten(keys)) if keys is not None else ()
     keys = [k for k, v in dsk.items() if istask(v) and v
                                       and v[0] is list
-                                      and len(dependents[k]) == 1]
-    return inline(dsk, keys, inline_constants=False)
+                                      and len(dependents[k]) == 1
+                                      and k not in output]
+    return inline(dsk, keys, inline_constants=False, analysis=analysis)
 
 
 def optimize(dsk, keys, **kwargs):
     """ Optimize a dask from a dask.bag """
-    dsk2 = cull(dsk, keys)
-    dsk3 = fuse(dsk2)
-    dsk4 = inline_singleton_lists(dsk3)
+    analysis = kwargs.get('analysis')
+    dsk2 = cull(dsk, keys, analysis=analysis)
+    dsk3 = fuse(dsk2, keys, analysis=analysis)
+    dsk4 = inline_singleton_lists(dsk3, keys, analysis=analysis)
     dsk5 = lazify(dsk4)
+    if kwargs.get('fuse_subgraphs', _globals.get('fuse_subgraphs')):
+        dsk5 = fuse_subgraphs(dsk5, keys,
+                              boundaries=kwargs.get('fuse_boundaries'),
+                              resources=kwargs.get('resources'),
+                              analysis=analysis)
     return dsk5
 
 
@@ -813,6 +825,8 @@ def partition(grouper, sequence, npartitions, p, nelements=2**20):
         p.append(d2)
     return p
 
+partition._cse = False  # Appends to partd, see dask.optimize.cse
+
 
 def collect(grouper, group, p, barrier_token):
     """ Collect partitions from disk and yield k,v group pairs """
@@ -465,6 +465,9 @@ def test_groupby():
                       4: [4, 4, 4]}
     assert b.groupby(lambda x: x).npartitions == b.npartitions
 
+    with dask.set_options(cse=True):
+        assert dict(b.groupby(lambda x: x)) == result
+
 
 def test_groupby_with_indexer():
     b = db.from_sequence([[1, 2, 3], [1, 4, 9], [2, 3, 4]])
@@ -8,14 +8,19 @@ import sys
 import uuid
 import warnings
 
-from toolz import merge, groupby, curry, identity
+from toolz import merge, groupby, curry, identity, concat
 from toolz.functoolz import Compose
 
 from .compatibility import bind_method, unicode
+from .analysis import GraphAnalysis
 from .context import _globals
+from .graphcache import current_graph_cache
+from .layers import materialize
+from .optimize import cse, cull
 from .utils import Dispatch, ignoring
 
-__all__ = ("Base", "compute", "normalize_token", "tokenize", "visualize")
+__all__ = ("Base", "compute", "compute_as_completed", "normalize_token",
+           "tokenize", "visualize")
 
 
 class Base(object):
@@ -39,8 +44,9 @@ class Base(object):
     @classmethod
     def _get(cls, dsk, keys, get=None, **kwargs):
         get = get or _globals['get'] or cls._default_get
-        dsk2 = cls._optimize(dsk, keys, **kwargs)
-        return get(dsk2, keys, **kwargs)
+        kwargs.setdefault('analysis', GraphAnalysis())
+        dsk2 = _optimize(cls._optimize, dsk, keys, **kwargs)
+        return get(dsk2, keys, **_scheduler_kwargs(get, kwargs))
 
     @classmethod
     def _bind_operator(cls, op):
@@ -77,20 +83,99 @@ class Base(object):
         raise NotImplementedError
 
 
-def compute(*args, **kwargs):
-    """Compute several dask collections at once.
+def _scheduler_kwargs(get, kwargs):
+    """ Keywords to pass on to the scheduler ``get``
 
-    Examples
-    --------
-    >>> import dask.array as da
-    >>> a = da.arange(10, chunks=2).sum()
-    >>> b = da.arange(10, chunks=2).mean()
-    >>> compute(a, b)
-    (45, 4.5)
+    Only schedulers marked with ``_takes_analysis = True``, those built on
+    ``dask.async.get_async``, receive the ``analysis`` of the optimizations.
+    Other ``get`` functions may not accept the keyword.
+    """
+    if 'analysis' in kwargs and not getattr(get, '_takes_analysis', False):
+        kwargs = dict(kwargs)
+        del kwargs['analysis']
+    return kwargs
+
+
+def _optimize(opt, dsk, keys, **kwargs):
+    """ Run the optimization function of a collection on its graph
+
+    With ``set_options(graph_cache=...)`` we reuse the optimized graph of
+    earlier calls on the same graph and options, see ``dask.graphcache``.
+    Options that we can not hash turn off this reuse.
+
+    The ``analysis`` keyword, a ``dask.analysis.GraphAnalysis``, carries the
+    dependencies of the graph from one pass to the next.
+    """
+    graph_cache = current_graph_cache()
+    if graph_cache is None:
+        return opt(dsk, keys, **kwargs)
+    extra = tuple(sorted(((k, v) for k, v in kwargs.items()
+                          if k != 'analysis'), key=str))
+    if kwargs.get('fuse_subgraphs', _globals.get('fuse_subgraphs')):
+        # Options that ``fuse_subgraphs`` reads from ``set_options``
+        extra += tuple((k, _globals.get(k)) for k in
+                       ['fuse_subgraphs', 'fuse_boundaries', 'resources'])
+    return graph_cache.get(opt, dsk, keys, lambda: opt(dsk, keys, **kwargs),
+                           extra=extra)
+
+
+def _merge_graphs(groups, kwargs):
+    """ Merged graph of each group of collections to compute together
+
+    We build only the tasks of a ``dask.layers.LayeredGraph`` that the keys
+    of its collection need, see ``dask.layers.materialize``.
+
+    With the ``cse=True`` keyword or option we merge equivalent tasks across
+    all of the collections, see ``dask.optimize.cse``, so that work built
+    separately by each collection runs once.  Collections with
+    ``_cse = False``, whose tasks may give a different result on every call,
+    keep all of their tasks.  Pops ``cse`` from ``kwargs``.
+    """
+    graphs = dict((opt, merge([materialize(v.dask, v._keys()) for v in val]))
+                  for opt, val in groups.items())
+    enabled = kwargs.pop('cse', None)
+    if enabled is None:
+        enabled = _globals.get('cse', False)
+    if not enabled:
+        return graphs
+    variables = list(concat(groups.values()))
+    exclude = set()
+    for v in variables:
+        if not getattr(v, '_cse', True):
+            exclude.update(v.dask)
+    if len(graphs) == 1:
+        dsk = next(iter(graphs.values()))
+    else:
+        dsk = merge(graphs.values())
+    keys = [v._keys() for v in variables]
+
+    def merged():
+        return cse(dsk, keys, exclude=exclude, analysis=kwargs.get('analysis'))
+
+    graph_cache = current_graph_cache()
+    if graph_cache is not None:
+        # Reuse the merged graph, so that its optimizations hit the cache too
+        dsk2 = graph_cache.get(cse, dsk, keys, merged,
+                               extra=tuple(sorted(exclude, key=str)))
+    else:
+        dsk2 = merged()
+    if dsk2 is dsk:
+        return graphs
+    if len(graphs) == 1:
+        return dict((opt, dsk2) for opt in graphs)
+    return dict((opt, cull(dsk2, [v._keys() for v in val]))
+                for opt, val in groups.items())
+
+
+def _prepare(variables, kwargs):
+    """ Scheduler and optimized graph to compute collections together
+
+    Resolves the ``get`` keyword or option, merges the graphs of the
+    collections with ``_merge_graphs`` and optimizes each group of
+    collections that shares an optimization.  Pops ``get`` and ``cse`` from
+    ``kwargs``, and adds the ``analysis`` that the scheduler reuses, see
+    ``_scheduler_kwargs``.
     """
-    variables = [a for a in args if isinstance(a, Base)]
-    if not variables:
-        return args
     groups = groupby(attrgetter('_optimize'), variables)
 
     get = kwargs.pop('get', None) or _globals['get']
@@ -103,11 +188,33 @@ def compute(*args, **kwargs):
                              "scheduler `get` function using either "
                              "the `get` kwarg or globally with `set_options`.")
 
-    dsk = merge([opt(merge([v.dask for v in val]),
-                     [v._keys() for v in val], **kwargs)
+    if len(groups) == 1:
+        # One analysis from the optimizations through the scheduler
+        kwargs.setdefault('analysis', GraphAnalysis())
+    graphs = _merge_graphs(groups, kwargs)
+    dsk = merge([_optimize(opt, graphs[opt], [v._keys() for v in val],
+                           **kwargs)
                 for opt, val in groups.items()])
+    return get, dsk
+
+
+def compute(*args, **kwargs):
+    """Compute several dask collections at once.
+
+    Examples
+    --------
+    >>> import dask.array as da
+    >>> a = da.arange(10, chunks=2).sum()
+    >>> b = da.arange(10, chunks=2).mean()
+    >>> compute(a, b)
+    (45, 4.5)
+    """
+    variables = [a for a in args if isinstance(a, Base)]
+    if not variables:
+        return args
+    get, dsk = _prepare(variables, kwargs)
     keys = [var._keys() for var in variables]
-    results = get(dsk, keys, **kwargs)
+    results = get(dsk, keys, **_scheduler_kwargs(get, kwargs))
 
     results_iter = iter(results)
     return tuple(a if not isinstance(a, Base)
@@ -115,6 +222,59 @@ def compute(*args, **kwargs):
                    for a in args)
 
 
+def compute_as_completed(*args, **kwargs):
+    """Compute several dask collections, yielding each one as it completes.
+
+    Yields ``(collection, result)`` pairs in the order in which the
+    collections finish.  Each result is released by the scheduler once it has
+    been handed out.  Requires a scheduler built on ``dask.async.get_async``,
+    like the threaded, multiprocessing and synchronous schedulers.  See
+    ``dask.async.as_completed`` for keyword arguments.
+
+    Examples
+    --------
+    >>> import dask.array as da
+    >>> a = da.arange(10, chunks=2).sum()
+    >>> b = da.arange(10, chunks=2).mean()
+    >>> sorted(r for _, r in compute_as_completed(a, b))
+    [4.5, 45]
+    """
+    from .async import as_completed, nested_get
+    from .core import flatten
+
+    variables = [a for a in args if isinstance(a, Base)]
+    if not variables:
+        return
+    get, dsk = _prepare(variables, kwargs)
+
+    # Collections that need each key and the number of keys they miss
+    owners = dict()
+    missing = []
+    for i, var in enumerate(variables):
+        keys = set(flatten(var._keys()))
+        missing.append(len(keys))
+        for key in keys:
+            owners.setdefault(key, []).append(i)
+
+    finished = dict()
+    kwargs = _scheduler_kwargs(get, kwargs)
+    for key, result in as_completed(get, dsk, list(owners), **kwargs):
+        finished[key] = result
+        del result
+        for i in owners[key]:
+            missing[i] -= 1
+            if missing[i]:
+                continue
+            var = variables[i]
+            keys = var._keys()
+            value = var._finalize(var, nested_get(keys, finished))
+            # Drop results that no other collection waits for
+            for k in flatten(keys):
+                if k in finished and not any(missing[j] for j in owners[k]):
+                    del finished[k]
+            yield var, value
+
+
 def visualize(*args, **kwargs):
     dsks = [arg for arg in args if isinstance(arg, dict)]
     args = [arg for arg in args if isinstance(arg, Base)]
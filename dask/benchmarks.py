@@ -0,0 +1,298 @@
+"""
+Simulate scheduling policies on graphs without running them
+
+Changes to ``dask.order`` or to how ``get_async`` chooses among ready tasks
+are hard to judge by running real workloads: timings are noisy and the
+workloads that matter are large.  Here we replay a graph through the
+scheduler state machine of ``dask.async`` on simulated workers.  Each task
+takes a given duration and produces a result of a given size, and we report
+the makespan, the peak size of results held in memory, and the real time that
+the scheduler bookkeeping took.
+
+Durations and sizes may come from an earlier run with the profilers of
+``dask.diagnostics``
+
+>>> with Profiler() as prof, CacheProfiler(metric=nbytes) as cprof:
+...     x.compute()  # doctest: +SKIP
+>>> simulate(x.dask, x._keys(), num_workers=8,
+...          durations=task_durations(prof.results),
+...          sizes=task_sizes(cprof.results))  # doctest: +SKIP
+Simulation(ntasks=..., makespan=..., peak_memory=..., overhead=...)
+
+Otherwise every task takes a second and every result has size one.  We
+compare policies with ``compare``
+
+>>> dsk, keys = crosstalk(100, 5, 3, seed=1)
+>>> print(compare(dsk, keys, [None, 'order', 'memory'],
+...               num_workers=4))  # doctest: +SKIP
+policy  makespan  peak memory  overhead (s)
+None      97.000          180      0.004392
+order     96.000          177      0.004391
+memory    96.000          113      0.005118
+
+A policy is a ``priority`` of ``get_async``: None, 'order', 'memory' or a
+function ``priority(key, state)`` giving a sort value, and an ordering
+function like ``dask.order.order``.  The synthetic graphs ``trivial``,
+``crosstalk``, ``dense`` and ``reductions`` of this module make simple
+workloads.
+
+Given the sizes of results ``dask.order`` orders for low peak memory
+
+>>> from functools import partial
+>>> dsk, keys = reductions(10, 8)
+>>> print(compare(dsk, keys, [None, (None, partial(dask_order,
+...                                    sizes=reduction_sizes))],
+...               num_workers=4, sizes=reduction_sizes))  # doctest: +SKIP
+policy      makespan  peak memory  overhead (s)
+None          50.000          124      0.001853
+None/order    50.000           93      0.002401
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import namedtuple
+from heapq import heappush, heappop
+from random import Random
+from timeit import default_timer
+
+from .async import (start_state_from_dask, finish_task, ready_queue,
+                    reprioritize, task_policy)
+from .core import flatten
+from .optimize import cull
+from .order import order as dask_order
+from .utils import funcname
+
+
+def noop(*args):
+    pass
+
+
+def trivial(width, height):
+    """ Embarrassingly parallel graph, ``width`` chains of ``height`` tasks
+
+    >>> dsk, keys = trivial(2, 2)
+    >>> sorted(dsk.items())  # doctest: +ELLIPSIS, +NORMALIZE_WHITESPACE
+    [(('x', 0, 0), 0), (('x', 0, 1), 1),
+     (('x', 1, 0), (<function noop ...>, ('x', 0, 0))),
+     (('x', 1, 1), (<function noop ...>, ('x', 0, 1)))]
+    >>> keys
+    [('x', 1, 0), ('x', 1, 1)]
+    """
+    dsk = dict((('x', 0, i), i) for i in range(width))
+    for j in range(1, height):
+        dsk.update((('x', j, i), (noop, ('x', j - 1, i)))
+                   for i in range(width))
+    return dsk, [('x', height - 1, i) for i in range(width)]
+
+
+def crosstalk(width, height, connections, seed=None):
+    """ Layers of tasks that each depend on random tasks of the layer before
+
+    >>> dsk, keys = crosstalk(10, 3, 2, seed=0)
+    >>> len(dsk)
+    30
+    """
+    random = Random(seed)
+    dsk = dict((('x', 0, i), i) for i in range(width))
+    for j in range(1, height):
+        dsk.update((('x', j, i),
+                    (noop, [('x', j - 1, random.randrange(width))
+                            for _ in range(connections)]))
+                   for i in range(width))
+    return dsk, [('x', height - 1, i) for i in range(width)]
+
+
+def dense(width, height):
+    """ Layers of tasks that each depend on all tasks of the layer before
+
+    >>> dsk, keys = dense(3, 2)
+    >>> dsk[('x', 1, 0)]  # doctest: +ELLIPSIS
+    (<function noop ...>, [('x', 0, 0), ('x', 0, 1), ('x', 0, 2)])
+    """
+    dsk = dict((('x', 0, i), i) for i in range(width))
+    for j in range(1, height):
+        dsk.update((('x', j, i), (noop, [('x', j - 1, k)
+                                        for k in range(width)]))
+                   for i in range(width))
+    return dsk, [('x', height - 1, i) for i in range(width)]
+
+
+def reductions(n, width):
+    """ Pairs of a reduction of large blocks and an expansion of small ones
+
+    Each output ``('out', i)`` needs ``('reduce', i)`` of ``width`` blocks
+    ``('large', i, j)`` and ``('expand', i)`` of ``width`` blocks
+    ``('small', i, j)``.  The sizes ``reduction_sizes`` by key name make
+    the order of the subtrees matter for peak memory.
+
+    >>> dsk, keys = reductions(2, 3)
+    >>> len(dsk), keys
+    (19, ['total'])
+    >>> dsk[('reduce', 0)]  # doctest: +ELLIPSIS
+    (<function noop ...>, [('large', 0, 0), ('large', 0, 1), ('large', 0, 2)])
+    """
+    dsk = dict()
+    for i in range(n):
+        for j in range(width):
+            dsk[('large', i, j)] = (noop, j)
+            dsk[('small', i, j)] = (noop, j)
+        dsk[('reduce', i)] = (noop, [('large', i, j) for j in range(width)])
+        dsk[('expand', i)] = (noop, [('small', i, j) for j in range(width)])
+        dsk[('out', i)] = (noop, ('reduce', i), ('expand', i))
+    dsk['total'] = (noop, [('out', i) for i in range(n)])
+    return dsk, ['total']
+
+
+reduction_sizes = {'large': 10, 'small': 1, 'reduce': 1, 'expand': 10,
+                   'out': 1, 'total': 1}
+
+
+def task_durations(results):
+    """ Durations of tasks from ``Profiler.results``
+
+    >>> from dask.diagnostics.profile import TaskData
+    >>> task_durations([TaskData('x', (noop, 1), 10.0, 12.5, 1)])
+    {'x': 2.5}
+    """
+    return dict((r.key, r.end_time - r.start_time) for r in results)
+
+
+def task_sizes(results):
+    """ Sizes of results from ``CacheProfiler.results``
+
+    >>> from dask.diagnostics.profile import CacheData
+    >>> task_sizes([CacheData('x', (noop, 1), 800, 10.0, 12.5)])
+    {'x': 800}
+    """
+    return dict((r.key, r.metric) for r in results)
+
+
+Simulation = namedtuple('Simulation', ['ntasks', 'makespan', 'peak_memory',
+                                       'overhead'])
+
+
+def simulate(dsk, keys, num_workers=4, durations=None, sizes=None,
+             priority=None, order=dask_order, schedule=None):
+    """ Run a graph on simulated workers
+
+    Parameters
+    ----------
+
+    dsk: dict
+        dask graph
+    keys: key or list of keys
+        The outputs
+    num_workers: int
+        Number of simulated workers
+    durations: number or dict, optional
+        Seconds per task, by key or key name as for ``task_policy``, 1 by
+        default
+    sizes: number or dict, optional
+        Size of each result, given as for ``durations``, 1 by default
+    priority: None, 'order', 'memory' or callable
+        How the scheduler chooses among ready tasks, see ``get_async``
+    order: callable, optional
+        Static ordering of the graph, ``dask.order.order`` by default
+    schedule: list, optional
+        If given, we append ``(key, worker, start, end)`` of every task
+
+    Returns a ``Simulation`` of the number of tasks, simulated makespan,
+    simulated peak memory and real seconds spent in scheduling.
+
+    >>> dsk, keys = trivial(4, 3)
+    >>> simulate(dsk, keys, num_workers=2)  # doctest: +ELLIPSIS
+    Simulation(ntasks=8, makespan=4.0, peak_memory=5, overhead=...)
+    """
+    if not isinstance(keys, list):
+        keys = [keys]
+    results = set(flatten(keys))
+    start = default_timer()
+    dsk = cull(dsk, list(results))
+    keyorder = order(dsk)
+    state = start_state_from_dask(dsk, sortkey=keyorder.get)
+    state['ready'] = ready_queue(priority, state, keyorder)
+    overhead = default_timer() - start
+
+    def size(key):
+        return task_policy(sizes, key, 1)
+
+    memory = sum(map(size, state['cache']))
+    peak = memory
+    in_memory = set(state['cache'])
+    ntasks = len(dsk) - len(in_memory)
+    idle = list(range(num_workers))
+    running = []    # heap of (end time, tiebreak, key, worker)
+    now = 0.0
+    count = 0
+
+    while state['ready'] or running:
+        t = default_timer()
+        while state['ready'] and idle:
+            key = state['ready'].pop()
+            state['running'].add(key)
+            worker = idle.pop()
+            end = now + task_policy(durations, key, 1)
+            heappush(running, (end, count, key, worker))
+            count += 1
+            if schedule is not None:
+                schedule.append((key, worker, now, end))
+        overhead += default_timer() - t
+
+        now, _, key, worker = heappop(running)
+        idle.append(worker)
+        memory += size(key)
+        peak = max(peak, memory)
+        in_memory.add(key)
+
+        t = default_timer()
+        state['cache'][key] = None
+        finish_task(dsk, key, state, results, keyorder.get)
+        if priority == 'memory':
+            reprioritize(key, state)
+        overhead += default_timer() - t
+
+        for dep in state['dependencies'][key]:
+            if dep in in_memory and dep not in state['cache']:
+                in_memory.remove(dep)
+                memory -= size(dep)
+
+    if state['waiting']:
+        raise ValueError("Found no accessible jobs in dask")
+    return Simulation(ntasks, now, peak, overhead)
+
+
+def _policy_name(policy):
+    if isinstance(policy, tuple):
+        return '%s/%s' % tuple(map(_policy_name, policy))
+    if callable(policy):
+        return funcname(policy)
+    return str(policy)
+
+
+def compare(dsk, keys, policies, **kwargs):
+    """ Table of simulations of a graph under several policies
+
+    Policies are ``priority`` values, or ``(priority, order)`` tuples to also
+    replace the static ordering.  Other keywords go to ``simulate``.
+
+    >>> dsk, keys = dense(4, 3)
+    >>> print(compare(dsk, keys, [None, 'memory'],
+    ...               num_workers=2))  # doctest: +ELLIPSIS, +NORMALIZE_WHITESPACE
+    policy  makespan  peak memory  overhead (s)
+    None       4.000            8  ...
+    memory     4.000            8  ...
+    """
+    rows = []
+    for policy in policies:
+        if isinstance(policy, tuple):
+            priority, order = policy
+            result = simulate(dsk, keys, priority=priority, order=order,
+                              **kwargs)
+        else:
+            result = simulate(dsk, keys, priority=policy, **kwargs)
+        rows.append((_policy_name(policy), result))
+    width = max(len('policy'), max(len(name) for name, _ in rows))
+    lines = ['%-*s  makespan  peak memory  overhead (s)' % (width, 'policy')]
+    for name, r in rows:
+        lines.append('%-*s  %8.3f  %11s  %12.6f'
+                     % (width, name, r.makespan, r.peak_memory, r.overhead))
+    return '\n'.join(lines)
@@ -18,6 +18,8 @@ class Callback(object):
     ...     pass
     >>> def finish(dsk, state, failed):
     ...     pass
+    >>> def retry(key, exception, dsk, state, attempt):
+    ...     pass
 
     You may then construct a callback object with any number of them
 
@@ -43,15 +45,17 @@ class Callback(object):
     ...     x.compute()  # doctest: +SKIP
     """
 
-    def __init__(self, start=None, pretask=None, posttask=None, finish=None):
+    def __init__(self, start=None, pretask=None, posttask=None, finish=None,
+                 retry=None):
         self._start = start
         self._pretask = pretask
         self._posttask = posttask
         self._finish = finish
+        self._retry = retry
 
     @property
     def _callback(self):
-        fields = ['_start', '_pretask', '_posttask', '_finish']
+        fields = ['_start', '_pretask', '_posttask', '_finish', '_retry']
         return tuple(getattr(self, i, None) for i in fields)
 
     def __enter__(self):
@@ -70,11 +74,15 @@ class Callback(object):
 
 
 def unpack_callbacks(cbs):
-    """Take an iterable of callbacks, return a list of each callback."""
+    """Take an iterable of callbacks, return a list of each callback.
+
+    Callback tuples of length 4 have no ``retry`` callback.
+    """
     if cbs:
+        cbs = [tuple(cb) + (None,) * (5 - len(cb)) for cb in cbs]
         return [[i for i in f if i] for f in zip(*cbs)]
     else:
-        return [(), (), (), ()]
+        return [(), (), (), (), ()]
 
 
 def normalize_callback(cb):
@@ -92,7 +100,7 @@ class add_callbacks(object):
 
     Takes several callbacks and applies them only in the enclosed context.
     Callbacks can either be represented as a ``Callback`` object, or as a tuple
-    of length 4.
+    of length 4 or 5.
 
     Examples
     --------
@@ -0,0 +1,292 @@
+"""
+Checkpoint results to disk and resume failed computations
+
+A ``Checkpoint`` callback writes the results of selected tasks to a local
+directory as they finish.  When we run the same graph again, tasks whose
+results are on disk load them instead of running, and ``get_async`` culls the
+work upstream of them.
+
+A result is identified by a token of its task and, recursively, of all tasks
+that it depends on, but not by its key, so another process that builds the
+same graph under other key names resumes it.  Changing an input or a
+function, including the default arguments and closure of a function,
+invalidates the results downstream of it.  Tasks with objects that we cannot
+tokenize deterministically get a new token each run and so never resume.
+
+Select tasks by key name patterns (see ``dask.utils.key_split``), by their
+measured duration, or both.
+
+>>> dsk = {'x': 1, 'y': (inc, 'x'), 'z': (add, 'y', 10)}
+>>> with Checkpoint('/scratch/checkpoints', keys=['y']):  # doctest: +SKIP
+...     get_sync(dsk, 'z')
+12
+>>> os.listdir('/scratch/checkpoints')  # doctest: +SKIP
+['y-0ef6e0e3e2ac4d3bd8c1e8a6b7bd0e0a.pkl']
+
+Or pass ``checkpoint=`` to any ``get_async``-based scheduler, or to
+``.compute()``:
+
+>>> x.compute(checkpoint='/scratch/checkpoints')  # doctest: +SKIP
+"""
+from __future__ import absolute_import, division, print_function
+
+from fnmatch import fnmatch
+from hashlib import md5
+from operator import add
+import os
+import pickle
+import tempfile
+import types
+
+from functools import partial
+import uuid
+from timeit import default_timer
+
+from toolz import curry
+from toolz.functoolz import Compose
+
+from .base import normalize_token, tokenize
+from .callbacks import Callback
+from .compatibility import unicode
+from .core import istask, ishashable, get_dependencies, inc
+from .utils import key_split
+
+
+def _cell_contents(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:  # empty cell
+        return None
+
+
+def _normalize_code(code):
+    """ Token of a code object and of the functions defined within it """
+    consts = [_normalize_code(c) if isinstance(c, types.CodeType)
+              else _normalize_value(c) for c in code.co_consts]
+    return (md5(code.co_code).hexdigest(), code.co_names, consts)
+
+
+def _normalize_function(func, seen=None):
+    """ Token of a function that is the same in every process
+
+    Covers the code, default arguments and closure of Python functions, so
+    that functions made by the same factory with different values differ, and
+    the parts of ``partial``, ``curry``, ``Compose`` objects and methods.
+    Other callables whose token includes their address get a new token each
+    time, their results never resume.
+    """
+    if isinstance(func, curry):
+        func = func._partial
+    if isinstance(func, partial):
+        return ('partial', _normalize_function(func.func, seen),
+                _normalize_value(func.args, seen),
+                _normalize_value(func.keywords or {}, seen))
+    if isinstance(func, Compose):
+        first = getattr(func, 'first', None)
+        funcs = (first,) + tuple(func.funcs) if first else func.funcs
+        return ('compose', [_normalize_function(f, seen) for f in funcs])
+    if isinstance(func, types.MethodType):
+        return ('method', _normalize_function(func.__func__, seen),
+                _normalize_value(func.__self__, seen))
+    code = getattr(func, '__code__', None)
+    if code is not None:
+        seen = seen or set()
+        if id(func) in seen:  # refers to itself through its closure
+            return ('__recursive__',)
+        seen.add(id(func))
+        closure = [_cell_contents(c) for c in func.__closure__ or ()]
+        return (getattr(func, '__module__', None),
+                getattr(func, '__qualname__', func.__name__),
+                _normalize_code(code),
+                _normalize_value(func.__defaults__, seen),
+                _normalize_value(getattr(func, '__kwdefaults__', None), seen),
+                _normalize_value(closure, seen))
+    if isinstance(func, (types.BuiltinFunctionType, type)):
+        return (getattr(func, '__module__', None), func.__name__)
+    token = normalize_token(func)
+    if ' at 0x' in str(token):
+        return uuid.uuid4().hex
+    return token
+
+
+def _normalize_value(arg, seen=None):
+    """ Token of an argument, functions within it included """
+    if isinstance(arg, (list, tuple)):
+        return type(arg).__name__, [_normalize_value(a, seen) for a in arg]
+    if isinstance(arg, dict):
+        return ('dict', sorted(((normalize_token(k), _normalize_value(v, seen))
+                                for k, v in arg.items()), key=str))
+    if isinstance(arg, (set, frozenset)):
+        return ('set', sorted((_normalize_value(a, seen) for a in arg),
+                              key=str))
+    if callable(arg):
+        return _normalize_function(arg, seen)
+    if normalize_token.dispatch(type(arg)) is normalize_token.dispatch(object):
+        # Objects without state, like Ellipsis or sentinels, by their type
+        r = repr(arg)
+        if not getattr(arg, '__dict__', None) and ' at 0x' not in r:
+            typ = type(arg)
+            return (typ.__module__, typ.__name__, r)
+    return normalize_token(arg)
+
+
+def _normalize(arg, dsk, tokens, functions):
+    """ Normalize a task, replacing keys in it by their tokens
+
+    ``functions`` holds the tokens of the functions of earlier tasks by id
+    """
+    if istask(arg):
+        func = arg[0]
+        try:
+            token = functions[id(func)]
+        except KeyError:
+            token = functions[id(func)] = tokenize(_normalize_function(func))
+        return ((token,) +
+                tuple(_normalize(a, dsk, tokens, functions) for a in arg[1:]))
+    if isinstance(arg, list):
+        return [_normalize(a, dsk, tokens, functions) for a in arg]
+    if ishashable(arg) and arg in dsk:
+        return ('__key__', tokens[arg])
+    return _normalize_value(arg)
+
+
+def graph_tokens(dsk, keys):
+    """ Deterministic tokens of keys and of everything they depend on
+
+    >>> dsk = {'x': 1, 'y': (inc, 'x')}
+    >>> tokens = graph_tokens(dsk, ['y'])
+    >>> sorted(tokens)
+    ['x', 'y']
+    >>> graph_tokens({'x': 2, 'y': (inc, 'x')}, ['y'])['y'] != tokens['y']
+    True
+    """
+    tokens = dict()
+    functions = dict()
+    stack = list(keys)
+    while stack:
+        key = stack[-1]
+        if key in tokens:
+            stack.pop()
+            continue
+        deps = [d for d in get_dependencies(dsk, key) if d not in tokens]
+        if deps:
+            stack.extend(deps)
+            continue
+        stack.pop()
+        # Not the key, names like 'atop-<token>' differ between processes
+        tokens[key] = tokenize(_normalize(dsk[key], dsk, tokens, functions))
+    return tokens
+
+
+def _load(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _filename(key, token):
+    name = key_split(key)
+    name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+    return '%s-%s.pkl' % (name[:64], token)
+
+
+class Checkpoint(Callback):
+    """ Save selected results to disk and load them in later runs
+
+    Parameters
+    ----------
+
+    directory: str
+        Where to store results, created if necessary
+    keys: list of str, optional
+        Checkpoint keys whose name (as given by ``key_split``) matches one of
+        these ``fnmatch`` patterns, e.g. ``['sum', 'read-*']``
+    min_duration: float, optional
+        Also checkpoint any task that took at least this many seconds,
+        counting the duration of the tasks it depends on.  Cheap tasks are
+        faster to recompute than to store.
+
+    Without ``keys`` or ``min_duration`` we checkpoint tasks that took at
+    least one second.
+
+    Examples
+    --------
+
+    >>> with Checkpoint('/scratch/ckpt', keys=['sum-*']):  # doctest: +SKIP
+    ...     x.sum().compute()
+    """
+    def __init__(self, directory, keys=None, min_duration=None):
+        if keys is None and min_duration is None:
+            min_duration = 1.0
+        if isinstance(keys, (str, unicode)):
+            keys = [keys]
+        self.directory = directory
+        self.patterns = keys
+        self.min_duration = min_duration
+        self.tokens = dict()
+        self.loaded = set()
+        self.starttimes = dict()
+        self.durations = dict()
+
+    def selected(self, key):
+        """ Whether we checkpoint key regardless of its duration """
+        if not self.patterns:
+            return False
+        name = key_split(key)
+        return any(fnmatch(name, p) for p in self.patterns)
+
+    def path(self, key):
+        return os.path.join(self.directory, _filename(key, self.tokens[key]))
+
+    def _start(self, dsk):
+        if not os.path.exists(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:  # created concurrently
+                if not os.path.isdir(self.directory):
+                    raise
+        self.tokens = graph_tokens(dsk, list(dsk))
+        self.loaded = set()
+        for key in list(dsk):
+            if not istask(dsk[key]):
+                continue
+            path = self.path(key)
+            if os.path.exists(path):
+                # Load instead of compute, get_async culls what is upstream
+                dsk[key] = (_load, path)
+                self.loaded.add(key)
+
+    def _pretask(self, key, dsk, state):
+        self.starttimes[key] = default_timer()
+
+    def _posttask(self, key, value, dsk, state, id):
+        duration = default_timer() - self.starttimes.pop(key)
+        deps = state['dependencies'][key]
+        if deps:
+            duration += max(self.durations.get(k, 0) for k in deps)
+        self.durations[key] = duration
+        if key in self.loaded or key not in self.tokens:
+            return
+        if self.selected(key) or (self.min_duration is not None and
+                                  duration >= self.min_duration):
+            self.save(key, value)
+
+    def save(self, key, value):
+        """ Write value atomically, readers never see partial files """
+        path = self.path(key)
+        if os.path.exists(path):
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            os.remove(tmp)
+            return  # Unpicklable results are not checkpointed
+        try:
+            os.rename(tmp, path)
+        except OSError:  # Windows does not replace existing files
+            os.remove(tmp)
+
+    def _finish(self, dsk, state, errored):
+        self.starttimes.clear()
+        self.durations.clear()
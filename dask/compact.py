@@ -0,0 +1,493 @@
+"""
+Compact scheduler state for very large graphs
+
+The state built by ``dask.async.start_state_from_dask`` holds the dependency
+structure of a graph as dictionaries of Python sets keyed by the original dask
+keys.  For graphs of millions of tasks with tuple keys this costs a great deal
+of time and memory before the first task runs.
+
+Here we build an equivalent state that interns every key to an integer in a
+single pass over the tasks and stores
+
+1.  dependencies and dependents in CSR-style NumPy arrays (an ``indptr`` array
+    of offsets into a flat ``indices`` array)
+2.  ``waiting`` and ``waiting_data`` as NumPy countdown counters rather than
+    sets of remaining keys
+
+The state is still a dictionary with the same entries as the standard state.
+The entries that were dicts of sets are read-only mapping views that translate
+integers back into keys on access, so callbacks see exactly the same keys as
+before.  ``get_async`` also culls and orders the graph on these arrays, so it
+never builds the dicts of sets at all.
+
+Use this engine through ``get_async(..., compact=True)`` or globally with
+``dask.set_options(compact=True)``.
+
+Example
+-------
+
+>>> dsk = {'x': 1, 'y': 2, 'z': (inc, 'x'), 'w': (add, 'z', 'y')}
+>>> state = start_state_from_dask(dsk)
+>>> state['ready']
+['z']
+>>> sorted(state['dependencies']['w'])
+['y', 'z']
+>>> dict(state['waiting'])
+{'w': set(['z'])}
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import Mapping, Set
+from operator import add
+
+import numpy as np
+
+from .core import istask
+from .context import _globals
+
+
+def inc(x):
+    return x + 1
+
+
+class CSRGraph(object):
+    """ Dependency structure of a graph over integer-interned keys
+
+    Parameters
+    ----------
+
+    keys: list
+        Keys of the graph.  The position of a key is its integer id
+    indptr: np.ndarray
+        Offsets into ``indices``, of length ``len(keys) + 1``
+    indices: np.ndarray
+        Integer ids of the dependencies of each key, concatenated
+    ngraph: int, optional
+        Number of keys of the graph itself.  Keys after these only come from
+        elsewhere, e.g. a cache, and have no dependencies
+    data: np.ndarray, optional
+        Whether the value of each key is data rather than a task
+
+    Dependents are stored as the transpose of the same structure.
+
+    Examples
+    --------
+
+    >>> g = CSRGraph.from_dask({'x': 1, 'y': (inc, 'x')})
+    >>> g.dependencies(g.index['y']).tolist() == [g.index['x']]
+    True
+    >>> g.dependents(g.index['x']).tolist() == [g.index['y']]
+    True
+    """
+    def __init__(self, keys, indptr, indices, index=None, ngraph=None,
+                 data=None):
+        self.keys = keys
+        if index is None:
+            index = dict(zip(keys, range(len(keys))))
+        self.index = index
+        self.indptr = indptr
+        self.indices = indices
+        n = len(keys)
+        self.ngraph = n if ngraph is None else ngraph
+        if data is None:
+            data = np.zeros(n, dtype=bool)
+        self.data = data
+
+        counts = np.bincount(indices, minlength=n)
+        self.rindptr = np.zeros(n + 1, dtype=indptr.dtype)
+        np.cumsum(counts, out=self.rindptr[1:])
+        ndeps = np.diff(indptr)
+        owners = np.repeat(np.arange(n, dtype=indices.dtype), ndeps)
+        self.rindices = owners[np.argsort(indices, kind='mergesort')]
+
+    @classmethod
+    def from_dask(cls, dsk, extra=None):
+        """ Intern the keys of a dask graph and collect its dependencies
+
+        We walk each task once and intern its dependencies as we find them.
+        Keys found in ``extra`` (e.g. a cache) are also recognized as
+        dependencies, even if they are not in ``dsk``.
+        """
+        keys = list(dsk)
+        ngraph = len(keys)
+        index = dict(zip(keys, range(ngraph)))
+        data = np.zeros(ngraph, dtype=bool)
+        indptr = [0]
+        flat = []
+        for i, v in enumerate(dsk.values()):
+            deps = []
+            local = False       # Whether v refers to other keys of dsk
+            args = [v]
+            while args:
+                arg = args.pop()
+                if istask(arg):
+                    args.extend(arg[1:])
+                elif isinstance(arg, list):
+                    args.extend(arg)
+                else:
+                    try:
+                        j = index.get(arg)
+                    except TypeError:   # not hashable
+                        continue
+                    if j is None:
+                        if not extra or arg not in extra:
+                            continue
+                        j = index[arg] = len(keys)
+                        keys.append(arg)
+                    elif j < ngraph:
+                        local = True
+                    deps.append(j)
+            if len(deps) > 1:
+                deps = set(deps)
+            flat.extend(deps)
+            indptr.append(len(flat))
+            data[i] = not local and not istask(v)
+        # Keys only found in ``extra`` come last and have no dependencies
+        nextra = len(keys) - ngraph
+        indptr.extend([len(flat)] * nextra)
+        data = np.concatenate([data, np.zeros(nextra, dtype=bool)])
+        return cls(keys, np.array(indptr, dtype=np.int64),
+                   np.array(flat, dtype=np.int64), index=index,
+                   ngraph=ngraph, data=data)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def dependencies(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def dependents(self, i):
+        return self.rindices[self.rindptr[i]:self.rindptr[i + 1]]
+
+    def cull(self, keys):
+        """ The subgraph of the keys needed to compute ``keys``
+
+        Equivalent to ``dask.optimize.cull``.  Kept keys keep their relative
+        order, so the keys of the graph itself still come first.
+
+        >>> g = CSRGraph.from_dask({'x': 1, 'y': (inc, 'x'), 'z': 2})
+        >>> sorted(g.cull(['y']).keys)
+        ['x', 'y']
+        """
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        needed = np.zeros(len(self), dtype=bool)
+        stack = [self.index[k] for k in keys]
+        while stack:
+            i = stack.pop()
+            if not needed[i]:
+                needed[i] = True
+                stack.extend(indices[indptr[i]:indptr[i + 1]])
+
+        ids = np.flatnonzero(needed)
+        new = np.zeros(len(self), dtype=np.int64)
+        new[ids] = np.arange(len(ids))
+        ndeps = np.diff(self.indptr)
+        owners = np.repeat(needed, ndeps)
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(ndeps[ids], out=indptr[1:])
+        return CSRGraph([self.keys[i] for i in ids.tolist()], indptr,
+                        new[self.indices[owners]],
+                        ngraph=int(np.count_nonzero(ids < self.ngraph)),
+                        data=self.data[ids])
+
+    def order(self):
+        """ Static order of the keys of the graph itself
+
+        Follows ``dask.order.order``, depth first and preferring the children
+        on which most tasks depend, but walks the integer arrays rather than
+        dicts of sets.
+
+        >>> g = CSRGraph.from_dask({'a': 1, 'b': 2, 'c': (inc, 'a'),
+        ...                         'd': (add, 'b', 'c')})
+        >>> sorted(g.order().items())
+        [('a', 2), ('b', 3), ('c', 1), ('d', 0)]
+        """
+        n = self.ngraph
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        rindptr = self.rindptr.tolist()
+        rindices = self.rindices.tolist()
+
+        def dependencies(i):
+            return [j for j in indices[indptr[i]:indptr[i + 1]] if j < n]
+
+        # Toposort, dependencies first
+        owners = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        local = self.indices < n
+        num_needed = np.bincount(owners[local], minlength=n)[:n].tolist()
+        stack = [i for i in range(n) if not num_needed[i]]
+        toposort = []
+        while stack:
+            i = stack.pop()
+            toposort.append(i)
+            for j in rindices[rindptr[i]:rindptr[i + 1]]:
+                num_needed[j] -= 1
+                if not num_needed[j]:
+                    stack.append(j)
+
+        # ``ndependents`` and then ``child_max`` of dask.order
+        score = [0] * n
+        for i in reversed(toposort):
+            score[i] = 1 + sum([score[j]
+                                for j in rindices[rindptr[i]:rindptr[i + 1]]])
+        for i in toposort:
+            children = dependencies(i)
+            if children:
+                score[i] += max([score[j] for j in children])
+
+        # ``dfs`` of dask.order
+        key = score.__getitem__
+        result = dict()
+        keys = self.keys
+        seen = [False] * n
+        stack = sorted([i for i in range(n) if rindptr[i] == rindptr[i + 1]],
+                       key=key)
+        count = 0
+        while stack:
+            i = stack.pop()
+            if seen[i]:
+                continue
+            seen[i] = True
+            result[keys[i]] = count
+            count += 1
+            stack.extend(sorted([j for j in dependencies(i) if not seen[j]],
+                                key=key))
+        return result
+
+
+class KeySets(Mapping):
+    """ Read-only ``{key: set(keys)}`` view onto a CSR structure
+
+    Only entries selected by ``mask`` (if given) are visible and only members
+    selected by ``members`` (if given) are included in the sets.
+    """
+    def __init__(self, graph, indptr, indices, mask=None, members=None,
+                 count=None):
+        self.graph = graph
+        self.indptr = indptr
+        self.indices = indices
+        self.mask = mask
+        self.members = members
+        self.count = count
+
+    def _ids(self, i):
+        ids = self.indices[self.indptr[i]:self.indptr[i + 1]]
+        if self.members is not None:
+            ids = ids[self.members[ids]]
+        return ids
+
+    def __getitem__(self, key):
+        i = self.graph.index[key]
+        if self.mask is not None and not self.mask[i]:
+            raise KeyError(key)
+        keys = self.graph.keys
+        return set(keys[j] for j in self._ids(i).tolist())
+
+    def __contains__(self, key):
+        i = self.graph.index.get(key)
+        if i is None:
+            return False
+        return self.mask is None or bool(self.mask[i])
+
+    def __iter__(self):
+        keys = self.graph.keys
+        if self.mask is None:
+            return iter(keys)
+        return (keys[i] for i in np.flatnonzero(self.mask).tolist())
+
+    def __len__(self):
+        if self.mask is None:
+            return len(self.graph)
+        if self.count is not None:
+            return self.count[0]
+        return int(np.count_nonzero(self.mask))
+
+    def __eq__(self, other):
+        return dict(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class KeyFlags(Set):
+    """ Mutable set of keys backed by a boolean array
+
+    Supports the subset of the ``set`` interface used by the scheduler and its
+    callbacks.
+    """
+    def __init__(self, graph, flags=None):
+        self.graph = graph
+        if flags is None:
+            flags = np.zeros(len(graph), dtype=bool)
+        self.flags = flags
+        self.count = int(np.count_nonzero(flags))
+
+    def add(self, key):
+        i = self.graph.index[key]
+        if not self.flags[i]:
+            self.flags[i] = True
+            self.count += 1
+
+    def __contains__(self, key):
+        i = self.graph.index.get(key)
+        return i is not None and bool(self.flags[i])
+
+    def __iter__(self):
+        keys = self.graph.keys
+        return (keys[i] for i in np.flatnonzero(self.flags).tolist())
+
+    def __len__(self):
+        return self.count
+
+    def intersection(self, other):
+        return set(k for k in other if k in self)
+
+    def __repr__(self):
+        return repr(set(self))
+
+
+def start_state_from_dask(dsk, cache=None, sortkey=None, graph=None):
+    """ Start compact state from a dask
+
+    Equivalent to ``dask.async.start_state_from_dask`` but holds the
+    dependency structure in integer arrays.  Pass the ``CSRGraph`` of ``dsk``
+    as ``graph`` if you already have it, e.g. from ``CSRGraph.cull``; it must
+    know the keys of the cache.  Besides the standard entries the state
+    contains
+
+    -   graph: the ``CSRGraph`` of interned keys
+    -   nwaiting: number of dependencies of each task not yet in memory
+    -   nwaiting_data: number of dependents of each key not yet finished
+
+    Examples
+    --------
+
+    >>> dsk = {'x': 1, 'y': 2, 'z': (inc, 'x'), 'w': (add, 'z', 'y')}
+    >>> state = start_state_from_dask(dsk)
+    >>> state['ready']
+    ['z']
+    >>> sorted(state['waiting_data'])
+    ['x', 'y', 'z']
+    """
+    if cache is None:
+        cache = _globals['cache']
+    if cache is None:
+        cache = dict()
+    if graph is None:
+        graph = CSRGraph.from_dask(dsk, extra=cache)
+    if sortkey is None:
+        sortkey = graph.order().get
+    n = len(graph)
+    keys = graph.keys
+    for i in np.flatnonzero(graph.data).tolist():
+        cache[keys[i]] = dsk[keys[i]]
+
+    in_memory = np.array([k in cache for k in keys], dtype=bool)
+    in_dsk = np.zeros(n, dtype=bool)
+    in_dsk[:graph.ngraph] = True
+    is_task = in_dsk & ~graph.data
+
+    # Count dependencies of each task that are not yet in memory
+    ndeps = np.diff(graph.indptr)
+    owners = np.repeat(np.arange(n), ndeps)
+    missing = ~in_memory[graph.indices]
+    nwaiting = np.bincount(owners[missing], minlength=n).astype(np.int64)
+    nwaiting[~is_task] = 0
+
+    nwaiting_data = np.diff(graph.rindptr).astype(np.int64)
+
+    ready_ids = np.flatnonzero(is_task & (nwaiting == 0)).tolist()
+    ready = sorted([keys[i] for i in ready_ids], key=sortkey, reverse=True)
+
+    waiting_mask = nwaiting > 0
+    waiting_count = [int(np.count_nonzero(waiting_mask))]
+    waiting_data_mask = nwaiting_data > 0
+    waiting_data_count = [int(np.count_nonzero(waiting_data_mask))]
+
+    state = {'graph': graph,
+             'nwaiting': nwaiting,
+             'nwaiting_data': nwaiting_data,
+             'dependencies': KeySets(graph, graph.indptr, graph.indices,
+                                     mask=in_dsk),
+             'dependents': KeySets(graph, graph.rindptr, graph.rindices),
+             'waiting': KeySets(graph, graph.indptr, graph.indices,
+                                mask=waiting_mask, members=~in_memory,
+                                count=waiting_count),
+             'waiting_data': KeySets(graph, graph.rindptr, graph.rindices,
+                                     mask=waiting_data_mask,
+                                     members=is_task.copy(),
+                                     count=waiting_data_count),
+             'cache': cache,
+             'ready': ready,
+             'running': set(),
+             'finished': KeyFlags(graph),
+             'released': KeyFlags(graph)}
+    return state
+
+
+def release_data(key, state, delete=True):
+    """ Remove data from temporary storage
+
+    See Also
+        finish_task
+    """
+    i = state['graph'].index[key]
+    waiting_data = state['waiting_data']
+    if waiting_data.mask[i]:
+        assert not state['nwaiting_data'][i]
+        waiting_data.mask[i] = False
+        waiting_data.count[0] -= 1
+
+    state['released'].add(key)
+
+    if delete:
+        del state['cache'][key]
+
+
+def finish_task(dsk, key, state, results, sortkey, delete=True,
+                release_data=release_data):
+    """
+    Update compact execution state after a task finishes
+
+    Mutates.  This should run atomically (with a lock).
+    """
+    graph = state['graph']
+    keys = graph.keys
+    i = graph.index[key]
+    nwaiting = state['nwaiting']
+    nwaiting_data = state['nwaiting_data']
+    waiting = state['waiting']
+    waiting_data = state['waiting_data']
+
+    waiting.members[i] = False
+    waiting_data.members[i] = False
+
+    ready = []
+    for j in graph.dependents(i).tolist():
+        nwaiting[j] -= 1
+        if not nwaiting[j]:
+            waiting.mask[j] = False
+            waiting.count[0] -= 1
+            ready.append(keys[j])
+    if ready:
+        if isinstance(state['ready'], list):
+            ready = sorted(ready, key=sortkey, reverse=True)
+        state['ready'].extend(ready)
+
+    for j in graph.dependencies(i).tolist():
+        dep = keys[j]
+        if waiting_data.mask[j]:
+            nwaiting_data[j] -= 1
+            if not nwaiting_data[j] and dep not in results:
+                release_data(dep, state, delete=delete)
+        elif delete and dep not in results:
+            release_data(dep, state, delete=delete)
+
+    state['finished'].add(key)
+    state['running'].remove(key)
+
+    return state
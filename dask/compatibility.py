@@ -17,6 +17,7 @@ if PY3:
     from urllib.request import urlopen
     from urllib.parse import urlparse
     from urllib.parse import quote, unquote
+    from collections.abc import Mapping
     unicode = str
     long = int
     def apply(func, args, kwargs=None):
@@ -39,6 +40,7 @@ else:
     from urllib2 import urlopen
     from urlparse import urlparse
     from urllib import quote, unquote
+    from collections import Mapping
     unicode = unicode
     long = long
     apply = apply
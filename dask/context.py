@@ -24,6 +24,37 @@ class set_options(object):
             likely to contain functions.  Defaults to
             cloudpickle.loads/cloudpickle.dumps
         rerun_exceptions_locally - rerun failed tasks in master process
+        compact - hold scheduler state in compact integer arrays
+        batch - send groups of small tasks to workers at once
+        shared_memory - send large arrays between processes through shared
+            memory in the multiprocessing scheduler
+        resident - keep intermediate results in the worker processes of the
+            multiprocessing scheduler
+        memory_limit - bytes of intermediate results to hold in memory before
+            spilling to disk
+        priority - choose ready tasks from a heap by 'order' or 'memory'
+        retries - how many times to retry failing tasks
+        timeout - seconds after which a running task counts as failed
+        speculative - copy tasks that run this many times longer than the
+            median task of the same name
+        steal - use work-stealing worker threads in the threaded scheduler
+        checkpoint - directory or Checkpoint in which to save slow results
+            and from which to resume later runs
+        graph_cache - True or a GraphCache to reuse graph optimization and
+            analysis of repeated computations
+        precompile - compile tasks into flat lists of calls before running
+        adaptive - True or an Adaptive to change the number of running tasks
+            with measured throughput
+        resources/capacity - resources that tasks use, by key, key name or
+            function, and the amount of each available at once
+        fuse_subgraphs - fuse small subgraphs, not only linear chains, when
+            optimizing collections
+        fuse_boundaries - functions, keys or key names of tasks that
+            ``fuse_subgraphs`` never absorbs into other tasks
+        cse - merge equivalent tasks of the collections given to ``compute``,
+            False by default
+        sizes - size of the result of each task, by key or key name, to order
+            graphs for low peak memory
 
     Examples
     --------
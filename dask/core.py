@@ -214,7 +214,11 @@ def get_dependencies(dsk, task, as_list=False):
         return [] if as_list else set()
     rv = []
     for x in result:
-        rv.extend(_deps(dsk, x))
+        try:    # as _deps(dsk, x) for x neither task nor list
+            if x in dsk:
+                rv.append(x)
+        except TypeError:  # not hashable
+            pass
     return rv if as_list else set(rv)
 
 
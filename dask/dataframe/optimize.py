@@ -2,7 +2,8 @@
 from __future__ import absolute_import, division, print_function
 
 from .io import dataframe_from_ctable
-from ..optimize import cull, fuse_getitem, fuse_selections
+from ..context import _globals
+from ..optimize import cull, fuse_getitem, fuse_selections, fuse_subgraphs
 from .. import core
 
 
@@ -14,10 +15,11 @@ def fuse_castra_index(dsk):
 
 
 def optimize(dsk, keys, **kwargs):
+    analysis = kwargs.get('analysis')
     if isinstance(keys, list):
-        dsk2 = cull(dsk, list(core.flatten(keys)))
+        dsk2 = cull(dsk, list(core.flatten(keys)), analysis=analysis)
     else:
-        dsk2 = cull(dsk, [keys])
+        dsk2 = cull(dsk, [keys], analysis=analysis)
     try:
         from castra import Castra
         dsk3 = fuse_getitem(dsk2, Castra.load_partition, 3)
@@ -25,5 +27,10 @@ def optimize(dsk, keys, **kwargs):
     except ImportError:
         dsk4 = dsk2
     dsk5 = fuse_getitem(dsk4, dataframe_from_ctable, 3)
-    dsk6 = cull(dsk5, keys)
+    dsk6 = cull(dsk5, keys, analysis=analysis)
+    if kwargs.get('fuse_subgraphs', _globals.get('fuse_subgraphs')):
+        dsk6 = fuse_subgraphs(dsk6, keys,
+                              boundaries=kwargs.get('fuse_boundaries'),
+                              resources=kwargs.get('resources'),
+                              analysis=analysis)
     return dsk6
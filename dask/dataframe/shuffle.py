@@ -87,7 +87,7 @@ def set_partition(df, index, divisions, compute=False, **kwargs):
     catname2 = 'set-partition--get-categories-new-' + always_new_token
 
     dsk1 = {catname: (get_categories, df._keys()[0]),
-            p: (partd.PandasBlocks, (partd.Buffer, (partd.Dict,), (partd.File,))),
+            p: (new_partd, always_new_token),
             catname2: (new_categories, catname,
                             index.name if isinstance(index, Series) else index)}
 
@@ -139,6 +139,16 @@ def set_partition(df, index, divisions, compute=False, **kwargs):
     return DataFrame(dsk, name, columns, divisions)
 
 
+def new_partd(token):
+    """ Empty partd for one shuffle
+
+    ``token`` is unique to the shuffle so that ``dask.optimize.cse`` does not
+    share one partd between two shuffles.
+    """
+    import partd
+    return partd.PandasBlocks(partd.Buffer(partd.Dict(), partd.File()))
+
+
 def barrier(args):
     list(args)
     return 0
@@ -151,6 +161,8 @@ def _set_partition(df, index, divisions, p):
     shards = shard_df_on_index(df, divisions[1:-1])
     p.append(dict(enumerate(shards)))
 
+_set_partition._cse = False     # Appends to partd, see dask.optimize.cse
+
 
 def _set_collect(group, p, barrier_token, columns):
     """ Get new partition dataframe from partd """
@@ -190,8 +202,7 @@ def shuffle(df, index, npartitions=None):
 
     import partd
     p = ('zpartd-' + always_new_token,)
-    dsk1 = {p: (partd.PandasBlocks, (partd.Buffer, (partd.Dict,),
-                                                   (partd.File,)))}
+    dsk1 = {p: (new_partd, always_new_token)}
 
     # Partition data on disk
     name = 'shuffle-partition-' + always_new_token
@@ -245,6 +256,8 @@ def partition(df, index, npartitions, p):
                                             if i in groups.groups)
     p.append(d)
 
+partition._cse = False  # Appends to partd, see dask.optimize.cse
+
 
 def collect(group, p, barrier_token):
     """ Collect partitions from partd, yield dataframes """
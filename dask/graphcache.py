@@ -0,0 +1,141 @@
+"""
+Reuse graph analysis across repeated computations
+
+Dashboards and interactive sessions compute the same collections again and
+again.  Each time we optimize the graph (``cull``, ``fuse``, ``inline`` ...),
+then the scheduler culls it again, orders it with ``dask.order`` and finds the
+dependencies of every task.  For large graphs this analysis can take longer
+than running the tasks.
+
+A ``GraphCache`` keeps the results of this analysis for the most recently
+used graphs.  We identify a graph by the set of its keys and the requested
+output keys, and check that every task is the very same object as before,
+which holds when we compute the same collection objects again.  Rebuilt
+collections, or graphs changed in place, miss the cache.
+
+Enable it with ``set_options``
+
+>>> with set_options(graph_cache=True):  # doctest: +SKIP
+...     x.sum().compute()
+...     x.sum().compute()   # skips optimization and graph analysis
+>>> graph_cache.info()  # doctest: +SKIP
+CacheInfo(hits=2, misses=2, maxsize=32, currsize=2)
+
+The cache holds references to the graphs, and so to any data in them.  Use a
+small ``maxsize`` for graphs that hold large arrays.
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import namedtuple
+import threading
+
+from .context import _globals
+from .core import get_dependencies, inc
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def _hashable(keys):
+    """ Nested lists of keys as nested tuples
+
+    >>> _hashable([['x', 'y'], [('z', 0)]])
+    (('x', 'y'), (('z', 0),))
+    """
+    if isinstance(keys, list):
+        return tuple(map(_hashable, keys))
+    return keys
+
+
+class GraphCache(object):
+    """ Least recently used cache of graph analysis results
+
+    Parameters
+    ----------
+
+    maxsize: int
+        Number of results to keep
+
+    Examples
+    --------
+
+    >>> gc = GraphCache(maxsize=2)
+    >>> dsk = {'x': 1, 'y': (inc, 'x')}
+    >>> gc.get('deps', dsk, 'y', lambda: sorted(get_dependencies(dsk, 'y')))
+    ['x']
+    >>> gc.get('deps', dict(dsk), 'y', lambda: 'not called')
+    ['x']
+    >>> gc.info()
+    CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+    """
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.data = dict()      # key -> (tick, graph, value)
+        self.hits = 0
+        self.misses = 0
+        self.tick = 0
+        self.lock = threading.Lock()
+
+    def get(self, kind, dsk, keys, compute, extra=()):
+        """ Result of ``compute()``, an analysis of ``dsk`` for ``keys``
+
+        Parameters
+        ----------
+
+        kind: hashable
+            The kind of analysis, e.g. an optimization function
+        dsk: dict
+            The graph, which ``compute`` must not change
+        keys: key or nested list of keys
+            The output keys
+        compute: callable
+            Computes the result from scratch, takes no arguments
+        extra: tuple of hashables, optional
+            Other parameters of the analysis
+        """
+        try:
+            key = (kind, _hashable(keys), extra, frozenset(dsk))
+            hash(key)
+        except TypeError:
+            return compute()
+        with self.lock:
+            self.tick += 1
+            entry = self.data.get(key)
+            if entry is not None:
+                graph = entry[1]
+                if all(dsk[k] is v for k, v in graph.items()):
+                    self.data[key] = (self.tick,) + entry[1:]
+                    self.hits += 1
+                    return entry[2]
+            self.misses += 1
+        graph = dict(dsk)
+        value = compute()
+        with self.lock:
+            self.data[key] = (self.tick, graph, value)
+            while len(self.data) > self.maxsize:
+                oldest = min(self.data, key=lambda k: self.data[k][0])
+                del self.data[oldest]
+        return value
+
+    def info(self):
+        """ Hits, misses and size, like ``functools.lru_cache`` """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.data))
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = self.misses = 0
+
+
+graph_cache = GraphCache()
+
+
+def current_graph_cache():
+    """ The ``GraphCache`` set with ``set_options(graph_cache=...)``, if any
+
+    ``True`` selects the default ``dask.graphcache.graph_cache``.
+    """
+    gc = _globals.get('graph_cache')
+    if gc is True:
+        return graph_cache
+    return gc or None
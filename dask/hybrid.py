@@ -0,0 +1,348 @@
+"""
+A scheduler that runs each task in a thread or in a process
+
+NumPy and pandas functions release the GIL and run well in threads, where
+they share memory with no serialization.  Pure Python functions, like
+``json.loads``, hold the GIL and only run in parallel in separate processes.
+Graphs often mix both, e.g. a bag of parsed JSON records turned into a
+dataframe.
+
+This scheduler runs a thread pool and the persistent process pool of
+``dask.multiprocessing`` side by side and routes every task to one of them by
+its function:
+
+1.  Explicitly with the ``routes=`` keyword, a dict mapping functions or
+    function names to ``'threads'`` or ``'processes'``
+2.  By annotation with the ``releases_gil`` and ``holds_gil`` decorators
+3.  Otherwise by measurement: we run unknown functions in threads and record
+    the ratio of CPU time to wall time of each task that runs alongside
+    others.  A function that gets much less CPU time than it spends waiting
+    is contending for the GIL and moves to processes (see ``GilMonitor``).
+    This needs a per-thread CPU clock, see ``thread_clock``.
+
+Results of tasks that run in processes stay in the worker processes, as with
+``resident=True`` in ``dask.multiprocessing``.  Data only moves when a task in
+one pool needs the result of a task in the other, or at the end.
+
+>>> @holds_gil
+... def parse(line):
+...     return json.loads(line)
+
+>>> dsk = {'a': (parse, '[1, 2]'), 'b': (sum, 'a')}
+>>> get(dsk, 'b')  # doctest: +SKIP
+3
+"""
+from __future__ import absolute_import, division, print_function
+
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
+
+from . import threaded
+from .async import get_async, execute_batch, nested_get
+from .context import _globals
+from .core import istask, flatten
+from .multiprocessing import default_pool, ResidentData, Resident
+from .utils import funcname
+
+def thread_clock():
+    """ Function giving the CPU seconds of the current thread, or None
+
+    We use ``time.thread_time`` on Python 3.7+, ``time.clock_gettime`` with
+    ``CLOCK_THREAD_CPUTIME_ID`` on Python 3.3+,
+    ``resource.getrusage(RUSAGE_THREAD)`` on Linux with Python 3.2+ and
+    ``clock_gettime`` of the C library through ``ctypes`` on Linux otherwise.
+    Where none of these exist, e.g. Python 2 on Windows or OSX, we return
+    None and only route by ``routes=`` and annotations.
+    """
+    import time
+    if hasattr(time, 'thread_time'):
+        return time.thread_time
+    if hasattr(time, 'clock_gettime') and hasattr(time,
+                                                  'CLOCK_THREAD_CPUTIME_ID'):
+        return lambda: time.clock_gettime(time.CLOCK_THREAD_CPUTIME_ID)
+    try:
+        import resource
+        who = resource.RUSAGE_THREAD
+    except (ImportError, AttributeError):
+        return _ctypes_thread_clock()
+
+    def getrusage_time():
+        usage = resource.getrusage(who)
+        return usage.ru_utime + usage.ru_stime
+    return getrusage_time
+
+
+def _ctypes_thread_clock():
+    """ ``clock_gettime(CLOCK_THREAD_CPUTIME_ID)`` of the C library on Linux
+
+    Returns None elsewhere, or if we can not find the function.
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+    except ImportError:
+        return None
+
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    clock_gettime = None
+    for name in ['c', 'rt']:    # In librt before glibc 2.17
+        path = ctypes.util.find_library(name)
+        if path is None:
+            continue
+        try:
+            clock_gettime = ctypes.CDLL(path, use_errno=True).clock_gettime
+            break
+        except (OSError, AttributeError):
+            continue
+    if clock_gettime is None:
+        return None
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+    clock_gettime.restype = ctypes.c_int
+    CLOCK_THREAD_CPUTIME_ID = 3
+
+    def ctypes_time():
+        t = timespec()
+        if clock_gettime(CLOCK_THREAD_CPUTIME_ID, ctypes.byref(t)) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return t.tv_sec + t.tv_nsec * 1e-9
+    return ctypes_time
+
+
+thread_time = thread_clock()
+
+
+THREADS = 'threads'
+PROCESSES = 'processes'
+
+
+def releases_gil(func):
+    """ Mark a function to run in threads by the hybrid scheduler """
+    func._dask_pool = THREADS
+    return func
+
+
+def holds_gil(func):
+    """ Mark a function to run in processes by the hybrid scheduler """
+    func._dask_pool = PROCESSES
+    return func
+
+
+def _functions(func):
+    """ A function and the functions that it wraps, e.g. in partials """
+    yield func
+    while hasattr(func, 'func'):
+        func = func.func
+        yield func
+
+
+def function_key(func):
+    """ Identify a function by name across calls
+
+    >>> function_key(json.loads)
+    'json.loads'
+    """
+    func = list(_functions(func))[-1]
+    module = getattr(func, '__module__', None)
+    name = funcname(func)
+    return '%s.%s' % (module, name) if module else name
+
+
+class GilMonitor(object):
+    """ Learn which functions hold the GIL from how they run in threads
+
+    When a task runs alongside other tasks, we record the ratio of the CPU
+    time of its thread to its wall time.  Functions that release the GIL get
+    nearly all of their wall time on a core, those that hold it wait for the
+    other threads.  Once we have ``samples`` such ratios of a function, we
+    route it to processes if their median is below ``threshold``.
+
+    On machines with a single core all threads share one core anyway, so we
+    learn nothing.  Functions that wait on I/O also get little CPU time, mark
+    them with ``releases_gil``.
+
+    >>> monitor = GilMonitor(ncores=4)
+    >>> for i in range(3):
+    ...     monitor.record('json.loads', cpu=0.1, wall=0.4, concurrent=True)
+    >>> monitor.route('json.loads')
+    'processes'
+    >>> monitor.route('numpy.dot') is None
+    True
+    """
+    def __init__(self, samples=3, threshold=0.5, ncores=None):
+        self.samples = samples
+        self.threshold = threshold
+        self.ncores = ncores or multiprocessing.cpu_count()
+        self.ratios = dict()     # function key -> recent ratios
+        self.lock = threading.Lock()
+        self.running = 0
+
+    def route(self, name):
+        """ 'threads' or 'processes' once we know, otherwise None """
+        ratios = self.ratios.get(name)
+        if not ratios or len(ratios) < self.samples:
+            return None
+        ratios = sorted(ratios)
+        if ratios[len(ratios) // 2] < self.threshold:
+            return PROCESSES
+        return THREADS
+
+    def record(self, name, cpu, wall, concurrent):
+        if not concurrent or wall <= 0 or self.ncores < 2:
+            return
+        with self.lock:
+            ratios = self.ratios.setdefault(name, [])
+            ratios.append(cpu / wall)
+            del ratios[:-self.samples]
+
+    def execute(self, name, func, *args):
+        """ Run ``func(*args)`` in this thread and record its GIL use """
+        if thread_time is None:
+            return func(*args)
+        with self.lock:
+            self.running += 1
+            concurrent = self.running > 1
+        start, cpu = default_timer(), thread_time()
+        try:
+            return func(*args)
+        finally:
+            cpu = thread_time() - cpu
+            wall = default_timer() - start
+            with self.lock:
+                concurrent = concurrent or self.running > 1
+                self.running -= 1
+            self.record(name, cpu, wall, concurrent)
+
+
+gil_monitor = GilMonitor()
+
+
+def route(task, routes=None, monitor=None):
+    """ Whether to run a task in 'threads' or in 'processes'
+
+    >>> route((json.loads, '[1]'), routes={'json.loads': 'processes'})
+    'processes'
+    >>> route((holds_gil(lambda x: x), 1))
+    'processes'
+    >>> route((sum, [1, 2]))
+    'threads'
+    """
+    if not istask(task):
+        return THREADS
+    func = task[0]
+    if routes:
+        for f in _functions(func):
+            try:
+                if f in routes:
+                    return routes[f]
+            except TypeError:  # unhashable
+                pass
+        name = function_key(func)
+        for k in (name, funcname(func)):
+            if k in routes:
+                return routes[k]
+    for f in _functions(func):
+        pool = getattr(f, '_dask_pool', None)
+        if pool is not None:
+            return pool
+    if monitor is not None:
+        return monitor.route(function_key(func)) or THREADS
+    return THREADS
+
+
+def _get_id():
+    return os.getpid(), threading.current_thread().ident
+
+
+def get(dsk, result, num_workers=None, num_processes=None, routes=None,
+        monitor=gil_monitor, **kwargs):
+    """ Hybrid thread and process implementation of dask.get
+
+    Parameters
+    ----------
+
+    dsk: dict
+        A dask dictionary specifying a workflow
+    result: key or list of keys
+        Keys corresponding to desired data
+    num_workers: integer (optional)
+        The number of threads, defaults to the number of cores
+    num_processes: integer (optional)
+        The number of worker processes, defaults to the number of cores
+    routes: dict (optional)
+        Maps functions, or their names, to ``'threads'`` or ``'processes'``
+    monitor: GilMonitor or None (optional)
+        Learns where to run functions without a route or annotation.  By
+        default we share what we learn between calls.  With None these
+        functions run in threads.
+
+    Examples
+    --------
+
+    >>> dsk = {'x': 1, 'y': 2, 'z': (json.loads, '3'), 'w': (sum, ['x', 'z'])}
+    >>> get(dsk, 'w', routes={json.loads: 'processes'})  # doctest: +SKIP
+    4
+
+    Results stay in the workers, so we support no ``cache``.  Posttask
+    callbacks fetch each result that they see.
+    """
+    if kwargs.get('cache') is not None or _globals['cache'] is not None:
+        raise ValueError("The hybrid scheduler keeps results in the workers "
+                         "and does not support a cache")
+    if num_workers:
+        thread_pool = ThreadPool(num_workers)
+    else:
+        thread_pool = threaded.default_pool
+    pool = default_pool(num_processes)
+    queue = pool.queue()
+    data = kwargs['cache'] = ResidentData(pool, queue)
+
+    def localize(d):
+        """ Fetch inputs of a thread task held by worker processes """
+        remote = [k for k, v in d.items() if isinstance(v, Resident)]
+        if remote:
+            values = data.gather(remote)
+            for k in remote:
+                d[k] = values[k]
+                # Keep the holders so that the workers free it later
+                dict.__setitem__(data, k, values[k])
+
+    def apply_async(func, args=(), kwds={}):
+        if func is execute_batch:
+            tasks = [task for _, task, _ in args[0]]
+            datas = [d for _, _, d in args[0]]
+        else:
+            tasks, datas = [args[1]], [args[2]]
+        if any(route(t, routes, monitor) == PROCESSES for t in tasks):
+            return data.apply_async(func, args, kwds)
+        for d in datas:
+            localize(d)
+        if monitor is not None and istask(tasks[0]):
+            args = [function_key(tasks[0][0]), func] + list(args)
+            func = monitor.execute
+        thread_pool.apply_async(func, args, kwds)
+
+    try:
+        get_async(apply_async, len(thread_pool._pool) + pool.num_workers,
+                  dsk, result, queue=queue, get_id=_get_id, **kwargs)
+        keys = list(flatten(result)) if isinstance(result, list) else [result]
+        return nested_get(result, data.gather(keys))
+    except BaseException:
+        queue.cancel()      # Drop tasks queued in the worker processes
+        raise
+    finally:
+        data.clear_workers()
+        queue.close()
+        if num_workers:
+            thread_pool.close()
+
+get._takes_analysis = True  # see dask.base._scheduler_kwargs
@@ -217,6 +217,7 @@ class Value(base.Base):
     _optimize = staticmethod(lambda dsk, keys, **kwargs: dsk)
     _finalize = staticmethod(lambda a, r: r[0])
     _default_get = staticmethod(threaded.get)
+    _cse = False    # Tasks of ``pure=False`` calls differ from call to call
 
     def __init__(self, name, dasks):
         object.__setattr__(self, '_key', name)
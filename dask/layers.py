@@ -0,0 +1,305 @@
+"""
+Graphs of symbolic layers, merged by reference
+
+Defining a large array expression is slow: every operation builds one task
+per block and merges the graphs of its inputs into a new dict, which copies
+every task of every input.  Defining ``x + 1`` on an array of 100,000 blocks
+builds 100,000 tasks and copies all the tasks of ``x``.
+
+A ``LayeredGraph`` holds one layer per operation, a mapping of keys to tasks,
+and the names of the layers on which each layer depends.  A new operation
+adds its layer and refers to the layers of its inputs rather than copying
+their tasks.  A ``Layer`` is a symbolic layer that builds its tasks only when
+first needed, e.g. ``dask.array.core.Blockwise`` for ``top``, or ``Deferred``
+for any function that builds a dict of tasks.
+
+>>> inputs = {('x', 0): 1, ('x', 1): 2}
+>>> layer = Deferred(lambda: dict((('y', i), (inc, ('x', i)))
+...                               for i in range(2)))
+>>> dsk = LayeredGraph({'x': inputs, 'y': layer}, {'y': set(['x'])})
+>>> dsk[('y', 1)]  # doctest: +ELLIPSIS
+(<function inc ...>, ('x', 1))
+>>> sorted(dsk)
+[('x', 0), ('x', 1), ('y', 0), ('y', 1)]
+
+A ``LayeredGraph`` is a read only mapping of keys to tasks, like the dict
+graphs that schedulers and optimizations take.  With ``cull`` we drop the
+layers that the requested keys do not need and build only the tasks that the
+keys reach.
+"""
+from __future__ import absolute_import, division, print_function
+
+from .compatibility import Mapping
+from .core import flatten, istask, inc
+
+
+def _layer_name(key):
+    return key[0] if type(key) is tuple and key else key
+
+
+class Layer(Mapping):
+    """ Mapping of keys to tasks that builds its tasks when first needed
+
+    Subclasses implement ``_build``, which returns a dict of all tasks.  They
+    may also answer ``__getitem__`` and ``__contains__`` for single keys
+    without building the others.
+    """
+    _tasks = None
+
+    def _materialize(self):
+        if self._tasks is None:
+            self._tasks = self._build()
+        return self._tasks
+
+    def _build(self):
+        raise NotImplementedError()
+
+    def __getitem__(self, key):
+        return self._materialize()[key]
+
+    def __contains__(self, key):
+        return key in self._materialize()
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __len__(self):
+        return len(self._materialize())
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_tasks', None)     # Build again on the other side
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+class Deferred(Layer):
+    """ Layer of the tasks returned by ``func(*args, **kwargs)``
+
+    We call ``func`` when we first need a task.
+
+    >>> layer = Deferred(dict, [('x', 1)])
+    >>> layer._tasks is None
+    True
+    >>> layer['x']
+    1
+    """
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def _build(self):
+        return self.func(*self.args, **self.kwargs)
+
+
+def _add_layer(layers, dependencies, name, layer, deps):
+    """ Add a layer, merging it with a different layer of the same name """
+    other = layers.get(name)
+    if other is not None and other is not layer:
+        merged = dict(other)
+        merged.update(layer)
+        layer = merged
+        deps = set(deps) | dependencies[name]
+    layers[name] = layer
+    dependencies[name] = set(deps)
+
+
+class LayeredGraph(Mapping):
+    """ Graph of layers that refer to the layers of their inputs
+
+    Parameters
+    ----------
+
+    layers: dict
+        Mapping of keys to tasks, a dict or a ``Layer``, by layer name
+    dependencies: dict
+        Names of the layers on which each layer depends
+
+    We find a key in the layer with the name of the key, ``key[0]`` for tuple
+    keys, and otherwise search all layers.  Layers may share keys.
+
+    Examples
+    --------
+
+    >>> dsk = LayeredGraph.from_collections('y', {('y', 0): (inc, ('x', 0))},
+    ...                                     [{('x', 0): 1}])
+    >>> dict(dsk) == {('x', 0): 1, ('y', 0): (inc, ('x', 0))}
+    True
+    """
+    def __init__(self, layers, dependencies=None):
+        self.layers = layers
+        self.dependencies = dependencies or dict()
+        self._keys = None
+
+    @classmethod
+    def from_collections(cls, name, layer, dependencies=()):
+        """ Graph of a new layer on top of the graphs of other collections
+
+        ``dependencies`` are collections, or their graphs.  We take the
+        layers of their ``LayeredGraph`` by reference.  A graph that is a
+        plain dict becomes a single layer named after its collection.
+        """
+        layers = dict()
+        graph_dependencies = dict()
+        own = set()
+        for i, dep in enumerate(dependencies):
+            graph = getattr(dep, 'dask', dep)
+            dep_name = getattr(dep, 'name', None)
+            if isinstance(graph, LayeredGraph):
+                for n, l in graph.layers.items():
+                    _add_layer(layers, graph_dependencies, n, l,
+                               graph.dependencies.get(n, ()))
+                if dep_name in graph.layers:
+                    own.add(dep_name)
+                else:
+                    own.update(graph._roots())
+            else:
+                if dep_name is None or dep_name == name:
+                    dep_name = '%s-input-%d' % (name, i)
+                _add_layer(layers, graph_dependencies, dep_name, graph, ())
+                own.add(dep_name)
+        _add_layer(layers, graph_dependencies, name, layer, own)
+        return cls(layers, graph_dependencies)
+
+    def _roots(self):
+        """ Names of the layers on which no other layer depends """
+        used = set()
+        for deps in self.dependencies.values():
+            used.update(deps)
+        return [name for name in self.layers if name not in used]
+
+    def _find(self, key):
+        """ Layer that holds key, or None """
+        layer = self.layers.get(_layer_name(key))
+        if layer is not None and key in layer:
+            return layer
+        for layer in self.layers.values():
+            if key in layer:
+                return layer
+        return None
+
+    def __getitem__(self, key):
+        layer = self.layers.get(_layer_name(key))
+        if layer is not None:
+            try:
+                return layer[key]
+            except KeyError:
+                pass
+        for layer in self.layers.values():
+            if key in layer:
+                return layer[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            return self._find(key) is not None
+        except TypeError:   # unhashable
+            return False
+
+    def __iter__(self):
+        if self._keys is None:
+            if len(self.layers) == 1:
+                return iter(next(iter(self.layers.values())))
+            seen = set()
+            keys = []
+            for layer in self.layers.values():
+                for k in layer:
+                    if k not in seen:
+                        seen.add(k)
+                        keys.append(k)
+            self._keys = keys
+        return iter(self._keys)
+
+    def __len__(self):
+        if len(self.layers) == 1:
+            return len(next(iter(self.layers.values())))
+        return len(list(iter(self)))
+
+    def __reduce__(self):
+        return (LayeredGraph, (self.layers, self.dependencies))
+
+    def copy(self):
+        """ A dict of all tasks """
+        return dict(self.items())
+
+    def cull_layers(self, keys):
+        """ Graph of only the layers that ``keys`` need
+
+        Returns self when some key is not in the layer of its name.
+
+        >>> dsk = LayeredGraph({'x': {'x': 1}, 'y': {'y': (inc, 'x')},
+        ...                     'z': {'z': (inc, 'x')}},
+        ...                    {'y': set(['x']), 'z': set(['x'])})
+        >>> sorted(dsk.cull_layers('y').layers)
+        ['x', 'y']
+        """
+        if not isinstance(keys, list):
+            keys = [keys]
+        stack = []
+        for key in flatten(keys):
+            name = _layer_name(key)
+            if name not in self.layers or key not in self.layers[name]:
+                return self
+            stack.append(name)
+        needed = set()
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.dependencies.get(name, ()))
+        if len(needed) == len(self.layers):
+            return self
+        return LayeredGraph(dict((n, self.layers[n]) for n in needed),
+                            dict((n, self.dependencies.get(n, set()))
+                                 for n in needed))
+
+    def cull(self, keys):
+        """ Dict of only the tasks that ``keys`` need
+
+        We drop the layers that ``keys`` do not need and then walk from
+        ``keys`` through their dependencies, so a layer that answers single
+        keys, like ``Blockwise``, builds only the tasks that we reach.
+
+        >>> dsk = LayeredGraph({'x': {'x': 1, 'w': 2}, 'y': {'y': (inc, 'x')}},
+        ...                    {'y': set(['x'])})
+        >>> sorted(dsk.cull('y').items())  # doctest: +ELLIPSIS
+        [('x', 1), ('y', (<function inc ...>, 'x'))]
+        """
+        if not isinstance(keys, list):
+            keys = [keys]
+        graph = self.cull_layers(keys)
+        result = dict()
+        stack = list(flatten(keys))
+        while stack:
+            key = stack.pop()
+            if key in result:
+                continue
+            args = [graph[key]]
+            result[key] = args[0]
+            while args:     # as get_dependencies, building each task once
+                arg = args.pop()
+                if istask(arg):
+                    args.extend(arg[1:])
+                elif isinstance(arg, list):
+                    args.extend(arg)
+                else:
+                    try:
+                        if arg in result or arg in graph:
+                            stack.append(arg)
+                    except TypeError:   # unhashable
+                        pass
+        return result
+
+
+def materialize(dsk, keys):
+    """ Tasks of ``dsk`` that ``keys`` need
+
+    We cull a ``LayeredGraph`` to a dict, building only the tasks that we
+    reach.  Other graphs we return as they are.
+    """
+    if isinstance(dsk, LayeredGraph):
+        return dsk.cull(keys)
+    return dsk
@@ -1,10 +1,31 @@
 from __future__ import absolute_import, division, print_function
 
+from collections import deque, namedtuple
+from functools import partial as _partial
+from hashlib import md5
+from itertools import count
+import atexit
+import mmap
+import os
+import socket
+import sys
+import tempfile
+import threading
+import traceback
+import types
+
 from toolz import curry, pipe, partial
 from .optimize import fuse, cull
 import multiprocessing
-from .async import get_async # TODO: get better get
+from multiprocessing.connection import Listener, Client
+from .async import (get_async, execute_batch, BatchResult,  # TODO: get better get
+        nested_get)
+from .core import flatten
+from .sizeof import sizeof
+from .compatibility import Empty, BytesIO
 from .context import _globals
+from .graphcache import current_graph_cache
+from .utils import ignoring
 from sys import version
 
 if version < '3':
@@ -21,6 +42,11 @@ copyreg.pickle(type(set.union), _reduce_method_descriptor)
 import pickle
 import cloudpickle
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 def _dumps(x):
     return cloudpickle.dumps(x, protocol=pickle.HIGHEST_PROTOCOL)
 
@@ -31,10 +57,852 @@ def _process_get_id():
     return multiprocessing.current_process().ident
 
 
+"""
+Persistent Process Pool
+-----------------------
+
+``multiprocessing.Pool`` needs a ``multiprocessing.Manager`` queue to send
+results back to the scheduler, and making a new pool for every call is slow.
+Instead we keep a long-lived pool of worker processes.  Each worker has its own
+inbox queue and all workers share one result queue, inherited at startup.
+
+Several computations may share a pool.  Each computation reads from its own
+channel of the shared result queue (see ``ProcessPool.queue``).  The
+``ResultQueue`` handed to ``execute_task`` pickles into a reference to the
+worker's result queue, tagged with its channel.
+
+Functions within tasks are serialized once per distinct function and sent to a
+worker only the first time that worker needs them.  Workers keep the
+deserialized functions, keyed by a hash of their serialized form, so repeated
+computations with the same functions skip deserialization.
+"""
+
+_function_types = (types.FunctionType, _partial, curry)
+
+
+"""
+Shared Memory
+-------------
+
+Pickling large NumPy arrays copies them several times on their way through
+the queues.  When ``shared_memory`` is set we instead write arrays larger than
+a threshold once into a file in ``/dev/shm`` (a memory-backed file system) and
+send only a small descriptor.  The receiving side maps the file with
+``np.memmap`` in copy-on-write mode.  This covers pandas objects as well, as
+their blocks pickle as NumPy arrays.
+
+Arrays sent from the scheduler to a worker that are already mapped from such a
+file are not copied at all; the worker maps the same file.  Files written only
+to carry task arguments are removed by the worker right after mapping them.
+Files holding results belong to the computation.  They are removed when the
+scheduler releases the result (see ``SharedMemoryCache``) and at the end of
+the computation.  Arrays that are still referenced remain valid after their
+file is removed.
+"""
+
+def _shm_directory():
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def _shm_root(x):
+    """ The memmap that owns the mapping behind array ``x``, if any """
+    while isinstance(x, np.ndarray):
+        if isinstance(x, np.memmap) and isinstance(x.base, mmap.mmap):
+            return x
+        x = x.base
+    return None
+
+
+def _address(x):
+    return x.__array_interface__['data'][0]
+
+
+def _dump_shared(x, threshold, reuse=False, temporary=False, files=None):
+    """ Descriptor of array ``x`` in shared memory
+
+    Returns None if ``x`` should be pickled normally.  If ``reuse`` then an
+    array already mapped from a file in shared memory references that file.
+    Otherwise we write ``x`` into a new file, which ``_load_shared`` removes
+    after mapping if ``temporary``.
+    """
+    if (not isinstance(x, np.ndarray) or type(x) not in (np.ndarray, np.memmap)
+            or x.dtype.hasobject or not x.size or x.nbytes < threshold):
+        return None
+    directory = _shm_directory()
+    order = 'F' if (x.flags.f_contiguous and not x.flags.c_contiguous) else 'C'
+    if reuse and (x.flags.c_contiguous or x.flags.f_contiguous):
+        root = _shm_root(x)
+        if (root is not None and root.filename and
+                os.path.dirname(root.filename) == directory):
+            offset = _address(x) - _address(root) + root.offset
+            return ('shm', root.filename, x.dtype, x.shape, order, offset,
+                    False)
+    fd, filename = tempfile.mkstemp(prefix='dask-', dir=directory)
+    if files is not None:
+        files.append(filename)
+    with os.fdopen(fd, 'wb') as f:
+        if order == 'F':
+            x.T.tofile(f)
+        else:
+            np.ascontiguousarray(x).tofile(f)
+    return ('shm', filename, x.dtype, x.shape, order, 0, temporary)
+
+
+def _load_shared(pid, files=None):
+    """ Map an array from its descriptor """
+    _, filename, dtype, shape, order, offset, temporary = pid
+    x = np.memmap(filename, dtype=dtype, mode='c', offset=offset,
+                  shape=shape, order=order)
+    if temporary:
+        with ignoring(OSError):
+            os.remove(filename)
+    elif files is not None:
+        files.add(filename)
+    return x
+
+
+def _shared_files(value):
+    """ Names of shared memory files mapped by arrays within ``value``
+
+    Looks within NumPy arrays, pandas objects, lists, tuples and dicts.
+    """
+    if np is None:
+        return []
+    if isinstance(value, np.ndarray):
+        root = _shm_root(value)
+        return [root.filename] if root is not None else []
+    if isinstance(value, (list, tuple)):
+        return [fn for v in value for fn in _shared_files(v)]
+    if isinstance(value, dict):
+        return [fn for v in value.values() for fn in _shared_files(v)]
+    manager = getattr(value, '_mgr', None) or getattr(value, '_data', None)
+    blocks = getattr(manager, 'blocks', None)
+    if blocks is not None:
+        return [fn for b in blocks for fn in _shared_files(b.values)]
+    return []
+
+
+class _Pickler(cloudpickle.CloudPickler):
+    """ Pickler for sending tasks to workers
+
+    Replaces functions by tokens and, if ``threshold`` is given, large arrays
+    by shared memory descriptors.
+    """
+    def __init__(self, file, token, threshold=None):
+        cloudpickle.CloudPickler.__init__(self, file,
+                                          protocol=pickle.HIGHEST_PROTOCOL)
+        self.token = token
+        self.threshold = threshold
+
+    def persistent_id(self, obj):
+        if isinstance(obj, _function_types):
+            return self.token(obj)
+        if self.threshold is not None and np is not None:
+            return _dump_shared(obj, self.threshold, reuse=True,
+                                temporary=True)
+        return None
+
+
+class _ResultPickler(pickle.Pickler):
+    """ Pickler for sending results from workers
+
+    Places large arrays into shared memory files, listed in ``files``.
+    """
+    def __init__(self, file, threshold, files):
+        pickle.Pickler.__init__(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.threshold = threshold
+        self.files = files
+
+    def persistent_id(self, obj):
+        return _dump_shared(obj, self.threshold, files=self.files)
+
+
+class _Unpickler(pickle.Unpickler):
+    """ Unpickler that resolves function tokens and shared memory arrays
+
+    Names of shared memory files that we now own are added to ``files``.
+    """
+    def __init__(self, file, functions=None, files=None):
+        pickle.Unpickler.__init__(self, file)
+        self.functions = functions
+        self.files = files
+
+    def persistent_load(self, pid):
+        if isinstance(pid, tuple) and pid[0] == 'shm':
+            return _load_shared(pid, files=self.files)
+        return self.functions[pid]
+
+
+# Set within each worker process by ``_worker``
+_worker_results = None
+_worker_index = None
+
+
+class _WorkerQueue(object):
+    """ A channel of the result queue as seen from within a worker """
+    def __init__(self, channel, threshold=None):
+        self.channel = channel
+        self.threshold = threshold
+
+    def put(self, msg):
+        # Serialize eagerly so that unpicklable results raise in the caller
+        if self.threshold is None or np is None:
+            payload = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            f = BytesIO()
+            files = []
+            try:
+                _ResultPickler(f, self.threshold, files).dump(msg)
+            except Exception:
+                for fn in files:
+                    with ignoring(OSError):
+                        os.remove(fn)
+                raise
+            payload = f.getvalue()
+        _worker_results.put((_worker_index, self.channel, payload))
+
+
+def _worker(index, inbox, results, address=None):
+    """ Main loop of a worker process
+
+    Besides tasks the inbox receives ``('free', channel, keys)`` and
+    ``('clear', channel)`` messages to release resident data (see below), and
+    ``('cancel', channel)`` to skip the remaining tasks of a computation.
+    """
+    global _worker_results, _worker_index
+    _worker_results = results
+    _worker_index = index
+    listener = _serve_data(address) if address else None
+    functions = dict()
+    cancelled = set()
+    pending = deque()
+    while True:
+        # Look ahead for cancellations sent after tasks that are still queued
+        while True:
+            try:
+                msg = inbox.get_nowait()
+            except Empty:
+                break
+            if msg is not None and msg[0] == 'cancel':
+                cancelled.add(msg[1])
+            else:
+                pending.append(msg)
+        msg = pending.popleft() if pending else inbox.get()
+        if msg is None:
+            break
+        if msg[0] == 'cancel':
+            cancelled.add(msg[1])
+            continue
+        if msg[0] == 'free':
+            for key in msg[2]:
+                _worker_data.pop((msg[1], key), None)
+            continue
+        if msg[0] == 'clear':
+            for k in [k for k in _worker_data if k[0] == msg[1]]:
+                del _worker_data[k]
+            continue
+        _, channel, payload, reset, new = msg
+        try:
+            if reset:
+                functions.clear()
+            for token, sfunc in new:
+                functions[token] = _loads(sfunc)
+            if channel in cancelled:
+                # Answer anyway so that the pool counts this worker as idle
+                results.put((index, channel, _dumps(None)))
+                continue
+            func, args, kwds = _Unpickler(BytesIO(payload), functions).load()
+            func(*args, **kwds)
+        except Exception as e:
+            # Failures outside of tasks, like deserialization errors
+            tb = ''.join(traceback.format_tb(sys.exc_info()[2]))
+            _WorkerQueue(channel).put((None, e, tb, None))
+    if listener is not None:
+        listener.close()
+
+
+"""
+Resident Data
+-------------
+
+Normally every result travels back to the scheduler process and then out again
+to whichever worker runs a task that depends on it.  In resident mode a worker
+keeps the results that it computes in ``_worker_data`` and sends back only a
+small ``Resident`` placeholder.  The scheduler's ``ResidentData`` cache tracks
+which workers hold each key and sends each task to the idle worker that
+already holds the most bytes of its inputs.  Inputs held by other workers are
+fetched directly from those workers, which serve their data over a local
+socket.  Only final results are sent to the scheduler.
+"""
+
+# {(channel, key): value} held by this worker process
+_worker_data = dict()
+
+
+class Resident(namedtuple('Resident', ['worker', 'nbytes', 'fetched'])):
+    """ Placeholder for a result held by a worker process
+
+    worker: index of the worker holding the result
+    nbytes: approximate size of the result in bytes
+    fetched: keys that the worker copied from other workers for this task
+    """
+    __slots__ = ()
+
+
+class Remote(namedtuple('Remote', ['key', 'address'])):
+    """ Reference to an input held by a worker process
+
+    The input is local if ``address`` is None, otherwise we fetch it from the
+    worker listening at ``address``.
+    """
+    __slots__ = ()
+
+
+def _serve_data(address):
+    """ Serve ``_worker_data`` to other processes from a background thread """
+    listener = Listener(address, authkey=multiprocessing.current_process().authkey)
+
+    def handle(conn):
+        try:
+            while True:
+                channel, key = conn.recv()
+                conn.send(_worker_data[(channel, key)])
+        except (EOFError, IOError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def serve():
+        while True:
+            try:
+                conn = listener.accept()
+            except (IOError, OSError):
+                return
+            t = threading.Thread(target=handle, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    t = threading.Thread(target=serve)
+    t.daemon = True
+    t.start()
+    return listener
+
+
+def _fetch(address, items, authkey=None):
+    """ Fetch several ``(channel, key)`` items from a worker """
+    if authkey is None:
+        authkey = multiprocessing.current_process().authkey
+    conn = Client(address, authkey=authkey)
+    try:
+        result = []
+        for item in items:
+            conn.send(item)
+            result.append(conn.recv())
+        return result
+    finally:
+        conn.close()
+
+
+class _ResidentQueue(object):
+    """ Wraps a worker's result queue to keep results in this worker """
+    def __init__(self, queue, fetched):
+        self.queue = queue
+        self.fetched = fetched
+
+    def _keep(self, key, result, tb):
+        if tb is not None or isinstance(result, Exception):
+            return key, result, tb
+        _worker_data[(self.queue.channel, key)] = result
+        return key, Resident(_worker_index, sizeof(result), self.fetched), tb
+
+    def put(self, msg):
+        if isinstance(msg, BatchResult):
+            results = [self._keep(*r) for r in msg.results]
+            msg = BatchResult(results, msg.duration, msg.worker_id)
+        else:
+            key, result, tb, worker_id = msg
+            msg = self._keep(key, result, tb) + (worker_id,)
+        self.queue.put(msg)
+
+
+def _resolve(datas, channel):
+    """ Replace ``Remote`` references in data dicts by their values """
+    missing = dict()
+    for data in datas:
+        for k, v in data.items():
+            if isinstance(v, Remote):
+                if v.address is None:
+                    data[k] = _worker_data[(channel, v.key)]
+                else:
+                    missing.setdefault(v.address, set()).add(v.key)
+    fetched = []
+    for address, keys in missing.items():
+        keys = sorted(keys, key=str)
+        values = _fetch(address, [(channel, k) for k in keys])
+        for k, v in zip(keys, values):
+            _worker_data[(channel, k)] = v
+        fetched.extend(keys)
+    if fetched:
+        for data in datas:
+            for k, v in data.items():
+                if isinstance(v, Remote):
+                    data[k] = _worker_data[(channel, v.key)]
+    return fetched
+
+
+def execute_resident(func, *args):
+    """ Run ``execute_task`` or ``execute_batch`` on resident data """
+    args = list(args)
+    if func is execute_batch:
+        datas = [data for _, _, data in args[0]]
+        i = 1
+    else:
+        datas = [args[2]]
+        i = 3
+    queue = args[i]
+    args[i] = _ResidentQueue(queue, _resolve(datas, queue.channel))
+    return func(*args)
+
+
+class ResidentData(dict):
+    """ Scheduler cache for resident mode
+
+    Values are either concrete data held by the scheduler or ``Resident``
+    placeholders for data held by workers.  Provides an ``apply_async`` for
+    ``get_async`` that places tasks near their data.
+    """
+    def __init__(self, pool, queue):
+        dict.__init__(self)
+        self.pool = pool
+        self.queue = queue
+        self.holders = dict()    # key -> set of worker indices
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        if isinstance(value, Resident):
+            self.holders[key] = set([value.worker])
+            for dep in value.fetched:
+                if dep in self.holders:
+                    self.holders[dep].add(value.worker)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        workers = self.holders.pop(key, ())
+        for w in workers:
+            self.pool.inboxes[w].put(('free', self.queue.channel, [key]))
+
+    def choose_worker(self, datas):
+        """ Idle worker holding the most bytes of the given inputs """
+        load = self.pool.load
+        least = min(load)
+        local = [0] * len(load)
+        for data in datas:
+            for k in data:
+                v = dict.get(self, k)
+                if isinstance(v, Resident):
+                    for w in self.holders[k]:
+                        local[w] += v.nbytes
+        candidates = [w for w in range(len(load)) if load[w] == least]
+        return max(candidates, key=lambda w: (local[w], -w))
+
+    def apply_async(self, func, args=(), kwds={}):
+        if func is execute_batch:
+            datas = [data for _, _, data in args[0]]
+        else:
+            datas = [args[2]]
+        worker = self.choose_worker(datas)
+        addresses = self.pool.addresses
+        for data in datas:
+            for k, v in data.items():
+                if isinstance(v, Resident):
+                    holders = self.holders[k]
+                    if worker in holders:
+                        data[k] = Remote(k, None)
+                    else:
+                        data[k] = Remote(k, addresses[min(holders)])
+        self.pool.apply_async(execute_resident, args=[func] + list(args),
+                              kwds=kwds, worker=worker)
+
+    def gather(self, keys):
+        """ Fetch the values of keys from the workers that hold them """
+        result = dict()
+        requests = dict()
+        for k in keys:
+            v = dict.get(self, k)
+            if isinstance(v, Resident):
+                w = min(self.holders[k])
+                requests.setdefault(w, []).append(k)
+            else:
+                result[k] = v
+        for w, ks in requests.items():
+            values = _fetch(self.pool.addresses[w],
+                            [(self.queue.channel, k) for k in ks],
+                            self.pool.authkey)
+            result.update(zip(ks, values))
+        return result
+
+    def fetch(self, key):
+        """ Value of key for callbacks, see ``get_async`` """
+        return self.gather([key])[key]
+
+    def clear_workers(self):
+        """ Release all data of this computation from the workers """
+        for inbox in self.pool.inboxes:
+            inbox.put(('clear', self.queue.channel))
+
+
+class ResultQueue(object):
+    """ One channel of the result queue of a ``ProcessPool``
+
+    Supports the ``get`` and ``empty`` methods of ``Queue`` that ``get_async``
+    uses.  Pickles into a ``_WorkerQueue`` within worker processes.
+    """
+    def __init__(self, pool, channel, threshold=None):
+        self.pool = pool
+        self.channel = channel
+        self.threshold = threshold
+
+    def get(self, block=True, timeout=None):
+        return self.pool._get(self.channel, block=block, timeout=timeout)
+
+    def put(self, msg):
+        """ Add a message from a thread of this process, see ``dask.hybrid`` """
+        self.pool._put(self.channel, msg)
+
+    def empty(self):
+        return self.pool._empty(self.channel)
+
+    def release(self, value):
+        """ Remove shared memory files of a result that we no longer need """
+        self.pool._release(self.channel, value)
+
+    def cancel(self):
+        """ Have workers skip the tasks of this channel not yet started """
+        for inbox in self.pool.inboxes:
+            inbox.put(('cancel', self.channel))
+
+    def close(self):
+        """ Stop receiving results on this channel """
+        self.pool._close_channel(self.channel)
+
+    def __reduce__(self):
+        return (_WorkerQueue, (self.channel, self.threshold))
+
+
+def _find_queue(args):
+    for arg in args:
+        if isinstance(arg, ResultQueue):
+            return arg
+
+
+class SharedMemoryCache(dict):
+    """ Scheduler cache that frees shared memory of released results """
+    def __init__(self, queue):
+        dict.__init__(self)
+        self.queue = queue
+
+    def __delitem__(self, key):
+        value = self[key]
+        dict.__delitem__(self, key)
+        self.queue.release(value)
+
+
+class ProcessPool(object):
+    """ A persistent pool of worker processes
+
+    Parameters
+    ----------
+
+    num_workers: int, optional
+        Number of worker processes (defaults to number of cores)
+    max_functions: int, optional
+        Number of distinct functions that each worker keeps deserialized
+
+    Examples
+    --------
+
+    >>> pool = ProcessPool(4)  # doctest: +SKIP
+    >>> with set_options(pool=pool):  # doctest: +SKIP
+    ...     b.compute()
+    >>> pool.close()  # doctest: +SKIP
+    """
+    def __init__(self, num_workers=None, max_functions=1000):
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.max_functions = max_functions
+        self.results = multiprocessing.Queue()
+        self.inboxes = []
+        self.processes = []
+        self.authkey = multiprocessing.current_process().authkey
+        self.addresses = [_data_address() for i in range(self.num_workers)]
+        for i in range(self.num_workers):
+            inbox = multiprocessing.Queue()
+            proc = multiprocessing.Process(target=_worker,
+                                           args=(i, inbox, self.results,
+                                                 self.addresses[i]))
+            proc.daemon = True
+            proc.start()
+            self.inboxes.append(inbox)
+            self.processes.append(proc)
+        self._init_state()
+
+    def _init_state(self):
+        """ Scheduler side bookkeeping, once the workers are known """
+        self.load = [0] * self.num_workers
+        self.seen = [set() for i in range(self.num_workers)]
+        self._tokens = dict()     # id(func) -> (func, token)
+        self._sfuncs = dict()     # token -> serialized function
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(threading.Lock())
+        self._reading = False
+        self._stash = dict()      # channel -> deque of messages
+        self._files = dict()      # channel -> set of shared memory files
+        self._channels = count()
+        self.closed = False
+
+    def queue(self, shared_memory=None):
+        """ A new result channel for one computation
+
+        Parameters
+        ----------
+
+        shared_memory: int, optional
+            Send arrays of at least this many bytes through shared memory
+        """
+        with self._cond:
+            channel = next(self._channels)
+            self._stash[channel] = deque()
+            self._files[channel] = set()
+        return ResultQueue(self, channel, shared_memory)
+
+    def _token(self, func):
+        try:
+            return self._tokens[id(func)][1]
+        except KeyError:
+            pass
+        if len(self._tokens) > self.max_functions:
+            self._tokens.clear()
+        sfunc = _dumps(func)
+        token = md5(sfunc).hexdigest()
+        self._tokens[id(func)] = (func, token)
+        self._sfuncs[token] = sfunc
+        return token
+
+    def apply_async(self, func, args=(), kwds={}, worker=None):
+        """ Run ``func(*args, **kwds)`` on a worker
+
+        Nothing is returned, ``func`` should put its results onto a
+        ``ResultQueue`` passed among its arguments.  By default we choose the
+        least loaded worker.
+        """
+        if self.closed:
+            raise ValueError("Pool is closed")
+        with self._lock:
+            tokens = set()
+
+            def token(obj):
+                tok = self._token(obj)
+                tokens.add(tok)
+                return tok
+
+            queue = _find_queue(args)
+            threshold = queue.threshold if queue is not None else None
+            f = BytesIO()
+            _Pickler(f, token, threshold).dump((func, args, kwds))
+
+            if worker is None:
+                worker = self.load.index(min(self.load))
+            seen = self.seen[worker]
+            reset = len(seen) > self.max_functions
+            if reset:
+                seen.clear()
+            new = [(tok, self._sfuncs[tok]) for tok in tokens
+                                            if tok not in seen]
+            seen.update(tokens)
+            if len(self._sfuncs) > 2 * self.max_functions:
+                self._sfuncs = dict((tok, self._sfuncs[tok])
+                                    for _, tok in self._tokens.values())
+            self.load[worker] += 1
+            channel = queue.channel if queue is not None else None
+            self.inboxes[worker].put(('task', channel, f.getvalue(), reset,
+                                      new))
+
+    def _receive(self, block=True, timeout=None):
+        """ Move one message from the result queue to its channel """
+        idx, channel, payload = self.results.get(block, timeout)
+        if idx is None:
+            return  # Wake up call from ``_put``
+        with self._lock:
+            self.load[idx] -= 1
+        files = set()
+        msg = _Unpickler(BytesIO(payload), files=files).load()
+        with self._cond:
+            if channel in self._stash:
+                self._stash[channel].append(msg)
+                self._files[channel].update(files)
+                files = ()
+        for fn in files:  # results of finished computations
+            with ignoring(OSError):
+                os.remove(fn)
+
+    def _put(self, channel, msg):
+        with self._cond:
+            if channel not in self._stash:
+                return
+            self._stash[channel].append(msg)
+            self._cond.notify_all()
+            if self._reading:
+                # The reader may be blocked on the result queue
+                self.results.put((None, None, None))
+
+    def _get(self, channel, block=True, timeout=None):
+        """ Next message on a channel
+
+        Only one thread reads from the result queue at a time.  It hands
+        messages for other channels over to their readers.
+        """
+        while True:
+            with self._cond:
+                while True:
+                    stash = self._stash[channel]
+                    if stash:
+                        return stash.popleft()
+                    if not self._reading:
+                        self._reading = True
+                        break
+                    if not block:
+                        raise Empty()
+                    self._cond.wait(timeout)
+                    if timeout is not None and not self._stash[channel]:
+                        raise Empty()
+            try:
+                self._receive(block, timeout)
+            finally:
+                with self._cond:
+                    self._reading = False
+                    self._cond.notify_all()
+
+    def _empty(self, channel):
+        while True:
+            with self._cond:
+                if self._stash.get(channel):
+                    return False
+                if self._reading:
+                    return True
+                self._reading = True
+            try:
+                self._receive(block=False)
+            except Empty:
+                return True
+            finally:
+                with self._cond:
+                    self._reading = False
+                    self._cond.notify_all()
+
+    def _release(self, channel, value):
+        with self._cond:
+            owned = self._files.get(channel, ())
+            files = [fn for fn in _shared_files(value) if fn in owned]
+            for fn in files:
+                owned.discard(fn)
+        for fn in files:
+            with ignoring(OSError):
+                os.remove(fn)
+
+    def _close_channel(self, channel):
+        with self._cond:
+            self._stash.pop(channel, None)
+            files = self._files.pop(channel, ())
+        for fn in files:
+            with ignoring(OSError):
+                os.remove(fn)
+
+    def close(self):
+        """ Stop worker processes once they finish their current tasks """
+        if self.closed:
+            return
+        self.closed = True
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for proc in self.processes:
+            proc.join()
+        self._remove_addresses()
+
+    def terminate(self):
+        """ Stop worker processes immediately """
+        self.closed = True
+        for proc in self.processes:
+            proc.terminate()
+        for proc in self.processes:
+            proc.join()
+        self._remove_addresses()
+
+    def _remove_addresses(self):
+        for address in self.addresses:
+            if isinstance(address, str):
+                with ignoring(OSError):
+                    os.remove(address)
+                with ignoring(OSError):
+                    os.rmdir(os.path.dirname(address))
+
+
+def _data_address():
+    """ Address for a worker to serve its resident data """
+    if hasattr(socket, 'AF_UNIX'):
+        return os.path.join(tempfile.mkdtemp(prefix='dask-'), 'data')
+    return ('localhost', _free_port())
+
+
+def _free_port():
+    s = socket.socket()
+    try:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+    finally:
+        s.close()
+
+
+_pools = dict()
+_pools_lock = threading.Lock()
+
+
+def default_pool(num_workers=None):
+    """ The persistent ``ProcessPool`` with the given number of workers
+
+    Pools are started on first use and kept until ``shutdown``.
+    """
+    with _pools_lock:
+        pool = _pools.get(num_workers)
+        if pool is None or pool.closed:
+            pool = _pools[num_workers] = ProcessPool(num_workers)
+        return pool
+
+
+def shutdown():
+    """ Close all persistent process pools
+
+    Called automatically when the interpreter exits.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(shutdown)
+
+
 def get(dsk, keys, optimizations=[], num_workers=None,
-        func_loads=None, func_dumps=None, **kwargs):
+        func_loads=None, func_dumps=None, shared_memory=None, resident=None,
+        pool=None, **kwargs):
     """ Multiprocessed get function appropriate for Bags
 
+    By default this runs on a persistent pool of worker processes that is
+    reused across calls.  Use ``dask.multiprocessing.shutdown`` to stop these
+    processes.
+
     Parameters
     ----------
 
@@ -52,34 +920,103 @@ def get(dsk, keys, optimizations=[], num_workers=None,
     func_loads: function
         Function to use for function deserialization
         (defaults to cloudpickle.loads)
+    shared_memory: bool or int
+        Send NumPy arrays (including the blocks of pandas objects) larger than
+        this many bytes (1MB if True) between processes through shared memory
+        rather than pickling them.  Requires NumPy and the default persistent
+        pool.  (False by default)
+    resident: bool
+        Keep intermediate results in the worker processes that compute them
+        and run tasks where their inputs live.  Only data needed by another
+        worker and the final results move between processes.  Requires the
+        default persistent pool, and no ``cache``.  Posttask callbacks, and so
+        ``as_completed`` and checkpoints, fetch every result they see from
+        the workers.  (False by default)
+    pool: Pool or ProcessPool
+        The pool to use instead of the global or default pool
     """
-    pool = _globals['pool']
     if pool is None:
-        pool = multiprocessing.Pool(num_workers)
-        cleanup = True
-    else:
-        cleanup = False
+        pool = _globals['pool']
+    if pool is None:
+        pool = default_pool(num_workers)
+
+    if shared_memory is None:
+        shared_memory = _globals.get('shared_memory', False)
+    if shared_memory is True:
+        shared_memory = 1000000
+    if not shared_memory or np is None:
+        shared_memory = None
 
-    manager = multiprocessing.Manager()
-    queue = manager.Queue()
+    if resident is None:
+        resident = _globals.get('resident', False)
+    if resident and (kwargs.get('cache') is not None or
+                     _globals['cache'] is not None):
+        raise ValueError("Resident mode keeps results in the workers and "
+                         "does not support a cache")
 
-    apply_async = pickle_apply_async(pool.apply_async,
-                                          func_dumps=func_dumps,
-                                          func_loads=func_loads)
+    resident_data = None
+    if isinstance(pool, ProcessPool):
+        queue = pool.queue(shared_memory=shared_memory)
+        if (shared_memory is not None and kwargs.get('cache') is None
+                and _globals['cache'] is None):
+            kwargs['cache'] = SharedMemoryCache(queue)
+        num_workers = pool.num_workers
+        apply_async = pool.apply_async
+        if func_dumps or func_loads or _globals.get('func_dumps'):
+            apply_async = pickle_apply_async(apply_async,
+                                             func_dumps=func_dumps,
+                                             func_loads=func_loads)
+        elif resident:
+            resident_data = kwargs['cache'] = ResidentData(pool, queue)
+            apply_async = resident_data.apply_async
+        cleanup = queue.close
+    else:
+        if resident:
+            raise ValueError("Resident mode requires a ProcessPool")
+        manager = multiprocessing.Manager()
+        queue = manager.Queue()
+        num_workers = len(pool._pool)
+        apply_async = pickle_apply_async(pool.apply_async,
+                                         func_dumps=func_dumps,
+                                         func_loads=func_loads)
+        cleanup = manager.shutdown
 
     # Optimize Dask
-    dsk2 = fuse(dsk, keys)
-    dsk3 = pipe(dsk2, partial(cull, keys=keys), *optimizations)
+    analysis = kwargs.get('analysis')
+
+    def optimize():
+        dsk2 = fuse(dsk, keys, analysis=analysis)
+        return pipe(dsk2, partial(cull, keys=keys, analysis=analysis),
+                    *optimizations)
+
+    graph_cache = current_graph_cache()
+    if graph_cache is not None:
+        dsk3 = graph_cache.get(get, dsk, keys, optimize,
+                               extra=tuple(optimizations))
+    else:
+        dsk3 = optimize()
 
     try:
         # Run
-        result = get_async(apply_async, len(pool._pool), dsk3, keys,
+        result = get_async(apply_async, num_workers, dsk3, keys,
                            queue=queue, get_id=_process_get_id, **kwargs)
+        if resident_data is not None:
+            flat = list(flatten(keys)) if isinstance(keys, list) else [keys]
+            data = resident_data.gather(flat)
+            result = nested_get(keys, data)
+    except BaseException:
+        # Errors, cancellation or KeyboardInterrupt, drop queued tasks
+        if isinstance(queue, ResultQueue):
+            queue.cancel()
+        raise
     finally:
-        if cleanup:
-            pool.close()
+        if resident_data is not None:
+            resident_data.clear_workers()
+        cleanup()
     return result
 
+get._takes_analysis = True  # see dask.base._scheduler_kwargs
+
 
 def apply_func(sfunc, sargs, skwds, loads=None):
     loads = loads or _globals.get('loads') or _loads
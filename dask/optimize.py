@@ -1,23 +1,32 @@
 from __future__ import absolute_import, division, print_function
 
+from functools import partial
 from itertools import count
 from operator import getitem
+from types import FunctionType
+
+from toolz import unique
+from toolz.functoolz import Compose
 
 from .compatibility import zip_longest
+from .context import _globals
 from .core import (istask, get_dependencies, subs, toposort, flatten,
                    reverse_dict, add, inc, ishashable, preorder_traversal)
 from .rewrite import END
+from .utils import funcname
 
 
 def identity(x):
     return x
 
 
-def cull(dsk, keys):
+def cull(dsk, keys, analysis=None):
     """ Return new dask with only the tasks required to calculate keys.
 
     In other words, remove unnecessary tasks from dask.
-    ``keys`` may be a single key or list of keys.
+    ``keys`` may be a single key or list of keys.  Pass a
+    ``dask.analysis.GraphAnalysis`` as ``analysis`` to use and update its
+    dependencies, as for the other passes here.
 
     Examples
     --------
@@ -27,20 +36,25 @@ def cull(dsk, keys):
     """
     if not isinstance(keys, (list, set)):
         keys = [keys]
+    if analysis is not None:
+        dependencies = analysis.update(dsk).dependencies
+        deps = dependencies.__getitem__
+    else:
+        deps = lambda k: get_dependencies(dsk, k)
     nxt = set(flatten(keys))
     seen = nxt
     while nxt:
         cur = nxt
         nxt = set()
         for item in cur:
-            for dep in get_dependencies(dsk, item):
+            for dep in deps(item):
                 if dep not in seen:
                     nxt.add(dep)
         seen.update(nxt)
     return dict((k, v) for k, v in dsk.items() if k in seen)
 
 
-def fuse(dsk, keys=None):
+def fuse(dsk, keys=None, analysis=None):
     """ Return new dask with linear sequence of tasks fused together.
 
     If specified, the keys in ``keys`` keyword argument are *not* fused.
@@ -60,12 +74,19 @@ def fuse(dsk, keys=None):
             keys = [keys]
         keys = set(flatten(keys))
 
+    if analysis is not None:
+        analysis.update(dsk)
+
     # locate all members of linear chains
     child2parent = {}
     unfusible = set()
     for parent in dsk:
-        deps = get_dependencies(dsk, parent, as_list=True)
-        has_many_children = len(deps) > 1
+        if analysis is not None:
+            deps = analysis.dependencies[parent]
+            has_many_children = len(deps) > 1 or parent in analysis.repeated
+        else:
+            deps = get_dependencies(dsk, parent, as_list=True)
+            has_many_children = len(deps) > 1
         for child in deps:
             if keys is not None and child in keys:
                 unfusible.add(child)
@@ -114,7 +135,134 @@ def fuse(dsk, keys=None):
     return rv
 
 
-def inline(dsk, keys=None, inline_constants=True):
+def fuse_subgraphs(dsk, keys=None, max_width=10, max_depth=4,
+                   boundaries=None, resources=None, analysis=None):
+    """ Return new dask with small subgraphs fused into single tasks
+
+    ``fuse`` only merges linear chains.  Here a task also absorbs those of its
+    dependencies whose result it alone uses, and so on down, so diamonds and
+    shallow fan-ins like ``x + x.T`` become one task and their intermediate
+    results never reach the scheduler.  Tree-shaped subgraphs become nested
+    tasks.  Subgraphs in which a result has several users within the
+    subgraph become a ``CompiledTask`` that computes it once.
+
+    Parameters
+    ----------
+
+    dsk: dict
+    keys: list, optional
+        Keys that we must keep, usually the outputs
+    max_width: int, optional
+        Most tasks to absorb at each level below a task, as absorbed tasks no
+        longer run in parallel
+    max_depth: int, optional
+        Most levels of tasks to absorb below a task
+    boundaries: collection, optional
+        Functions, keys or key names of tasks never absorbed by other tasks,
+        e.g. expensive tasks that should run in parallel or hold a lock.
+        Defaults to ``set_options(fuse_boundaries=...)``
+    resources: dict, optional
+        Resources of tasks as for ``dask.resources``.  We never absorb tasks
+        that use resources.  Defaults to ``set_options(resources=...)``
+    analysis: GraphAnalysis, optional
+        Dependencies of ``dsk``, see ``dask.analysis``
+
+    Examples
+    --------
+
+    >>> d = {'a': 1, 'b': (inc, 'a'), 'c': (inc, 'a'), 'd': (add, 'b', 'c')}
+    >>> fuse_subgraphs(d)  # doctest: +SKIP
+    {'a': 1, 'd': (add, (inc, 'a'), (inc, 'a'))}
+    >>> d = {'a': 1, 'b': (inc, 'a'), 'c': (inc, 'b'), 'd': (add, 'b', 'c')}
+    >>> fuse_subgraphs(d)  # doctest: +SKIP
+    {'a': 1, 'd': (<CompiledTask add: 3 calls>, 'a')}
+    """
+    from .analysis import GraphAnalysis
+    from .resources import task_resources
+    from .utils import key_split
+
+    if keys is not None and not isinstance(keys, set):
+        if not isinstance(keys, list):
+            keys = [keys]
+        keys = set(flatten(keys))
+    keys = keys or set()
+    if boundaries is None:
+        boundaries = _globals.get('fuse_boundaries')
+    boundaries = set(boundaries or ())
+    if resources is None:
+        resources = _globals.get('resources')
+
+    if analysis is None:
+        analysis = GraphAnalysis(dsk)
+    else:
+        analysis.update(dsk)
+    dependencies, dependents = analysis.dependencies, analysis.dependents
+    position = dict((k, i) for i, k in enumerate(analysis.toposort()))
+
+    def absorbable(key):
+        task = dsk[key]
+        if key in keys or not istask(task):
+            return False
+        if boundaries:
+            for b in (key, key_split(key), task[0]):
+                try:
+                    if b in boundaries:
+                        return False
+                except TypeError:   # unhashable
+                    pass
+        return not task_resources(key, task, resources)
+
+    fused = dict()      # root -> members in the order we absorbed them
+    absorbed = set()
+    for root in sorted(dsk, key=position.get, reverse=True):
+        if root in absorbed or not istask(dsk[root]):
+            continue
+        group = set([root])
+        members = []
+        level = [root]
+        for depth in range(max_depth):
+            candidates = set()
+            for key in level:
+                for dep in dependencies[key]:
+                    if (dep not in group and dep not in absorbed and
+                            dependents[dep] <= group and absorbable(dep)):
+                        candidates.add(dep)
+            if not candidates:
+                break
+            level = sorted(candidates, key=position.get,
+                           reverse=True)[:max_width]
+            group.update(level)
+            members.extend(level)
+        if members:
+            fused[root] = members
+            absorbed.update(members)
+
+    rv = dict((k, v) for k, v in dsk.items() if k not in absorbed)
+    for root, members in fused.items():
+        group = set(members)
+        group.add(root)
+        # Whether a task uses the result of a member more than once
+        shared = any(len(dependents[m]) > 1 or
+                     next(iter(dependents[m])) in analysis.repeated
+                     for m in members)
+        if not shared:
+            # A tree, substitute each task into its only user
+            task = dsk[root]
+            for m in members:
+                task = subs(task, m, dsk[m])
+            rv[root] = task
+        else:
+            inputs = list(unique(dep for k in [root] + members
+                                 for dep in sorted(dependencies[k],
+                                                   key=position.get)
+                                 if dep not in group))
+            compiled = compile_task(dsk[root], inputs,
+                                    [(m, dsk[m]) for m in reversed(members)])
+            rv[root] = (compiled,) + tuple(inputs)
+    return rv
+
+
+def inline(dsk, keys=None, inline_constants=True, analysis=None):
     """ Return new dask with the given keys inlined with their values.
 
     Inlines all constants if ``inline_constants`` keyword is True.
@@ -140,13 +288,18 @@ def inline(dsk, keys=None, inline_constants=True):
     if inline_constants:
         keys.update(k for k, v in dsk.items() if not istask(v))
 
+    if analysis is not None:
+        deps = analysis.update(dsk).dependencies.__getitem__
+    else:
+        deps = lambda k: get_dependencies(dsk, k)
+
     # Keys may depend on other keys, so determine replace order with toposort.
     # The values stored in `keysubs` do not include other keys.
     replaceorder = toposort(dict((k, dsk[k]) for k in keys if k in dsk))
     keysubs = {}
     for key in replaceorder:
         val = dsk[key]
-        for dep in keys & get_dependencies(dsk, key):
+        for dep in keys & deps(key):
             if dep in keysubs:
                 replace = keysubs[dep]
             else:
@@ -159,15 +312,18 @@ def inline(dsk, keys=None, inline_constants=True):
     for key, val in dsk.items():
         if key in keys:
             continue
-        for item in keys & get_dependencies(dsk, key):
+        for item in keys & deps(key):
             val = subs(val, item, keysubs[item])
         rv[key] = val
     return rv
 
 
-def inline_functions(dsk, fast_functions=None, inline_constants=False):
+def inline_functions(dsk, fast_functions=None, inline_constants=False,
+                     output=None, analysis=None):
     """ Inline cheap functions into larger operations
 
+    Keys in ``output`` stay in the graph.
+
     Examples
     --------
     >>> dsk = {'out': (add, 'i', 'd'),  # doctest: +SKIP
@@ -182,16 +338,22 @@ def inline_functions(dsk, fast_functions=None, inline_constants=False):
     if not fast_functions:
         return dsk
     fast_functions = set(fast_functions)
+    output = set(flatten(output)) if output is not None else ()
 
-    dependencies = dict((k, get_dependencies(dsk, k)) for k in dsk)
-    dependents = reverse_dict(dependencies)
+    if analysis is not None:
+        dependents = analysis.update(dsk).dependents
+    else:
+        dependencies = dict((k, get_dependencies(dsk, k)) for k in dsk)
+        dependents = reverse_dict(dependencies)
 
     keys = [k for k, v in dsk.items()
               if istask(v)
               and functions_of(v).issubset(fast_functions)
-              and dependents[k]]
+              and dependents[k]
+              and k not in output]
     if keys:
-        return inline(dsk, keys, inline_constants=inline_constants)
+        return inline(dsk, keys, inline_constants=inline_constants,
+                      analysis=analysis)
     else:
         return dsk
 
@@ -222,11 +384,11 @@ def unwrap_partial(func):
     return func
 
 
-def dealias(dsk):
+def dealias(dsk, keys=None):
     """ Remove aliases from dask
 
     Removes and renames aliases using ``inline``.  Keeps aliases at the top of
-    the DAG to ensure entry points stay the same.
+    the DAG, and those in ``keys``, to ensure entry points stay the same.
 
     Aliases are not expected by schedulers.  It's unclear that this is a legal
     state.
@@ -249,8 +411,9 @@ def dealias(dsk):
     dependencies = dict((k, get_dependencies(dsk, k)) for k in dsk)
     dependents = reverse_dict(dependencies)
 
+    keys = set(flatten(keys)) if keys is not None else set()
     aliases = set((k for k, task in dsk.items() if ishashable(task) and task in dsk))
-    roots = set((k for k, v in dependents.items() if not v))
+    roots = set((k for k, v in dependents.items() if not v or k in keys))
 
     dsk2 = inline(dsk, aliases - roots, inline_constants=False)
     dsk3 = dsk2.copy()
@@ -260,7 +423,7 @@ def dealias(dsk):
 
     for k in roots & aliases:
         k2 = dsk3[k]
-        if len(dependents[k2]) == 1:
+        if len(dependents[k2]) == 1 and k2 not in keys:
             dsk3[k] = dsk3[k2]
             del dsk3[k2]
         else:
@@ -463,6 +626,198 @@ def merge_sync(dsk1, dsk2):
 merge_sync.names = ('merge_%d' % i for i in count(1))
 
 
+_task_tag = object()    # Marks tasks and key references in signatures
+_key_tag = object()
+
+
+def _signature(x, canon, functions):
+    """ Hashable structure of a term, with keys replaced by ``canon[key]``
+
+    Literals carry their type so that ``1``, ``1.0`` and ``True`` differ.
+    Functions compare as in ``_function_signature``, memoized by id in
+    ``functions``.  Other terms that we can not hash compare by identity.
+    """
+    if istask(x):
+        return ((_task_tag, _function_signature(x[0], functions)) +
+                tuple(_signature(a, canon, functions) for a in x[1:]))
+    typ = type(x)
+    if typ is list:
+        return (list,) + tuple(_signature(a, canon, functions) for a in x)
+    try:
+        if x in canon:
+            return (_key_tag, canon[x])
+    except TypeError:   # unhashable
+        if typ is tuple:
+            return (tuple,) + tuple(_signature(a, canon, functions) for a in x)
+        if typ is slice:
+            return (slice, _signature(x.start, canon, functions),
+                    _signature(x.stop, canon, functions),
+                    _signature(x.step, canon, functions))
+        return (id, id(x))
+    if typ is float:
+        return (float, repr(x))     # 0.0 == -0.0
+    if callable(x) and typ is not type:
+        return _function_signature(x, functions)
+    return (typ, x)
+
+
+def _value_signature(x, functions):
+    """ Hashable structure of a value held by a function
+
+    Like ``_signature``, but without keys and looking into tuples and dicts.
+    """
+    typ = type(x)
+    if typ is list or typ is tuple:
+        return (typ,) + tuple(_value_signature(a, functions) for a in x)
+    if typ is dict:
+        return (dict, frozenset((_value_signature(k, functions),
+                                 _value_signature(v, functions))
+                                for k, v in x.items()))
+    if typ is float:
+        return (float, repr(x))
+    if callable(x) and typ is not type:
+        return _function_signature(x, functions)
+    try:
+        hash(x)
+    except TypeError:
+        return (id, id(x))
+    return (typ, x)
+
+
+def _function_signature(func, functions):
+    """ Hashable structure of a function
+
+    ``partial`` and ``Compose`` objects compare by their parts, and Python
+    functions by their code, defaults and closure, so that the closures that
+    ``elemwise`` and ``partial_by_order`` build for the same work compare
+    equal.  Other callables compare by identity.
+    """
+    try:
+        return functions[id(func)]
+    except KeyError:
+        pass
+    typ = type(func)
+    if typ is partial:
+        sig = (partial, _function_signature(func.func, functions),
+               _value_signature(func.args, functions),
+               _value_signature(func.keywords or {}, functions))
+    elif typ is Compose:
+        first = getattr(func, 'first', None)
+        funcs = (first,) + tuple(func.funcs) if first else tuple(func.funcs)
+        sig = (Compose,) + tuple(_function_signature(f, functions)
+                                 for f in funcs)
+    elif typ is FunctionType:
+        functions[id(func)] = (id, id(func))    # refers to itself
+        cells = [_cell_contents(c) for c in func.__closure__ or ()]
+        sig = (FunctionType, func.__code__, id(func.__globals__),
+               _value_signature(func.__defaults__, functions),
+               _value_signature(cells, functions))
+    else:
+        try:
+            hash(func)
+            sig = (typ, func)
+        except TypeError:
+            sig = (id, id(func))
+    functions[id(func)] = sig
+    return sig
+
+
+def _cell_contents(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:  # empty cell
+        return _task_tag
+
+
+def _rename(x, mapping):
+    """ Replace keys in a term, like ``subs`` for many keys at once """
+    if istask(x):
+        return (x[0],) + tuple(_rename(a, mapping) for a in x[1:])
+    if isinstance(x, list):
+        return [_rename(a, mapping) for a in x]
+    try:
+        return mapping.get(x, x)
+    except TypeError:
+        return x
+
+
+def cse(dsk, keys=None, exclude=None, analysis=None):
+    """ Merge equivalent tasks, common subexpression elimination
+
+    Two tasks are equivalent if they call the same functions on equal
+    literals and on equivalent dependencies.  We hash the structure of every
+    task, in topological order, and keep one key of each group of equivalent
+    tasks, a key in ``keys`` if there is one, otherwise the least key.  Tasks
+    that refer to the others now refer to the key that we keep.  Keys in
+    ``keys`` stay in the graph, those that we merge away compute as
+    ``(identity, kept_key)``.  Keys in ``exclude`` are never merged, use this
+    for tasks that give a different result on every call.  Neither are tasks
+    that call a function with ``_cse = False``, like those that write to
+    disk, which must run once for each of their keys.
+
+    Returns ``dsk`` itself when there is nothing to merge.
+
+    >>> dsk = {'a': 1, 'b': 1, 'x': (inc, 'a'), 'y': (inc, 'b'),
+    ...        'z': (add, 'x', 'y')}
+    >>> dsk2 = cse(dsk, 'z')
+    >>> sorted(dsk2)
+    ['a', 'x', 'z']
+    >>> dsk2['z'] == (add, 'x', 'x')
+    True
+    >>> sorted(cse(dsk, ['y', 'z']))
+    ['a', 'y', 'z']
+    """
+    if keys is not None and not isinstance(keys, list):
+        keys = [keys]
+    keep = set(flatten(keys)) if keys is not None else set()
+    exclude = exclude or ()
+    if analysis is not None:
+        topo = analysis.update(dsk).toposort()
+    else:
+        topo = toposort(dsk)
+
+    from .async import sortkey
+    canon = dict()      # key -> first key of its group in topological order
+    seen = dict()
+    groups = dict()
+    functions = dict()
+    for key in topo:
+        task = dsk[key]
+        if key in exclude or (istask(task) and
+                              not getattr(task[0], '_cse', True)):
+            canon[key] = key
+            continue
+        sig = _signature(task, canon, functions)
+        first = canon[key] = seen.setdefault(sig, key)
+        if first != key:
+            groups.setdefault(first, [first]).append(key)
+
+    # Keep a requested key if there is one, whatever the order of the graph
+    renamed = dict()
+    for group in groups.values():
+        kept = min(group, key=lambda k: (k not in keep, sortkey(k)))
+        renamed.update((k, kept) for k in group if k != kept)
+    if not renamed:
+        return dsk
+    if analysis is not None:
+        dependents = analysis.dependents
+    else:
+        dependents = reverse_dict(dict((k, get_dependencies(dsk, k))
+                                       for k in dsk))
+    stale = set(k for old in renamed for k in dependents[old]
+                if k not in renamed)
+    result = dict()
+    for k, v in dsk.items():
+        if k in renamed:
+            if k in keep:
+                result[k] = (identity, renamed[k])
+        elif k in stale:
+            result[k] = _rename(v, renamed)
+        else:
+            result[k] = v
+    return result
+
+
 def fuse_selections(dsk, head1, head2, merge):
     """Fuse selections with lower operation.
 
@@ -525,3 +880,129 @@ def fuse_getitem(dsk, func, place):
     """
     return fuse_selections(dsk, getitem, func,
             lambda a, b: tuple(b[:place]) + (a[2],) + tuple(b[place + 1:]))
+
+
+def _makelist(*args):
+    return list(args)
+
+
+class CompiledTask(object):
+    """ A task compiled into a flat list of calls
+
+    Calling a compiled task with the values of its dependencies, in the order
+    of ``deps``, gives the same result as executing the original task.  Each
+    instruction ``(func, args, slots)`` calls ``func`` with a copy of the
+    constant ``args`` in which the positions of ``slots`` are filled from
+    registers.  The first registers hold the dependencies, each instruction
+    appends its result as a new register and the last one is the result.
+
+    >>> dsk = {'x': 1, 'y': 2, 'z': (sum, [(inc, 'x'), (inc, 'y'), 10])}
+    >>> c = compile_task(dsk['z'], ['x', 'y'])
+    >>> c(1, 2)
+    15
+    >>> len(c.code)  # inc, inc, make a list, sum
+    4
+    """
+    __slots__ = ('code', 'deps', 'func')
+
+    def __init__(self, code, deps):
+        self.code = code
+        self.deps = deps
+        self.func = code[-1][0]     # for ``funcname`` and diagnostics
+
+    def __call__(self, *regs):
+        regs = list(regs)
+        for func, args, slots in self.code:
+            if slots:
+                args = list(args)
+                for i, r in slots:
+                    args[i] = regs[r]
+            regs.append(func(*args))
+        return regs[-1]
+
+    def __getstate__(self):
+        return self.code, self.deps
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self):
+        return '<CompiledTask %s: %d calls>' % (funcname(self.func),
+                                                 len(self.code))
+
+
+def compile_task(task, deps, members=()):
+    """ Compile a task with the given dependencies into a ``CompiledTask``
+
+    Hashable arguments in ``deps`` refer to dependencies, other arguments are
+    constants, as in ``_execute_task``.  See ``precompile``.
+
+    ``members`` are ``(key, task)`` pairs of a subgraph, each after the
+    members on which it depends, to compute before ``task``.  Their keys refer
+    to their results, which we compute once however many tasks use them.  See
+    ``fuse_subgraphs``.
+    """
+    deps = list(deps)
+    index = dict((d, i) for i, d in enumerate(deps))
+    code = []
+
+    def emit(func, args):
+        """ Instruction for func(*args), return the register of its result """
+        slots = []
+        for i, arg in enumerate(args):
+            if istask(arg):
+                slots.append((i, emit(arg[0], arg[1:])))
+            elif isinstance(arg, list):
+                slots.append((i, emit(_makelist, arg)))
+            else:
+                try:
+                    r = index.get(arg)
+                except TypeError:   # not hashable
+                    continue
+                if r is not None:
+                    slots.append((i, r))
+        # Arguments in slots are overwritten by register values
+        code.append((func, tuple(args), tuple(slots)))
+        return len(deps) + len(code) - 1
+
+    def emit_task(task):
+        if istask(task):
+            return emit(task[0], task[1:])
+        elif isinstance(task, list):
+            return emit(_makelist, task)
+        else:
+            raise ValueError("Not a task: %s" % str(task))
+
+    for key, member in members:
+        index[key] = emit_task(member)
+    emit_task(task)
+    return CompiledTask(code, deps)
+
+
+def precompile(dsk):
+    """ Compile every task of a graph into a flat ``CompiledTask``
+
+    Schedulers walk a task tuple recursively each time they execute it.  This
+    is noticeable for small tasks nested deeply by ``fuse`` and
+    ``inline_functions``.  After this pass each task is
+    ``(compiled, dep1, dep2, ...)``, so schedulers only fill in the values of
+    dependencies.  Run it last, other optimizations do not see through
+    compiled tasks.
+
+    >>> dsk = {'x': 1, 'y': (inc, (inc, 'x')), 'z': (add, 'y', 'x')}
+    >>> dsk2 = precompile(dsk)
+    >>> dsk2['y']
+    (<CompiledTask inc: 2 calls>, 'x')
+    >>> from dask.async import get_sync
+    >>> get_sync(dsk2, 'z')
+    4
+    """
+    result = dict()
+    for k, v in dsk.items():
+        if istask(v):
+            deps = get_dependencies(dsk, k, as_list=True)
+            deps = list(unique(deps))
+            result[k] = (compile_task(v, deps),) + tuple(deps)
+        else:
+            result[k] = v
+    return result
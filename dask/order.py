@@ -53,15 +53,28 @@ Approach: Depth First Search with Intelligent Tie-Breaking
 To satisfy concern (1) we perform a depth first search (``dfs``).  To satisfy
 concern (2) we prefer to traverse down children in the order of which child has
 the descendent on whose result the most tasks depend.
+
+
+Sizes of Results
+----------------
+
+These heuristics count tasks, not bytes.  A reduction over large blocks gets
+the same order as one over tiny blocks, though which subtree we finish first
+changes the peak memory several times over.  Given the size of the result of
+each task, e.g. from the ``CacheProfiler`` of an earlier run, we estimate the
+peak memory of each subtree with ``memory_peaks`` and first traverse down the
+child whose subtree needs the most memory beyond what it leaves behind.  For
+trees this order has the lowest peak memory of all depth first orders.
 """
 from __future__ import absolute_import, division, print_function
 
 from operator import add
 
 from .core import get_deps
+from .utils import key_split
 
 
-def order(dsk):
+def order(dsk, analysis=None, sizes=None):
     """ Order nodes in dask graph
 
     The ordering will be a toposort but will also have other convenient
@@ -73,11 +86,85 @@ def order(dsk):
     >>> dsk = {'a': 1, 'b': 2, 'c': (inc, 'a'), 'd': (add, 'b', 'c')}
     >>> order(dsk)
     {'a': 2, 'c': 1, 'b': 3, 'd': 0}
+
+    Pass a ``dask.analysis.GraphAnalysis`` as ``analysis`` to use its
+    dependencies rather than find them again.
+
+    Pass ``sizes``, the size of the result of each task by key or key name or
+    a function of the key, to order for low peak memory first.  Keys without
+    a size have size one.
+
+    >>> dsk = {'a': 1, 'b': (inc, 'a'), 'c': 2, 'd': (inc, 'c'),
+    ...        'e': (add, 'b', 'd')}
+    >>> o = order(dsk, sizes={'a': 100, 'b': 1, 'c': 1, 'd': 100})
+    >>> o['a'] < o['c']     # reduce 'a' to small 'b' before we create 'd'
+    True
     """
-    dependencies, dependents = get_deps(dsk)
+    if analysis is not None:
+        analysis.update(dsk)
+        dependencies, dependents = analysis.dependencies, analysis.dependents
+    else:
+        dependencies, dependents = get_deps(dsk)
     ndeps = ndependents(dependencies, dependents)
     maxes = child_max(dependencies, dependents, ndeps)
-    return dfs(dependencies, dependents, key=maxes.get)
+    if sizes is None:
+        return dfs(dependencies, dependents, key=maxes.get)
+    size = size_function(sizes)
+    peaks = memory_peaks(dependencies, dependents, size)
+    return dfs(dependencies, dependents,
+               key=lambda k: (peaks[k] - size(k), maxes[k]))
+
+
+def size_function(sizes):
+    """ Function from key to size, from a dict by key or key name
+
+    >>> size = size_function({'x': 10, ('y', 1): 2})
+    >>> size(('x', 0)), size(('y', 1)), size('z')
+    (10, 2, 1)
+    """
+    if callable(sizes):
+        return sizes
+
+    def size(key):
+        if key in sizes:
+            return sizes[key]
+        return sizes.get(key_split(key), 1)
+    return size
+
+
+def memory_peaks(dependencies, dependents, size):
+    """ Estimated peak memory to compute each key
+
+    We compute the children of a key one after the other, first the child
+    with the largest peak beyond its own size, holding the results of the
+    children already computed.  Shared subtrees count once for each parent.
+
+    Examples
+    --------
+
+    >>> dsk = {'a': 1, 'b': (inc, 'a'), 'c': 2, 'd': (add, 'b', 'c')}
+    >>> dependencies, dependents = get_deps(dsk)
+    >>> sizes = {'a': 10, 'b': 1, 'c': 5, 'd': 1}
+    >>> sorted(memory_peaks(dependencies, dependents, sizes.get).items())
+    [('a', 10), ('b', 11), ('c', 5), ('d', 11)]
+    """
+    result = dict()
+    num_needed = dict((k, len(v)) for k, v in dependencies.items())
+    current = set(k for k, v in num_needed.items() if v == 0)
+    while current:
+        key = current.pop()
+        held = peak = 0
+        children = sorted(dependencies[key],
+                          key=lambda c: result[c] - size(c), reverse=True)
+        for child in children:
+            peak = max(peak, held + result[child])
+            held += size(child)
+        result[key] = max(peak, held + size(key))
+        for parent in dependents[key]:
+            num_needed[parent] -= 1
+            if num_needed[parent] == 0:
+                current.add(parent)
+    return result
 
 
 def ndependents(dependencies, dependents):
@@ -0,0 +1,172 @@
+"""
+Limit how many tasks of a kind run at once
+
+Some tasks contend for something other than a core: reads from an HDF5 file
+serialize on a lock, large tasks need much memory.  When the scheduler runs
+many of these at once its threads block on the lock, or memory runs out,
+while other work that could run waits.
+
+Annotate such tasks with the resources that they use, either by function
+
+>>> @requires({'hdf5-io': 1})
+... def load(filename, i):
+...     pass
+
+or by key and key name with the ``resources=`` keyword of the schedulers,
+e.g. ``resources={'load': {'hdf5-io': 1}, ('x', 0): {'memory': 4e9}}``.  Then
+give the capacity of each resource
+
+>>> x.compute(capacity={'hdf5-io': 1, 'memory': 16e9})  # doctest: +SKIP
+
+The scheduler skips ready tasks whose resources are in use and runs other
+ready tasks in their place.  A skipped task runs once a task that uses its
+resources finishes.  Resources without a given capacity are unlimited.  A
+task that needs more than the capacity of a resource runs when no other task
+uses it.
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import deque
+
+from .core import istask
+from .utils import key_split
+
+
+def requires(resources):
+    """ Annotate a function with the resources that its tasks use
+
+    >>> def load(filename):
+    ...     pass
+    >>> load = requires({'hdf5-io': 1})(load)
+    >>> load._dask_resources
+    {'hdf5-io': 1}
+    """
+    def annotate(func):
+        func._dask_resources = resources
+        return func
+    return annotate
+
+
+def task_resources(key, task, resources=None):
+    """ Resources that a task uses
+
+    We look up the key, then its name as given by ``key_split``, then its
+    function in ``resources``, and finally use the annotation of the function
+    by ``requires``.
+
+    >>> task_resources(('x', 1), (sum, [1, 2]), {'x': {'memory': 100}})
+    {'memory': 100}
+    >>> task_resources('y', (sum, [1, 2]), {sum: {'cpu': 1}})
+    {'cpu': 1}
+    >>> task_resources('z', 1)
+    {}
+    """
+    if resources:
+        for k in (key, key_split(key)):
+            try:
+                if k in resources:
+                    return resources[k]
+            except TypeError:   # unhashable
+                pass
+    if not istask(task):
+        return {}
+    func = task[0]
+    while func is not None:
+        if resources:
+            try:
+                if func in resources:
+                    return resources[func]
+            except TypeError:
+                pass
+        annotation = getattr(func, '_dask_resources', None)
+        if annotation is not None:
+            return annotation
+        func = getattr(func, 'func', None)   # partials and compiled tasks
+    return {}
+
+
+class ResourcePool(object):
+    """ Resources in use by running tasks, and the tasks waiting for them
+
+    Parameters
+    ----------
+
+    capacity: dict
+        Amount of each resource available at once
+    resources: dict, optional
+        Resources of keys, key names and functions, see ``task_resources``
+
+    Examples
+    --------
+
+    >>> pool = ResourcePool({'io': 1}, {'load': {'io': 1}})
+    >>> pool.acquire(('load', 0), None)
+    True
+    >>> pool.acquire(('load', 1), None)    # blocked
+    False
+    >>> pool.acquire('other', None)
+    True
+    >>> pool.release(('load', 0))          # unblocks
+    [('load', 1)]
+    >>> pool.acquire(('load', 1), None)
+    True
+    """
+    def __init__(self, capacity, resources=None):
+        self.capacity = capacity
+        self.resources = resources
+        self.used = dict.fromkeys(capacity, 0)
+        self.needs = dict()     # key -> resources with a capacity
+        self.held = set()       # keys that hold their resources
+        self.blocked = dict((r, deque()) for r in capacity)
+
+    def need(self, key, task):
+        if key not in self.needs:
+            need = task_resources(key, task, self.resources)
+            self.needs[key] = dict((r, n) for r, n in need.items()
+                                   if r in self.capacity and n)
+        return self.needs[key]
+
+    def _fits(self, resource, amount):
+        used = self.used[resource]
+        return not used or used + amount <= self.capacity[resource]
+
+    def acquire(self, key, task):
+        """ Take the resources of a task to run it, or block it
+
+        Returns whether the task may run.  A blocked task comes back from
+        ``release``.
+        """
+        need = self.need(key, task)
+        for r, n in need.items():
+            if not self._fits(r, n):
+                self.blocked[r].append(key)
+                return False
+        for r, n in need.items():
+            self.used[r] += n
+        if need:
+            self.held.add(key)
+        return True
+
+    def release(self, key):
+        """ Return the resources of a finished task
+
+        Returns the blocked keys that may now fit, in the order in which
+        they blocked.
+        """
+        if key not in self.held:
+            return []
+        self.held.remove(key)
+        need = self.needs.pop(key)
+        for r, n in need.items():
+            self.used[r] -= n
+        keys = []
+        for r in need:
+            blocked = self.blocked[r]
+            used = self.used[r]
+            while blocked:
+                n = self.needs[blocked[0]][r]
+                if used and used + n > self.capacity[r]:
+                    break
+                used += n
+                keys.append(blocked.popleft())
+        return keys
@@ -361,10 +361,12 @@ def _top_level(net, term):
 
 
 def _bottom_up(net, term):
-    if istask(term):
-        term = (head(term),) + tuple(_bottom_up(net, t) for t in args(term))
-    elif isinstance(term, list):
-        term = [_bottom_up(net, t) for t in args(term)]
+    if istask(term) or isinstance(term, list):
+        old = args(term)
+        new = [_bottom_up(net, t) for t in old]
+        # Keep unchanged terms as the same objects, see ``dask.analysis``
+        if any(a is not b for a, b in zip(new, old)):
+            term = ((head(term),) + tuple(new) if istask(term) else new)
     return net._rewrite(term)
 
 
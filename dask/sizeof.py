@@ -0,0 +1,57 @@
+from __future__ import absolute_import, division, print_function
+
+import sys
+from functools import partial
+
+from .utils import Dispatch, ignoring
+
+
+sizeof = Dispatch()
+sizeof.__doc__ = """ Approximate size of an object in bytes
+
+Uses ``nbytes`` of arrays and pandas objects and falls back to
+``sys.getsizeof``.  Register new types with ``sizeof.register``.
+
+>>> sizeof(123)  # doctest: +SKIP
+28
+"""
+
+
+@partial(sizeof.register, object)
+def sizeof_default(o):
+    return sys.getsizeof(o)
+
+
+@partial(sizeof.register, (list, tuple, set, frozenset))
+def sizeof_sequence(seq):
+    return sys.getsizeof(seq) + sum(map(sizeof, seq))
+
+
+@partial(sizeof.register, dict)
+def sizeof_dict(d):
+    return (sys.getsizeof(d) + sum(map(sizeof, d.keys()))
+                             + sum(map(sizeof, d.values())))
+
+
+with ignoring(ImportError):
+    import numpy as np
+
+    @partial(sizeof.register, np.ndarray)
+    def sizeof_numpy_ndarray(x):
+        return int(x.nbytes)
+
+
+with ignoring(ImportError):
+    import pandas as pd
+
+    @partial(sizeof.register, pd.DataFrame)
+    def sizeof_pandas_dataframe(df):
+        return int(df.memory_usage(index=True).sum())
+
+    @partial(sizeof.register, pd.Series)
+    def sizeof_pandas_series(s):
+        return int(s.memory_usage(index=True))
+
+    @partial(sizeof.register, pd.Index)
+    def sizeof_pandas_index(i):
+        return int(i.memory_usage())
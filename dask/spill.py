@@ -0,0 +1,156 @@
+"""
+Spill intermediate results to disk
+
+``Spill`` is a scheduler cache that tracks the size of the values that it
+holds in memory and moves values to local disk on request.  Spilled values
+return to memory the next time that they are accessed.
+
+``get_async(..., memory_limit=...)`` uses this cache to bound the memory of a
+computation.  Above the limit the scheduler holds back tasks without
+dependencies, which only bring new data into memory, and spills the
+intermediate results that it will need last.
+
+>>> s = Spill()
+>>> s['x'] = list(range(1000))
+>>> s.spill('x')
+>>> s.memory_bytes
+0
+>>> len(s['x'])  # loads x back into memory
+1000
+>>> s.close()
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import MutableMapping
+import os
+import pickle
+import shutil
+import tempfile
+
+from .sizeof import sizeof
+
+
+class Spill(MutableMapping):
+    """ Dict-like storage that spills values to disk on request
+
+    Parameters
+    ----------
+
+    data: MutableMapping, optional
+        Mapping to hold the values in memory, a new dict by default.  We
+        write through to it, so that it holds every value that is not on
+        disk, e.g. the ``cache=`` of a scheduler.
+    directory: str, optional
+        Where to write spilled values, by default a new temporary directory
+
+    Attributes
+    ----------
+
+    memory: MutableMapping
+        Values currently in memory, ``data``
+    nbytes: dict
+        Size of each value currently in memory
+    memory_bytes: int
+        Total size of the values in memory
+    disk: dict
+        Filenames of the spilled values
+    """
+    def __init__(self, data=None, directory=None):
+        self.memory = data if data is not None else dict()
+        self.nbytes = dict((k, sizeof(v)) for k, v in self.memory.items())
+        self.memory_bytes = sum(self.nbytes.values())
+        self.disk = dict()
+        self._directory = directory
+        self._count = 0
+
+    @property
+    def directory(self):
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='dask-spill-')
+        return self._directory
+
+    def __getitem__(self, key):
+        if key in self.memory:
+            return self.memory[key]
+        with open(self.disk[key], 'rb') as f:
+            value = pickle.load(f)
+        # Keep the file, so that spilling this value again is free
+        self._store(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self:
+            del self[key]
+        self._store(key, value)
+
+    def _store(self, key, value):
+        self.memory[key] = value
+        n = self.nbytes[key] = sizeof(value)
+        self.memory_bytes += n
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key in self.memory:
+            del self.memory[key]
+            self.memory_bytes -= self.nbytes.pop(key)
+        if key in self.disk:
+            os.remove(self.disk.pop(key))
+
+    def __contains__(self, key):
+        return key in self.memory or key in self.disk
+
+    def __iter__(self):
+        for key in self.memory:
+            yield key
+        for key in self.disk:
+            if key not in self.memory:
+                yield key
+
+    def __len__(self):
+        return len(set(self.memory) | set(self.disk))
+
+    def spill(self, key):
+        """ Move a value from memory to disk
+
+        Values that we can not pickle stay in memory.
+        """
+        value = self.memory[key]
+        if key not in self.disk:
+            self._count += 1
+            fn = os.path.join(self.directory, '%d.pkl' % self._count)
+            try:
+                with open(fn, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                os.remove(fn)
+                return
+            self.disk[key] = fn
+        del self.memory[key]
+        self.memory_bytes -= self.nbytes.pop(key)
+
+    def spill_to(self, target, priority):
+        """ Spill values until at most ``target`` bytes remain in memory
+
+        Values with the greatest ``priority(key)`` spill first.
+        """
+        if self.memory_bytes <= target:
+            return
+        for key in sorted(self.memory, key=priority, reverse=True):
+            self.spill(key)
+            if self.memory_bytes <= target:
+                break
+
+    def close(self):
+        """ Remove all spilled data from disk
+
+        Values that are only on disk return to memory first, so that ``data``
+        ends up with every value, as if we had never spilled.
+        """
+        for key in list(self.disk):
+            if key not in self.memory:
+                self[key]
+        self.disk.clear()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
@@ -0,0 +1,286 @@
+"""
+A work-stealing threaded scheduler
+
+In ``dask.threaded.get`` a single scheduler thread hands every task to a
+``ThreadPool`` and receives every result through a ``Queue``.  For many small
+tasks that release the GIL this central thread becomes the bottleneck.
+
+Here there is no central thread.  Each worker thread keeps a local deque of
+ready tasks.  When a worker finishes a task it updates the shared scheduler
+state itself and pushes the dependents that became ready onto its own deque,
+sorted by ``dask.order`` so that it runs the most important one next, as
+``get_async`` would.  A worker without local work steals the oldest, least
+important, task from the other end of another worker's deque.
+
+Workers pop and steal tasks with the atomic operations of ``deque``, without
+locks.  They take a shared lock once per task, to record its result and
+claim their next local task, so callbacks see the same consistent state as
+with ``get_async``.  The tasks themselves run without the lock.
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import deque
+from multiprocessing import cpu_count
+import sys
+import threading
+import traceback
+from operator import add
+
+from .async import (start_state_from_dask, finish_task, _execute_task,
+                    nested_get, remote_exception, task_policy, CancelledError,
+                    inc)
+from .callbacks import unpack_callbacks
+from .context import _globals
+from .core import flatten
+from .optimize import cull
+from .order import order
+
+
+# Options of ``get_async`` that need its central scheduler thread.  Without
+# ``capacity``, ``resources`` has no effect there either.
+unsupported = ('queue', 'get_id', 'compact', 'batch', 'batch_duration',
+               'memory_limit', 'priority', 'timeout', 'speculative',
+               'release_results', 'checkpoint', 'precompile', 'adaptive',
+               'capacity')
+
+
+def get(dsk, result, cache=None, num_workers=None, callbacks=None,
+        raise_on_exception=False, rerun_exceptions_locally=None, retries=None,
+        cancel=None, analysis=None, sizes=None, **kwargs):
+    """ Threaded get function with work-stealing worker threads
+
+    Parameters
+    ----------
+
+    dsk: dict
+        A dask dictionary specifying a workflow
+    result: key or list of keys
+        Keys corresponding to desired data
+    cache: dict-like (optional)
+        Temporary storage of results
+    num_workers: integer (optional)
+        The number of worker threads, defaults to the number of cores
+    callbacks: tuple or list of tuples (optional)
+        Callbacks as in ``get_async``
+
+    ``raise_on_exception``, ``rerun_exceptions_locally``, ``retries``,
+    ``cancel``, ``analysis`` and ``sizes`` work as in ``get_async``.  We raise
+    a ``TypeError`` for the other options of ``get_async``, like
+    ``memory_limit`` or ``timeout``, which need its central scheduler thread,
+    whether given here or with ``set_options``.
+    Other keywords, e.g. those of optimizations, we ignore as ``get_async``
+    does.
+
+    Examples
+    --------
+
+    >>> dsk = {'x': 1, 'y': 2, 'z': (inc, 'x'), 'w': (add, 'z', 'y')}
+    >>> get(dsk, 'w')
+    4
+    >>> get(dsk, ['w', 'y'])
+    (4, 2)
+    """
+    def option(k):
+        v = kwargs.get(k)
+        return _globals.get(k) if v is None else v
+    bad = sorted(k for k in unsupported if option(k) not in (None, False))
+    if bad:
+        raise TypeError("The work-stealing scheduler does not support %s"
+                        % ', '.join(bad))
+    if num_workers is None:
+        num_workers = cpu_count()
+    if callbacks is None:
+        callbacks = _globals['callbacks']
+    (start_cbs, pretask_cbs, posttask_cbs, finish_cbs,
+     retry_cbs) = unpack_callbacks(callbacks)
+    if rerun_exceptions_locally is None:
+        rerun_exceptions_locally = _globals.get('rerun_exceptions_locally',
+                                                False)
+    if retries is None:
+        retries = _globals.get('retries')
+    if sizes is None:
+        sizes = _globals.get('sizes')
+
+    if isinstance(result, list):
+        result_flat = set(flatten(result))
+    else:
+        result_flat = set([result])
+    results = set(result_flat)
+
+    dsk = dsk.copy()
+    for f in start_cbs:
+        f(dsk)
+
+    dsk = cull(dsk, list(results), analysis=analysis)
+    keyorder = order(dsk, analysis=analysis, sizes=sizes)
+    # Keys that the caller put in the cache, which we keep on cancel
+    given = cache if cache is not None else _globals['cache']
+    given = set(given) if given else set()
+    state = start_state_from_dask(dsk, cache=cache, sortkey=keyorder.get)
+
+    if state['waiting'] and not state['ready']:
+        raise ValueError("Found no accessible jobs in dask")
+
+    # Deal the initial ready tasks to the workers, keeping their order
+    ready = state['ready']
+    n = len(ready)
+    deques = [deque(ready[n * i // num_workers: n * (i + 1) // num_workers])
+              for i in range(num_workers)]
+    del ready[:]
+    remaining = [n + len(state['waiting'])]     # Tasks left to finish
+
+    # Guards the scheduler state and the waits for work.  Deques take it only
+    # to push tasks, so that idle workers do not miss them.
+    lock = threading.Lock()
+    work = threading.Condition(lock)
+    errors = []
+    attempts = dict()       # key -> number of retries so far
+    done = threading.Event()
+
+    def next_task(i):
+        """ Pop a local task or steal one, None if there is no work """
+        try:
+            return deques[i].pop()
+        except IndexError:
+            pass
+        for j in range(1, num_workers):
+            try:
+                return deques[(i + j) % num_workers].popleft()
+            except IndexError:
+                pass
+
+    def claim(key):
+        """ Mark key as running and gather its inputs, holding the lock """
+        state['running'].add(key)
+        for f in pretask_cbs:
+            f(key, dsk, state)
+        return dict((dep, state['cache'][dep])
+                    for dep in state['dependencies'][key])
+
+    def retry(key, exc):
+        """ Run key again if it has retries left, holding the lock """
+        attempt = attempts.get(key, 0) + 1
+        if attempt > task_policy(retries, key, 0):
+            return False
+        attempts[key] = attempt
+        for f in retry_cbs:
+            f(key, exc, dsk, state, attempt)
+        return True
+
+    def worker(i):
+        ident = threading.current_thread().ident
+        local = deques[i]
+        key = None
+        while True:
+            if key is None:
+                key = next_task(i)
+                with lock:
+                    while key is None and not done.is_set():
+                        work.wait()
+                        key = next_task(i)
+                    if done.is_set():
+                        return
+                    data = claim(key)
+            try:
+                res = _execute_task(dsk[key], data)
+            except Exception as e:
+                tb = ''.join(traceback.format_tb(sys.exc_info()[2]))
+                with lock:
+                    if done.is_set():
+                        return
+                    state['running'].remove(key)
+                    if retry(key, e):
+                        local.append(key)
+                        key = None
+                        continue
+                    errors.append((key, e, tb))
+                    done.set()
+                    work.notify_all()
+                return
+
+            with lock:
+                if done.is_set():
+                    return
+                state['cache'][key] = res
+                state['ready'] = new = []
+                finish_task(dsk, key, state, results, keyorder.get)
+                local.extend(new)
+                for f in posttask_cbs:
+                    f(key, res, dsk, state, ident)
+                remaining[0] -= 1
+                if not remaining[0]:
+                    done.set()
+                    work.notify_all()
+                    return
+                # Run our most important task next, idle workers steal others
+                try:
+                    key = local.pop()
+                except IndexError:
+                    key = None
+                else:
+                    data = claim(key)
+                if local:
+                    work.notify(len(local))
+
+    def stop():
+        with lock:
+            done.set()
+            work.notify_all()
+
+    def abort(exc):
+        """ Stop the workers, release the results of this run and raise """
+        stop()
+        for f in finish_cbs:
+            f(dsk, state, True)
+        with lock:
+            for key in list(state['cache']):
+                if key in dsk and key not in given:
+                    del state['cache'][key]
+        raise exc
+
+    if cancel is not None and cancel.cancelled:
+        abort(CancelledError("Computation cancelled"))
+
+    threads = [threading.Thread(target=worker, args=(i,))
+               for i in range(num_workers)]
+    for t in threads:
+        t.daemon = True
+        t.start()
+
+    try:
+        with lock:
+            if not remaining[0]:
+                done.set()
+                work.notify_all()
+        while not done.is_set():
+            done.wait(0.1)  # Wake up now and then for KeyboardInterrupt
+            if cancel is not None and cancel.cancelled and not done.is_set():
+                abort(CancelledError("Computation cancelled"))
+    except KeyboardInterrupt:
+        stop()
+        for f in finish_cbs:
+            f(dsk, state, True)
+        raise
+
+    for t in threads:
+        t.join()
+
+    state['ready'] = []
+    if errors:
+        for f in finish_cbs:
+            f(dsk, state, True)
+        key, exc, tb = errors[0]
+        if rerun_exceptions_locally:
+            data = dict((dep, state['cache'][dep])
+                        for dep in state['dependencies'][key])
+            _execute_task(dsk[key], data)  # Re-execute locally
+        if raise_on_exception:
+            raise exc
+        raise remote_exception(exc, tb)
+
+    for f in finish_cbs:
+        f(dsk, state, False)
+
+    return nested_get(result, state['cache'])
+
+get._takes_analysis = True  # see dask.base._scheduler_kwargs
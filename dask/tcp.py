@@ -0,0 +1,310 @@
+"""
+A scheduler for worker processes on several machines, connected over TCP
+
+``TcpPool`` is a ``dask.multiprocessing.ProcessPool`` whose workers connect
+to the scheduler over TCP rather than being its child processes, so they may
+run on other machines.  The protocol is that of the process pool sent over
+``multiprocessing.connection``: workers register with the address at which
+they serve their data, then receive tasks and send back results.
+
+Workers run in resident mode: they keep the results that they compute and
+fetch the inputs that they lack directly from the worker that holds them.
+Only the final results travel to the scheduler.
+
+Start a scheduler, here waiting for two workers
+
+>>> pool = TcpPool(2, address=('0.0.0.0', 8786))  # doctest: +SKIP
+
+and on each worker machine point a worker at it, with the same secret key
+
+.. code-block:: bash
+
+    $ DASK_AUTHKEY=secret python -m dask.tcp scheduler-host:8786
+
+Then compute with ``get``
+
+>>> x.sum().compute(get=get, pool=pool)  # doctest: +SKIP
+
+To try this on one machine ``TcpPool(4, local=True)`` starts four workers on
+localhost ports itself.
+
+Connections are authenticated with an HMAC of the shared key but are not
+encrypted.  Use this within a trusted network only.
+"""
+from __future__ import absolute_import, division, print_function
+
+from multiprocessing.connection import Listener, Client
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+from time import sleep, time
+
+from .compatibility import Empty, Queue
+from .context import _globals
+from .multiprocessing import (ProcessPool, _worker, _serve_data,
+                              get as _mp_get)
+from .utils import ignoring
+
+
+class WorkerLost(Exception):
+    """ A worker disconnected from the scheduler """
+
+
+class _SchedulerInbox(object):
+    """ The inbox of a remote worker as seen from the scheduler """
+    def __init__(self, conn, address):
+        self.conn = conn
+        self.address = address
+        self.lock = threading.Lock()
+
+    def put(self, msg):
+        with self.lock:
+            try:
+                self.conn.send(msg)
+            except (IOError, OSError):
+                raise WorkerLost("Worker at %s disconnected"
+                                 % (self.address,))
+
+
+class _WorkerInbox(object):
+    """ The inbox of this worker, read from the scheduler connection """
+    def __init__(self, conn):
+        self.conn = conn
+
+    def get(self):
+        try:
+            return self.conn.recv()
+        except (EOFError, IOError, OSError):
+            return None     # Scheduler is gone, stop
+
+    def get_nowait(self):
+        if not self.conn.poll(0):
+            raise Empty()
+        return self.get()
+
+
+class _WorkerResults(object):
+    """ Results of this worker, sent back over the scheduler connection """
+    def __init__(self, conn):
+        self.conn = conn
+
+    def put(self, msg):
+        self.conn.send(msg)
+
+
+def _authkey(authkey):
+    if authkey is None:
+        authkey = os.environ.get('DASK_AUTHKEY')
+    if authkey is None:
+        return multiprocessing.current_process().authkey
+    if not isinstance(authkey, bytes):
+        authkey = authkey.encode()
+    return authkey
+
+
+def _connect(address, authkey, timeout):
+    """ Connect to the scheduler, which may not be listening yet """
+    deadline = time() + timeout
+    while True:
+        try:
+            return Client(address, authkey=authkey)
+        except (IOError, OSError):
+            if time() > deadline:
+                raise
+            sleep(0.1)
+
+
+def run_worker(scheduler, authkey=None, host=None, timeout=30):
+    """ Connect to a ``TcpPool`` scheduler and run its tasks until it closes
+
+    Parameters
+    ----------
+
+    scheduler: tuple
+        ``(host, port)`` of the scheduler
+    authkey: bytes, optional
+        The scheduler's key, by default ``$DASK_AUTHKEY``
+    host: str, optional
+        Interface on which to serve data to other workers, by default the one
+        that reaches the scheduler
+    timeout: float, optional
+        Seconds to wait for the scheduler to listen
+    """
+    authkey = _authkey(authkey)
+    # Other workers and the scheduler fetch our data with this key
+    multiprocessing.current_process().authkey = authkey
+    conn = _connect(tuple(scheduler), authkey, timeout)
+    if host is None:
+        sock = socket.fromfd(conn.fileno(), socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            host = sock.getsockname()[0]
+        finally:
+            sock.close()
+    listener = _serve_data((host, 0))
+    try:
+        conn.send(('register', listener.address))
+        index = conn.recv()
+        _worker(index, _WorkerInbox(conn), _WorkerResults(conn))
+    finally:
+        listener.close()
+        conn.close()
+
+
+class TcpPool(ProcessPool):
+    """ A pool of worker processes that connect over TCP
+
+    Waits until ``num_workers`` workers have registered.
+
+    Parameters
+    ----------
+
+    num_workers: int
+        Number of workers to wait for
+    address: tuple, optional
+        ``(host, port)`` to listen on, by default a free port on localhost
+    authkey: bytes or str, optional
+        Secret shared with the workers, by default ``$DASK_AUTHKEY`` or the
+        key of this process
+    local: bool, optional
+        Start the workers as local processes, for testing
+    max_functions: int, optional
+        Number of distinct functions that each worker keeps deserialized
+
+    Examples
+    --------
+
+    >>> pool = TcpPool(4, local=True)  # doctest: +SKIP
+    >>> get({'x': 1, 'y': (inc, 'x')}, 'y', pool=pool)  # doctest: +SKIP
+    2
+    >>> pool.close()  # doctest: +SKIP
+    """
+    def __init__(self, num_workers, address=('localhost', 0), authkey=None,
+                 local=False, max_functions=1000):
+        self.num_workers = num_workers
+        self.max_functions = max_functions
+        self.authkey = _authkey(authkey)
+        self.listener = Listener(address, authkey=self.authkey)
+        self.address = self.listener.address
+        self.results = Queue()
+        self.processes = []
+        if local:
+            for i in range(num_workers):
+                proc = multiprocessing.Process(target=run_worker,
+                                               args=(self.address,
+                                                     self.authkey))
+                proc.daemon = True
+                proc.start()
+                self.processes.append(proc)
+
+        self.connections = []
+        self.inboxes = []
+        self.addresses = []
+        for i in range(num_workers):
+            conn = self.listener.accept()
+            kind, data_address = conn.recv()
+            conn.send(i)
+            self.connections.append(conn)
+            self.inboxes.append(_SchedulerInbox(conn, data_address))
+            self.addresses.append(data_address)
+        self._init_state()
+
+        for i, conn in enumerate(self.connections):
+            t = threading.Thread(target=self._read, args=(i, conn))
+            t.daemon = True
+            t.start()
+
+    def _read(self, index, conn):
+        """ Move results of a worker to the result queue """
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, IOError, OSError):
+                break
+            self.results.put(msg)
+        if not self.closed:
+            self._lost(index)
+
+    def _lost(self, index):
+        """ Fail the running computations, their results may be lost """
+        exc = WorkerLost("Worker %d at %s disconnected"
+                         % (index, self.addresses[index]))
+        with self._lock:
+            self.load[index] = float('inf')     # Never choose it again
+        with self._cond:
+            for stash in self._stash.values():
+                stash.append((None, exc, '', None))
+            self._cond.notify_all()
+            if self._reading:
+                self.results.put((None, None, None))
+
+    def close(self):
+        """ Stop the workers once they finish their current tasks """
+        if self.closed:
+            return
+        self.closed = True
+        for inbox in self.inboxes:
+            with ignoring(WorkerLost):
+                inbox.put(None)
+        for proc in self.processes:
+            proc.join()
+        self._close_connections()
+
+    def terminate(self):
+        """ Disconnect from workers, stopping local workers immediately """
+        self.closed = True
+        for proc in self.processes:
+            proc.terminate()
+        for proc in self.processes:
+            proc.join()
+        self._close_connections()
+
+    def _close_connections(self):
+        for conn in self.connections:
+            conn.close()
+        self.listener.close()
+
+
+def get(dsk, keys, pool=None, **kwargs):
+    """ Compute on the workers of a ``TcpPool``
+
+    Parameters
+    ----------
+
+    dsk: dict
+        dask graph
+    keys: object or list
+        Desired results from graph
+    pool: TcpPool
+        The workers, by default the pool set with ``set_options(pool=...)``
+
+    Other keywords are those of ``dask.multiprocessing.get``.  Results stay
+    in the workers until the end, as with ``resident=True``.
+    """
+    if pool is None:
+        pool = _globals['pool']
+    if not isinstance(pool, TcpPool):
+        raise ValueError("dask.tcp.get needs a TcpPool, pass pool= or use "
+                         "set_options(pool=...)")
+    kwargs.setdefault('resident', True)
+    # Workers do not share memory with the scheduler or each other
+    kwargs['shared_memory'] = False
+    return _mp_get(dsk, keys, pool=pool, **kwargs)
+
+get._takes_analysis = True  # see dask.base._scheduler_kwargs
+
+
+def main(argv=None):
+    """ Run a worker: ``python -m dask.tcp scheduler-host:port [host]`` """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print("usage: python -m dask.tcp SCHEDULER_HOST:PORT [HOST]\n\n"
+              "Set DASK_AUTHKEY to the scheduler's key.")
+        return
+    host, port = argv[0].rsplit(':', 1)
+    run_worker((host, int(port)), host=argv[1] if len(argv) > 1 else None)
+
+
+if __name__ == '__main__':
+    main()
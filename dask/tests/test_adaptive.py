@@ -0,0 +1,63 @@
+from operator import add
+
+from dask.adaptive import Adaptive
+from dask.context import set_options
+from dask.threaded import get
+
+
+def inc(x):
+    return x + 1
+
+
+def test_hill_climbing():
+    a = Adaptive(ncores=8, blas=False)
+    assert a.start(8) == 8
+    # Fewer tasks are as fast, keep going down
+    assert a.record(completed=100, elapsed=1, cpu=2, running=8) == 6
+    assert a.record(completed=100, elapsed=1, cpu=2, running=6) == 5
+    # Slower, go back
+    assert a.record(completed=50, elapsed=1, cpu=1, running=5) == 6
+    # More tasks for nothing, go back down
+    assert a.record(completed=100, elapsed=1, cpu=2, running=6) == 7
+    assert a.record(completed=100, elapsed=1, cpu=2, running=7) == 6
+    assert [w.workers for w in a.history] == [8, 6, 5, 6, 7]
+
+
+def test_bounds():
+    a = Adaptive(maximum=2, ncores=8, blas=False)
+    assert a.start(8) == 2
+    assert a.record(completed=100, elapsed=1, cpu=2, running=2) == 1
+    assert a.record(completed=100, elapsed=1, cpu=1, running=1) == 1
+    assert a.direction == 1
+    assert a.start(1) == 1
+
+
+def test_oversubscription():
+    # Each task keeps four cores busy, as with multithreaded BLAS
+    a = Adaptive(ncores=8, blas=False)
+    a.start(8)
+    assert a.record(completed=10, elapsed=1, cpu=8, running=2) == 2
+
+
+def test_report():
+    a = Adaptive(ncores=4, blas=False)
+    a.start(4)
+    assert 'no measurements' in a.report()
+    a.record(completed=10, elapsed=0.5, cpu=1, running=4)
+    report = a.report()
+    assert '3 of 4 workers' in report
+    assert '20.00' in report
+    assert len(report.splitlines()) == 3
+
+
+def test_get():
+    dsk = dict((('x', i), (inc, i)) for i in range(100))
+    dsk['y'] = (sum, [('x', i) for i in range(100)])
+    dsk['z'] = (add, 'y', 1)
+    a = Adaptive(interval=0, blas=False)
+    assert get(dsk, 'z', num_workers=4, adaptive=a) == 5051
+    assert a.history
+    assert all(1 <= w.workers <= 4 for w in a.history)
+
+    with set_options(adaptive=True):
+        assert get(dsk, 'z', num_workers=4) == 5051
@@ -0,0 +1,118 @@
+from operator import add
+
+from dask.analysis import GraphAnalysis
+from dask.async import get_sync
+from dask.base import Base, compute
+from dask.optimize import cull, fuse, inline, inline_functions
+from dask.order import order
+from dask.utils import raises
+
+
+def inc(x):
+    return x + 1
+
+
+def double(x):
+    return x * 2
+
+
+dsk = {'a': 1, 'b': (inc, 'a'), 'c': (inc, 'b'), 'd': (add, 'c', 'b'),
+       'e': (double, 'd'), 'f': (add, 'e', 'e'), 'g': (inc, 'a')}
+
+
+def test_update():
+    a = GraphAnalysis(dsk)
+    assert a.walked == len(dsk)
+    assert a.dependencies['d'] == set(['b', 'c'])
+    assert a.dependents['b'] == set(['c', 'd'])
+    assert a.repeated == set(['f'])
+    assert a.fan_out['a'] == 2
+
+    # Unchanged tasks are not walked again
+    dsk2 = dict(dsk)
+    del dsk2['g']
+    dsk2['e'] = (double, (inc, 'c'))
+    a.update(dsk2)
+    assert a.walked == len(dsk) + 1
+    assert a.dependencies['e'] == set(['c'])
+    assert a.dependents['d'] == set()
+    assert a.dependents['c'] == set(['d', 'e'])
+    assert a.dependents['a'] == set(['b'])
+    assert 'g' not in a.dependencies
+    assert a.fan_out['a'] == 1
+
+    # New keys rebuild everything
+    dsk2['h'] = (inc, 'e')
+    a.update(dsk2)
+    assert a.walked == len(dsk) + 1 + len(dsk2)
+    assert a.dependents['e'] == set(['f', 'h'])
+
+
+def test_toposort_and_order():
+    a = GraphAnalysis(dsk)
+    toposort = a.toposort()
+    for key, deps in a.dependencies.items():
+        assert all(toposort.index(d) < toposort.index(key) for d in deps)
+    assert a.order() == order(dsk)
+    assert raises(RuntimeError,
+                  lambda: GraphAnalysis({'x': (inc, 'y'),
+                                         'y': (inc, 'x')}).toposort())
+
+
+def test_passes_match():
+    a = GraphAnalysis()
+    assert cull(dsk, 'f', analysis=a) == cull(dsk, 'f')
+    culled = cull(dsk, 'f')
+    assert fuse(culled, analysis=a) == fuse(culled)
+    assert fuse(culled, keys=['e'], analysis=a) == fuse(culled, keys=['e'])
+    assert inline(culled, 'b', analysis=a) == inline(culled, 'b')
+    assert (inline_functions(culled, [inc], analysis=a) ==
+            inline_functions(culled, [inc]))
+    assert order(culled, analysis=a) == order(culled)
+    assert raises(KeyError, lambda: cull(dsk, 'bad', analysis=a))
+
+
+def test_fuse_repeated_dependency():
+    d = {'x': 1, 'y': (inc, 'x'), 'z': (add, 'y', 'y')}
+    a = GraphAnalysis(d)
+    assert fuse(d, analysis=a) == fuse(d)
+    assert 'y' in fuse(d, analysis=a)
+
+
+class Tasks(Base):
+    """ A collection of one task, which records the analysis it sees """
+    analyses = []
+
+    def __init__(self, dsk, key):
+        self.dask = dsk
+        self.key = key
+
+    def _keys(self):
+        return [self.key]
+
+    @staticmethod
+    def _optimize(dsk, keys, analysis=None, **kwargs):
+        Tasks.analyses.append(analysis)
+        return fuse(cull(dsk, keys, analysis=analysis), keys,
+                    analysis=analysis)
+
+    _default_get = staticmethod(get_sync)
+    _finalize = staticmethod(lambda self, results: results[0])
+
+
+def test_compute_shares_analysis():
+    seen = []
+
+    def get(dsk, keys, analysis=None, **kwargs):
+        seen.append(analysis)
+        return get_sync(dsk, keys, analysis=analysis, **kwargs)
+    get._takes_analysis = True
+
+    del Tasks.analyses[:]
+    x = Tasks(dsk, 'f')
+    assert x.compute(get=get) == 20
+    assert compute(x, Tasks(dsk, 'd'), get=get) == (20, 5)
+    a, b = Tasks.analyses
+    assert seen == [a, b]
+    assert isinstance(a, GraphAnalysis) and a is not b
+    assert a.walked < 2 * len(dsk)
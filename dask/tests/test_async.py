@@ -187,3 +187,222 @@ def test_remote_exception():
     assert isinstance(a, TypeError)
     assert 'hello' in str(a)
     assert 'traceback' in str(a)
+
+
+def test_batch():
+    dsk = dict((('x', i), (inc, i)) for i in range(20))
+    dsk.update(dict((('y', i), (inc, ('x', i))) for i in range(20)))
+    dsk.update(dict((('z', i), (add, ('y', i), ('x', 0))) for i in range(20)))
+    dsk['total'] = (sum, [('z', i) for i in range(20)])
+    expected = get_sync(dsk, 'total')
+
+    from dask.threaded import get
+    assert get_sync(dsk, 'total', batch=True) == expected
+    assert get(dsk, 'total', batch=True) == expected
+    assert get(dsk, ['total', ('y', 3)], batch=True) == (expected, 5)
+    with dask.set_options(batch=True):
+        assert get(dsk, 'total', num_workers=2) == expected
+
+
+def test_batch_callbacks():
+    dsk = {'a': 1, 'b': (inc, 'a'), 'c': (inc, 'b'), 'd': (inc, 'c')}
+    pre, post = [], []
+
+    def pretask(key, dsk, state):
+        pre.append(key)
+
+    def posttask(key, result, dsk, state, worker_id):
+        post.append(key)
+        assert key in state['finished']
+
+    from dask.callbacks import Callback
+    with Callback(pretask=pretask, posttask=posttask):
+        assert get_sync(dsk, 'd', batch=True) == 4
+    assert sorted(pre) == sorted(post) == ['b', 'c', 'd']
+
+
+def test_batch_errors():
+    def bad(x):
+        raise ValueError("bad")
+    dsk = {'a': 1, 'b': (inc, 'a'), 'c': (bad, 'b'), 'd': (inc, 'c')}
+
+    from dask.threaded import get
+    with pytest.raises(ValueError):
+        get(dsk, 'd', batch=True)
+
+
+def test_batch_size():
+    assert batch_size(None, 0.01, 100, 4) == 1
+    assert batch_size(0.001, 0.01, 100, 4) == 10
+    assert batch_size(0.0001, 0.01, 100, 4) == 25
+    assert batch_size(1.0, 0.01, 100, 4) == 1
+    assert batch_size(0.0001, 0.01, 1, 4) == 1
+
+
+def test_memory_limit():
+    np = pytest.importorskip('numpy')
+    n = 20
+    dsk = dict((('x', i), (np.ones, 10000)) for i in range(n))
+    dsk.update(dict((('s', i), (np.sum, ('x', i))) for i in range(n)))
+    dsk['total'] = (sum, [('s', i) for i in range(n)])
+    # Every x is needed again at the end, so all of them pile up in memory
+    dsk['first'] = (lambda xs: sum(x[0] for x in xs),
+                    [('x', i) for i in range(n)])
+    dsk['out'] = (add, 'total', 'first')
+
+    peak = [0]
+    def posttask(key, result, dsk, state, id):
+        peak[0] = max(peak[0], state['cache'].memory_bytes)
+
+    assert get_sync(dsk, 'out', memory_limit=100000,
+               callbacks=[(None, None, posttask, None)]) == n * 10000 + n
+    assert peak[0] < 200000
+
+    with dask.set_options(memory_limit=100000):
+        assert get_sync(dsk, 'out') == n * 10000 + n
+
+    # Results reach the given cache, as without a limit
+    cache, cache2 = dict(), dict()
+    get_sync(dsk, 'out', cache=cache, memory_limit=100000)
+    get_sync(dsk, 'out', cache=cache2)
+    assert cache == cache2 == {'out': n * 10000 + n}
+
+
+def test_ready_heap():
+    ready = ReadyHeap(['a', 'b'], priority={'a': 1, 'b': 2, 'c': 0}.get)
+    assert ready[-1] == 'a' and 'b' in ready
+    ready.append('c')
+    assert list(ready) == ['b', 'a', 'c']
+    ready.remove('c')
+    assert 'c' not in ready and len(ready) == 2
+    assert ready.pop() == 'a'
+    assert ready.pop() == 'b'
+    assert not ready
+
+
+@pytest.mark.parametrize('priority', ['order', 'memory'])
+def test_priority(priority):
+    dsk = {'x': 1, 'y': (inc, 'x'), 'z': (add, 'x', 'y'),
+           'a': (inc, 'y'), 'b': (add, 'a', 'z'), 'c': (sum, ['a', 'b'])}
+    assert get_sync(dsk, 'c', priority=priority) == get_sync(dsk, 'c')
+    assert get_sync(dsk, 'c', priority=priority, compact=True) == 9
+    assert get_sync(dsk, 'c', priority=priority, batch=True) == 9
+    with dask.set_options(priority=priority):
+        assert get_sync(dsk, ['c', 'z']) == (9, 3)
+
+    with pytest.raises(ValueError):
+        get_sync(dsk, 'c', priority='foo')
+
+
+def test_priority_runs_in_global_order():
+    dsk = dict(('x%d' % i, (inc, i)) for i in range(10))
+    dsk.update(dict(('y%d' % i, (inc, 'x%d' % i)) for i in range(10)))
+    dsk['total'] = (sum, ['y%d' % i for i in range(10)])
+    keyorder = order(dsk)
+
+    def pretask(key, dsk, state):
+        assert all(keyorder[key] < keyorder[k] for k in state['ready'])
+
+    get_sync(dsk, 'total', priority='order',
+             callbacks=[(None, pretask, None, None)])
+
+
+def test_sizes_order_for_memory():
+    dsk = dict(('x%d' % i, (inc, i)) for i in range(3))
+    dsk.update(dict(('y%d' % i, (inc, i)) for i in range(3)))
+    dsk['x'] = (sum, ['x%d' % i for i in range(3)])
+    dsk['y'] = (list, ['y%d' % i for i in range(3)])
+    dsk['total'] = (add, 'x', (sum, 'y'))
+    sizes = {'x0': 10, 'x1': 10, 'x2': 10, 'y': 30}
+    started = []
+
+    def pretask(key, dsk, state):
+        started.append(key)
+
+    assert get_sync(dsk, 'total', sizes=sizes,
+                    callbacks=[(None, pretask, None, None)]) == 12
+    assert started.index('x') < min(started.index('y%d' % i)
+                                    for i in range(3))
+
+    with dask.set_options(sizes=sizes):
+        assert get_sync(dsk, 'total') == 12
+
+
+def test_releases():
+    dsk = {'x': 1, 'y': 2, 'a': (add, 'x', 'y'), 'b': (inc, 'x')}
+    state = start_state_from_dask(dsk)
+    assert releases('a', state) == 1
+    assert releases('b', state) == 0
+    state['waiting_data']['x'].remove('a')
+    assert releases('b', state) == 1
+
+
+def test_as_completed():
+    dsk = {'x': 1, 'y': (inc, 'x'), 'z': (add, 'y', 10), 'w': (inc, 'z')}
+    assert dict(as_completed(get_sync, dsk, ['x', 'z', ['w']])) == \
+            {'x': 1, 'z': 12, 'w': 13}
+    assert list(as_completed(get_sync, dsk, 'y')) == [('y', 2)]
+
+
+def test_as_completed_releases_results():
+    caches = []
+    def posttask(key, res, dsk, state, id):
+        caches.append(set(state['cache']))
+
+    dsk = dict((('x', i), (inc, i)) for i in range(5))
+    keys = [('x', i) for i in range(5)]
+    results = as_completed(get_sync, dsk, keys,
+                           callbacks=[(None, None, posttask, None)])
+    assert sorted(results) == [(('x', i), i + 1) for i in range(5)]
+    # The scheduler never held more than the task that just finished
+    assert all(len(c) <= 1 for c in caches)
+
+
+def test_as_completed_errors():
+    def bad(x):
+        raise ValueError('12345')
+
+    dsk = {'x': 1, 'y': (bad, 'x')}
+    with pytest.raises(ValueError):
+        list(as_completed(get_sync, dsk, ['x', 'y']))
+
+
+def test_as_completed_stop_early():
+    import threading
+    from dask.threaded import get
+    from dask.compatibility import Queue
+    started = Queue()
+
+    def slow(i):
+        started.put(i)
+        return i
+
+    dsk = dict((('x', i), (slow, i)) for i in range(1000))
+    for key, result in as_completed(get, dsk, list(dsk), maxsize=1):
+        break
+    assert started.qsize() < 1000
+
+
+def test_cancel_token():
+    from dask.compatibility import Queue
+    token = CancelToken()
+    queue = Queue()
+    execute_task('x', (inc, 1), {}, queue, lambda: 0, cancel=token)
+    assert queue.get()[:2] == ('x', 2)
+    token.cancel()
+    execute_task('x', (inc, 1), {}, queue, lambda: 0, cancel=token)
+    execute_batch([('x', (inc, 1), {})], queue, lambda: 0, cancel=token)
+    assert queue.empty()
+
+    cancel = CancelToken()
+    dsk = {'x': 1, 'y': (inc, 'x'), 'z': (lambda y: cancel.cancel(), 'y'),
+           'w': (inc, 'z')}
+    with pytest.raises(CancelledError):
+        get_sync(dsk, 'w', cancel=cancel)
+
+    # Results of the run are released, what the caller cached stays
+    cancel = CancelToken()
+    cache = {'y': 10, 'other': 0}
+    with pytest.raises(CancelledError):
+        get_sync(dsk, 'w', cancel=cancel, cache=cache)
+    assert cache == {'y': 10, 'other': 0}
@@ -0,0 +1,98 @@
+import threading
+import time
+from operator import add
+
+import pytest
+asyncio = pytest.importorskip('asyncio')
+
+from dask.asyncio import get, get_future
+from dask.context import set_options
+from dask.utils import raises
+
+
+def inc(x):
+    return x + 1
+
+
+def bad(x):
+    raise ValueError("12345")
+
+
+def test_get():
+    dsk = {'x': 1, 'y': (asyncio.sleep, 0, 2),
+           'z': (add, 'x', 'y'), 'w': (inc, 'z')}
+    assert get(dsk, 'w') == 4
+    assert get(dsk, ['w', 'z']) == (4, 3)
+    assert get(dsk, [['w'], ['x', 'y']]) == ((4,), (1, 2))
+
+
+def test_many_coroutines_in_flight():
+    n = 2000
+    dsk = dict((('x', i), (asyncio.sleep, 0.2, i)) for i in range(n))
+    dsk['total'] = (sum, [('x', i) for i in range(n)])
+    start = time.time()
+    assert get(dsk, 'total') == sum(range(n))
+    assert time.time() - start < 2
+
+
+def test_max_inflight():
+    running = [0, 0]
+
+    def enter(x):
+        running[0] += 1
+        running[1] = max(running)
+        return x
+
+    def leave(x):
+        running[0] -= 1
+        return x
+
+    dsk = dict((('x', i), (enter, i)) for i in range(20))
+    dsk.update(dict((('y', i), (asyncio.sleep, 0.01, ('x', i)))
+                    for i in range(20)))
+    dsk.update(dict((('z', i), (leave, ('y', i))) for i in range(20)))
+    dsk['total'] = (sum, [('z', i) for i in range(20)])
+    assert get(dsk, 'total', max_inflight=3) == sum(range(20))
+    assert running[1] <= 3
+
+
+def test_plain_functions_run_in_threads():
+    main = threading.current_thread().ident
+    dsk = {'x': (lambda: threading.current_thread().ident,)}
+    assert get(dsk, 'x') != main
+    assert get(dsk, 'x', num_workers=2) != main
+
+
+def test_errors_propagate():
+    dsk = {'x': (asyncio.sleep, 0, 1), 'y': (bad, 'x')}
+    try:
+        get(dsk, 'y')
+        assert False
+    except ValueError as e:
+        assert '12345' in str(e)
+
+    dsk = {'x': (asyncio.sleep, 'not a number'), 'y': (inc, 'x')}
+    assert raises(TypeError, lambda: get(dsk, 'y'))
+
+
+def test_callbacks():
+    log = []
+    start = lambda dsk: log.append('start')
+    pretask = lambda key, dsk, state: log.append(('pre', key))
+    posttask = lambda key, res, dsk, state, id: log.append(('post', key, res))
+    finish = lambda dsk, state, errored: log.append(('finish', errored))
+    dsk = {'x': (asyncio.sleep, 0, 1), 'y': (inc, 'x')}
+    with set_options(callbacks=[(start, pretask, posttask, finish)]):
+        assert get(dsk, 'y') == 2
+    assert log == ['start', ('pre', 'x'), ('post', 'x', 1),
+                   ('pre', 'y'), ('post', 'y', 2), ('finish', False)]
+
+
+def test_get_future():
+    loop = asyncio.new_event_loop()
+    try:
+        dsk = {'x': (asyncio.sleep, 0, 1), 'y': (inc, 'x')}
+        future = get_future(dsk, ['y', 'x'], loop=loop)
+        assert loop.run_until_complete(future) == (2, 1)
+    finally:
+        loop.close()
@@ -9,7 +9,8 @@ from toolz import compose, partial, curry
 
 import dask
 from dask.base import (compute, tokenize, normalize_token, normalize_function,
-        visualize)
+        visualize, compute_as_completed)
+from dask.async import get_sync
 from dask.utils import raises, tmpfile, ignoring
 
 
@@ -202,6 +203,34 @@ def test_compute_array_bag():
     assert bb == [1, 2, 3]
 
 
+def test_compute_merges_common_subexpressions():
+    np_x = np.arange(10)
+    calls = []
+
+    def double(block):
+        calls.append(block)
+        return block * 2
+
+    # The same work under different names
+    a = da.from_array(np_x, chunks=5, name='a').map_blocks(double)
+    b = da.from_array(np_x, chunks=5, name='b').map_blocks(double)
+    assert a.name != b.name
+
+    assert compute(a.sum(), b.sum(), get=get_sync, cse=True) == (90, 90)
+    assert len(calls) == 2
+
+    del calls[:]
+    assert compute(a.sum(), b.sum(), get=get_sync) == (90, 90)
+    assert len(calls) == 4
+
+    del calls[:]
+    with dask.set_options(cse=True):
+        x, y = compute(a, b + 1, get=get_sync)
+    assert x.tolist() == (np_x * 2).tolist()
+    assert y.tolist() == (np_x * 2 + 1).tolist()
+    assert len(calls) == 2
+
+
 def test_compute_with_literal():
     x = da.arange(5, chunks=2)
     y = 10
@@ -213,6 +242,21 @@ def test_compute_with_literal():
     assert compute(5) == (5,)
 
 
+def test_compute_with_plain_get():
+    def get(dsk, keys):
+        return dask.async.get_sync(dsk, keys)
+
+    x = da.arange(5, chunks=2)
+    assert compute(x.sum(), x + 1, get=get)[0] == 10
+    assert x.sum().compute(get=get) == 10
+    assert x.sum().compute(get=dask.get) == 10
+
+    pytest.importorskip('asyncio')
+    from dask.asyncio import get as asyncio_get
+    assert x.sum().compute(get=asyncio_get) == 10
+    assert compute(x.sum(), get=asyncio_get) == (10,)
+
+
 def test_visualize():
     pytest.importorskip('graphviz')
     try:
@@ -229,3 +273,22 @@ def test_visualize():
         assert os.path.exists(os.path.join(d, 'mydask.png'))
     finally:
         shutil.rmtree(d)
+
+
+def test_compute_as_completed():
+    da = pytest.importorskip('dask.array')
+    a = da.arange(10, chunks=2).sum()
+    b = da.arange(10, chunks=2) + 1
+    results = dict((id(c), r)
+                   for c, r in compute_as_completed(a, b, 1, get=get_sync))
+    assert results[id(a)] == 45
+    assert (results[id(b)] == np.arange(10) + 1).all()
+    assert len(results) == 2
+
+    # Prepared as in compute
+    assert raises(ValueError, lambda: list(compute_as_completed(
+        a, db.from_sequence([1, 2]))))
+    c = a + 0
+    results = list(compute_as_completed(a, c, get=get_sync, cse=True))
+    assert sorted(id(v) for v, _ in results) == sorted([id(a), id(c)])
+    assert [r for _, r in results] == [45, 45]
@@ -0,0 +1,84 @@
+from functools import partial
+from operator import add
+
+import pytest
+
+from dask.benchmarks import (simulate, compare, crosstalk, dense, trivial,
+                             reductions, reduction_sizes, task_durations,
+                             task_sizes)
+from dask.diagnostics.profile import TaskData, CacheData
+from dask.order import order
+
+
+def inc(x):
+    return x + 1
+
+
+def test_generators():
+    dsk, keys = trivial(5, 3)
+    assert len(dsk) == 15 and len(keys) == 5
+    assert crosstalk(5, 3, 2, seed=1) == crosstalk(5, 3, 2, seed=1)
+    dsk, keys = dense(5, 3)
+    assert all(len(dsk[k][1]) == 5 for k in keys)
+
+
+def test_simulate():
+    dsk, keys = trivial(4, 3)
+    assert simulate(dsk, keys, num_workers=1).makespan == 8
+    assert simulate(dsk, keys, num_workers=8).makespan == 2
+
+    dsk = {'x': 1, 'y': (inc, 'x'), 'z': (inc, 'x'), 'w': (add, 'y', 'z')}
+    schedule = []
+    result = simulate(dsk, 'w', num_workers=2,
+                      durations={'y': 3, 'z': 1, 'w': 0.5},
+                      sizes={'x': 10, 'y': 100}, schedule=schedule)
+    assert result.ntasks == 3
+    assert result.makespan == 3.5
+    # x, y and z are in memory once y finishes, then x is released
+    assert result.peak_memory == 10 + 100 + 1
+    assert sorted(k for k, _, _, _ in schedule) == ['w', 'y', 'z']
+    assert [(s, e) for k, _, s, e in schedule if k == 'w'] == [(3, 3.5)]
+
+
+def test_profiler_results():
+    durations = task_durations([TaskData('y', (inc, 'x'), 1.0, 3.0, 0)])
+    sizes = task_sizes([CacheData('y', (inc, 'x'), 50, 1.0, 3.0)])
+    dsk = {'x': 1, 'y': (inc, 'x')}
+    result = simulate(dsk, 'y', durations=durations, sizes=sizes)
+    assert result.makespan == 2.0
+    assert result.peak_memory == 51
+
+
+def test_policies():
+    dsk, keys = dense(4, 3)
+    calls = []
+
+    def priority(key, state):
+        calls.append(key)
+        return key
+
+    def reverse_order(dsk):
+        return dict((k, -v) for k, v in order(dsk).items())
+
+    table = compare(dsk, keys, [None, 'memory', priority,
+                                ('order', reverse_order)], num_workers=2)
+    lines = table.splitlines()
+    assert len(lines) == 5
+    assert lines[3].startswith('priority ')
+    assert lines[4].startswith('order/reverse_order')
+    assert calls
+
+    with pytest.raises(ValueError):
+        simulate(dsk, keys, priority='unknown')
+
+
+def test_memory_order():
+    dsk, keys = reductions(10, 8)
+    memory_order = partial(order, sizes=reduction_sizes)
+    for num_workers in [1, 4]:
+        plain = simulate(dsk, keys, num_workers=num_workers,
+                         sizes=reduction_sizes)
+        ordered = simulate(dsk, keys, num_workers=num_workers,
+                           sizes=reduction_sizes, order=memory_order)
+        assert ordered.peak_memory <= plain.peak_memory
+        assert ordered.peak_memory <= 95
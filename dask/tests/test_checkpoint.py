@@ -0,0 +1,158 @@
+import os
+from operator import add
+import subprocess
+import sys
+from time import sleep
+
+import pytest
+
+from dask.async import get_sync
+from dask.checkpoint import Checkpoint, graph_tokens
+from dask.context import set_options
+from dask.threaded import get
+
+
+calls = []
+
+
+def inc(x):
+    calls.append(x)
+    return x + 1
+
+
+def slowinc(x):
+    calls.append(x)
+    sleep(0.05)
+    return x + 1
+
+
+def checkpoints(directory):
+    return sorted(f for f in os.listdir(directory) if not f.startswith('.'))
+
+
+def test_checkpoint_resumes(tmpdir):
+    directory = str(tmpdir)
+    dsk = {'x': 1, 'y': (inc, 'x'), 'z': (inc, 'y'), 'w': (add, 'z', 10)}
+    del calls[:]
+    with Checkpoint(directory, keys=['z']):
+        assert get_sync(dsk, 'w') == 13
+    assert calls == [1, 2]
+    assert len(checkpoints(directory)) == 1
+    assert checkpoints(directory)[0].startswith('z-')
+
+    del calls[:]
+    with Checkpoint(directory, keys=['z']):
+        assert get(dsk, 'w') == 13
+    assert calls == []  # y and z are not computed again
+
+
+def test_checkpoint_invalidated_by_changes(tmpdir):
+    directory = str(tmpdir)
+    dsk = {'x': 1, 'y': (inc, 'x'), 'z': (add, 'y', 10)}
+    with Checkpoint(directory, keys='y'):
+        assert get_sync(dsk, 'z') == 12
+
+    del calls[:]
+    dsk2 = {'x': 2, 'y': (inc, 'x'), 'z': (add, 'y', 10)}
+    with Checkpoint(directory, keys='y'):
+        assert get_sync(dsk2, 'z') == 13
+    assert calls == [2]
+
+    dsk3 = {'x': 1, 'y': (slowinc, 'x'), 'z': (add, 'y', 10)}
+    assert graph_tokens(dsk, ['z'])['y'] != graph_tokens(dsk3, ['z'])['y']
+    assert graph_tokens(dsk, ['z']) == graph_tokens(dict(dsk), ['z'])
+
+
+def test_checkpoint_invalidated_by_closures(tmpdir):
+    directory = str(tmpdir)
+
+    def make(n, scale=1):
+        def f(x):
+            return (x + n) * scale
+        return f
+
+    def make_default(n):
+        def f(x, n=n):
+            return x + n
+        return f
+
+    for func, result in [(make(1), 2), (make(2), 3), (make(2, scale=2), 6),
+                         (make_default(1), 2), (make_default(3), 4)]:
+        with Checkpoint(directory, keys=['b']):
+            assert get_sync({'a': 1, 'b': (func, 'a')}, 'b') == result
+    assert len(checkpoints(directory)) == 5
+
+
+resume_script = """
+import sys
+import numpy as np
+import dask.array as da
+from dask.async import get_sync
+from dask.checkpoint import Checkpoint
+
+x = da.from_array(np.arange(10), chunks=5)
+y = ((x + 1) * 2).sum() + x.mean()
+checkpoint = Checkpoint(sys.argv[1], min_duration=0)
+with checkpoint:
+    assert y.compute(get=get_sync) == 114.5
+print(len(checkpoint.loaded))
+"""
+
+
+def test_checkpoint_resumes_in_other_process(tmpdir):
+    pytest.importorskip('numpy')
+    pytest.importorskip('dask.array')
+    script = str(tmpdir.join('resume.py'))
+    with open(script, 'w') as f:
+        f.write(resume_script)
+    directory = str(tmpdir.join('ckpt'))
+    env = dict(os.environ, PYTHONHASHSEED='random',
+               PYTHONPATH=os.path.dirname(os.path.dirname(
+                   os.path.dirname(os.path.abspath(__file__)))))
+
+    def run():
+        return int(subprocess.check_output([sys.executable, script,
+                                            directory], env=env))
+
+    assert run() == 0
+    written = len(checkpoints(directory))
+    assert written > 0
+    assert run() == written
+    assert len(checkpoints(directory)) == written
+
+
+def test_checkpoint_by_duration(tmpdir):
+    directory = str(tmpdir)
+    dsk = {'a': (slowinc, 1), 'b': (inc, 10), 'c': (add, 'a', 'b')}
+    with Checkpoint(directory, min_duration=0.04):
+        assert get_sync(dsk, 'c') == 13
+    # c counts the duration of a
+    assert [f.split('-')[0] for f in checkpoints(directory)] == ['a', 'c']
+
+
+def test_checkpoint_keyword(tmpdir):
+    directory = str(tmpdir.join('ckpt'))
+    dsk = {'x': (slowinc, 1), 'y': (inc, 'x')}
+    del calls[:]
+    with set_options(checkpoint=Checkpoint(directory, keys=['x'])):
+        assert get(dsk, 'y') == 3
+    assert get(dsk, 'y', checkpoint=Checkpoint(directory, keys=['x'])) == 3
+    assert calls == [1, 2, 2]
+
+    del calls[:]
+    assert get_sync(dsk, 'y', checkpoint=directory) == 3
+    assert calls == [2]
+
+
+class Unpicklable(object):
+    """ Can not be pickled by pickle, cloudpickle or dill """
+    def __reduce__(self):
+        raise TypeError('can not pickle')
+
+
+def test_checkpoint_unpicklable_results(tmpdir):
+    directory = str(tmpdir)
+    dsk = {'x': (Unpicklable,), 'y': (type, 'x')}
+    with Checkpoint(directory, keys=['x']):
+        assert get_sync(dsk, 'y') is Unpicklable
+    assert checkpoints(directory) == []
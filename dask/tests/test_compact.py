@@ -0,0 +1,109 @@
+from __future__ import absolute_import, division, print_function
+
+from operator import add
+
+import pytest
+pytest.importorskip('numpy')
+
+import dask
+from dask.async import get_sync, inc, order, start_state_from_dask
+from dask.core import get_dependencies
+from dask.optimize import cull
+from dask.async import finish_task as dict_finish_task
+from dask.compact import start_state_from_dask as compact_start_state
+from dask.compact import finish_task, CSRGraph
+from dask.callbacks import Callback
+
+
+def test_csr_graph():
+    dsk = {'x': 1, 'y': (inc, 'x'), 'z': (add, 'x', 'y')}
+    g = CSRGraph.from_dask(dsk)
+    deps = lambda k: set(g.keys[i] for i in g.dependencies(g.index[k]))
+    dependents = lambda k: set(g.keys[i] for i in g.dependents(g.index[k]))
+    assert deps('z') == set(['x', 'y'])
+    assert deps('x') == set()
+    assert dependents('x') == set(['y', 'z'])
+    assert dependents('z') == set()
+
+
+def test_csr_graph_cull_and_order():
+    dsk = {'a': 1, 'b': 2, 'c': (inc, 'a'), 'd': (add, 'b', 'c'),
+           'e': (inc, 'x'), 'f': [(inc, 'd'), 'd'], 'g': (add, 'a', 'a')}
+    g = CSRGraph.from_dask(dsk, extra={'x': 10})
+    assert g.ngraph == len(dsk) and g.keys[g.ngraph:] == ['x']
+    assert sorted(g.keys[i] for i in g.data.nonzero()[0]) == ['a', 'b']
+
+    for keys in [['f'], ['d', 'e'], ['g'], list(dsk)]:
+        culled = g.cull(keys)
+        expected = cull(dsk, keys)
+        assert sorted(culled.keys[:culled.ngraph], key=str) == sorted(expected)
+        assert culled.order() == order(expected)
+        for i, k in enumerate(culled.keys[:culled.ngraph]):
+            assert (set(culled.keys[j] for j in culled.dependencies(i)) ==
+                    get_dependencies(dsk, k) | (set(['x']) if k == 'e'
+                                                else set()))
+
+
+def test_start_state_matches_dict_state():
+    dsk = {'x': 1, 'y': 2, 'z': (inc, 'x'), 'w': (add, 'z', 'y')}
+    expected = start_state_from_dask(dsk)
+    result = compact_start_state(dsk)
+
+    for k in ['cache', 'ready', 'running', 'finished', 'released']:
+        assert result[k] == expected[k]
+    for k in ['dependencies', 'dependents', 'waiting', 'waiting_data']:
+        assert dict(result[k]) == expected[k]
+
+
+def test_start_state_looks_at_cache():
+    dsk = {'b': (inc, 'a')}
+    cache = {'a': 1}
+    result = compact_start_state(dsk, cache)
+    assert result['dependencies']['b'] == set(['a'])
+    assert result['dependents']['a'] == set(['b'])
+    assert result['ready'] == ['b']
+
+
+def test_finish_task_matches_dict_state():
+    dsk = {'x': 1, 'y': 2, 'z': (inc, 'x'), 'w': (add, 'z', 'y')}
+    sortkey = order(dsk).get
+    states = [start_state_from_dask(dsk), compact_start_state(dsk)]
+    for state, finish in zip(states, [dict_finish_task, finish_task]):
+        state['ready'].remove('z')
+        state['running'] = set(['z', 'other-task'])
+        state['cache']['z'] = 2
+        finish(dsk, 'z', state, set(), sortkey)
+
+    expected, result = states
+    for k in ['cache', 'ready', 'running', 'finished', 'released']:
+        assert result[k] == expected[k]
+    for k in ['dependencies', 'dependents', 'waiting', 'waiting_data']:
+        assert dict(result[k]) == expected[k]
+
+
+def test_get_compact():
+    dsk = {'x': 1, 'y': 2, 'z': (inc, 'x'), 'w': (add, 'z', 'y'),
+           ('a', 0): (add, 'w', 'w'), ('a', 1): (sum, [('a', 0), 'x'])}
+    assert get_sync(dsk, 'w', compact=True) == 4
+    assert get_sync(dsk, [('a', 1), 'z'], compact=True) == (9, 2)
+
+    with dask.set_options(compact=True):
+        assert get_sync(dsk, ['w', 'y']) == (4, 2)
+
+
+def test_compact_callbacks_see_keys():
+    dsk = {('x', 0): 1, ('x', 1): (inc, ('x', 0)),
+           ('x', 2): (add, ('x', 0), ('x', 1))}
+    seen = []
+
+    def pretask(key, dsk, state):
+        seen.append(key)
+        assert set(state['dependencies'][key]) <= set(dsk)
+        assert key in state['running']
+
+    def posttask(key, value, dsk, state, worker_id):
+        assert key in state['finished']
+
+    with Callback(pretask=pretask, posttask=posttask):
+        assert get_sync(dsk, ('x', 2), compact=True) == 3
+    assert seen == [('x', 1), ('x', 2)]
@@ -0,0 +1,95 @@
+from operator import add
+
+from dask.async import get_sync
+from dask.base import _optimize
+from dask.context import set_options
+from dask.graphcache import GraphCache, current_graph_cache, graph_cache
+from dask.optimize import cull
+from dask.threaded import get
+
+
+def inc(x):
+    return x + 1
+
+
+def test_graph_cache():
+    gc = GraphCache(maxsize=2)
+    calls = []
+
+    def compute(name):
+        def f():
+            calls.append(name)
+            return name
+        return f
+
+    dsk = {'x': 1, 'y': (inc, 'x')}
+    assert gc.get('a', dsk, 'y', compute(1)) == 1
+    assert gc.get('a', dict(dsk), 'y', compute(2)) == 1
+    assert gc.get('a', dsk, ['y'], compute(3)) == 3      # other keys
+    assert gc.get('b', dsk, 'y', compute(4)) == 4        # other kind
+    assert calls == [1, 3, 4]
+    assert gc.info() == (1, 3, 2, 2)
+
+    # LRU eviction of ('a', 'y')
+    assert gc.get('a', dsk, 'y', compute(5)) == 5
+    assert gc.get('b', dsk, 'y', compute(6)) == 4
+
+    # Tasks must be the same objects
+    dsk2 = {'x': 1, 'y': (inc, 'x')}
+    assert gc.get('b', dsk2, 'y', compute(7)) == 7
+    assert gc.get('b', dsk2, 'y', compute(8)) == 7
+
+    # Unhashable parameters are not cached
+    assert gc.get('b', dsk, 'y', compute(9), extra=([],)) == 9
+    assert gc.get('b', dsk, 'y', compute(10), extra=([],)) == 10
+
+    gc.clear()
+    assert gc.info() == (0, 0, 2, 0)
+
+
+def test_current_graph_cache():
+    assert current_graph_cache() is None
+    with set_options(graph_cache=True):
+        assert current_graph_cache() is graph_cache
+    gc = GraphCache()
+    with set_options(graph_cache=gc):
+        assert current_graph_cache() is gc
+
+
+def test_schedulers_reuse_analysis():
+    dsk = {'x': 1, 'y': (inc, 'x'), 'z': (add, 'y', 'x'), 'w': (inc, 'y')}
+    gc = GraphCache()
+    with set_options(graph_cache=gc):
+        assert get(dsk, 'z') == 3
+        assert get(dsk, 'z') == 3
+        assert get_sync(dsk, ['z', 'w']) == (3, 3)
+    assert gc.info().hits == 1
+    assert gc.info().misses == 2
+    assert get(dsk, 'w') == 3
+
+
+def test_optimize():
+    dsk = {'x': 1, 'y': (inc, 'x'), 'z': (inc, 'x')}
+    calls = []
+
+    def opt(dsk, keys, **kwargs):
+        calls.append(keys)
+        return cull(dsk, keys)
+
+    gc = GraphCache()
+    with set_options(graph_cache=gc):
+        assert _optimize(opt, dsk, ['y']) == {'x': 1, 'y': (inc, 'x')}
+        assert _optimize(opt, dsk, ['y']) == {'x': 1, 'y': (inc, 'x')}
+        _optimize(opt, dsk, ['y'], num_workers=2)
+    assert len(calls) == 2
+    _optimize(opt, dsk, ['y'])
+    assert len(calls) == 3
+
+    # Options of fuse_subgraphs from set_options are part of the entry
+    del calls[:]
+    with set_options(graph_cache=gc, fuse_subgraphs=True):
+        _optimize(opt, dsk, ['y'])
+        _optimize(opt, dsk, ['y'])
+        with set_options(fuse_boundaries=('y',)):
+            _optimize(opt, dsk, ['y'])
+    assert len(calls) == 2
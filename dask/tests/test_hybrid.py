@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+import time
+from operator import add
+
+import pytest
+
+from dask.hybrid import (get, holds_gil, releases_gil, route, GilMonitor,
+                         PROCESSES, THREADS, thread_clock)
+
+
+def pid(*args):
+    return os.getpid()
+
+
+@holds_gil
+def parse(text):
+    return json.loads(text)
+
+
+@holds_gil
+def process_pid(*args):
+    return os.getpid()
+
+
+@releases_gil
+def thread_pid(*args):
+    return os.getpid()
+
+
+def test_get():
+    dsk = {'x': 1, 'y': (parse, '[1, 2, 3]'), 'z': (sum, 'y'),
+           'w': (add, 'x', 'z')}
+    assert get(dsk, 'w') == 7
+    assert get(dsk, ['w', 'y']) == (7, [1, 2, 3])
+
+
+def test_routes_by_annotation():
+    dsk = {'a': (process_pid,), 'b': (thread_pid, 'a'), 'c': (process_pid, 'b')}
+    a, b, c = get(dsk, ['a', 'b', 'c'])
+    assert b == os.getpid()
+    assert a != os.getpid()
+    assert c != os.getpid()
+
+
+def test_routes_keyword():
+    dsk = {'a': (pid,), 'b': (pid, 'a')}
+    assert get(dsk, 'b') == os.getpid()
+    assert get(dsk, 'a', routes={pid: PROCESSES}) != os.getpid()
+    assert get(dsk, 'b', routes={'pid': PROCESSES}) != os.getpid()
+    assert route((thread_pid,), routes={thread_pid: PROCESSES}) == PROCESSES
+
+
+def test_data_crosses_pools():
+    dsk = {'a': (parse, '[1, 2]'), 'b': (sum, 'a'), 'c': (str, 'b'),
+           'd': (parse, 'c'), 'e': (add, 'd', 'b')}
+    assert get(dsk, 'e') == 6
+
+
+def test_callbacks_see_values():
+    from dask.async import as_completed
+    from dask.callbacks import Callback
+    dsk = {'a': (parse, '[1, 2]'), 'b': (sum, 'a'), 'c': (parse, '3'),
+           'd': (add, 'b', 'c')}
+    seen = dict()
+
+    def posttask(key, value, dsk, state, id):
+        seen[key] = value
+
+    with Callback(posttask=posttask):
+        assert get(dsk, 'd') == 6
+    assert seen == {'a': [1, 2], 'b': 3, 'c': 3, 'd': 6}
+    assert sorted(as_completed(get, dsk, ['a', 'd'])) == [('a', [1, 2]),
+                                                          ('d', 6)]
+    with pytest.raises(ValueError):
+        get(dsk, 'd', cache=dict())
+
+
+def test_errors():
+    def bad(*args):
+        raise ValueError('bad')
+    dsk = {'a': (parse, 'not json'), 'b': (bad, 1)}
+    with pytest.raises(ValueError):
+        get(dsk, 'a')
+    with pytest.raises(ValueError):
+        get(dsk, 'b')
+
+
+def test_gil_monitor():
+    monitor = GilMonitor(samples=3, ncores=4)
+    monitor.record('f', cpu=0.1, wall=0.5, concurrent=True)
+    monitor.record('f', cpu=0.1, wall=0.5, concurrent=True)
+    assert monitor.route('f') is None
+    monitor.record('f', cpu=0.1, wall=0.5, concurrent=False)
+    assert monitor.route('f') is None
+    monitor.record('f', cpu=0.1, wall=0.5, concurrent=True)
+    assert monitor.route('f') == PROCESSES
+    assert route((pid,), monitor=monitor) == THREADS
+
+    for i in range(3):
+        monitor.record('g', cpu=0.5, wall=0.5, concurrent=True)
+    assert monitor.route('g') == THREADS
+
+    single = GilMonitor(ncores=1)
+    for i in range(3):
+        single.record('f', cpu=0.1, wall=0.5, concurrent=True)
+    assert single.route('f') is None
+
+
+def test_learned_routes():
+    monitor = GilMonitor(ncores=4)
+    name = pid.__module__ + '.pid'
+    for i in range(3):
+        monitor.record(name, cpu=0.1, wall=0.5, concurrent=True)
+    assert get({'a': (pid,)}, 'a', monitor=monitor) != os.getpid()
+
+
+def check_clock(clock):
+    start = clock()
+    time.sleep(0.05)
+    assert clock() - start < 0.03
+    start = clock()
+    end = time.time() + 0.05
+    while time.time() < end:
+        pass
+    assert clock() - start > 0.01
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux') or
+                    thread_clock() is None,
+                    reason='thread clocks of Linux')
+def test_thread_clock(monkeypatch):
+    import resource
+    check_clock(thread_clock())
+
+    # As on Python 3.3 to 3.6, on Python 3.2 and on Python 2
+    monkeypatch.delattr(time, 'thread_time', raising=False)
+    check_clock(thread_clock())
+    monkeypatch.delattr(time, 'clock_gettime', raising=False)
+    check_clock(thread_clock())
+    monkeypatch.delattr(resource, 'RUSAGE_THREAD', raising=False)
+    check_clock(thread_clock())
@@ -0,0 +1,100 @@
+import pickle
+
+from dask.async import get_sync
+from dask.core import inc
+from dask.layers import Layer, Deferred, LayeredGraph, materialize
+from dask.optimize import cull
+
+
+def tasks(name, n, dep=None):
+    if dep is None:
+        return dict(((name, i), i) for i in range(n))
+    return dict(((name, i), (inc, (dep, i))) for i in range(n))
+
+
+def test_deferred_builds_once():
+    calls = []
+
+    def build(name, n, dep):
+        calls.append(name)
+        return tasks(name, n, dep)
+
+    layer = Deferred(build, 'y', 3, 'x')
+    assert not calls
+    assert layer[('y', 1)] == (inc, ('x', 1))
+    assert len(layer) == 3 and ('y', 2) in layer
+    assert calls == ['y']
+
+    layer2 = pickle.loads(pickle.dumps(Deferred(dict, [('a', 1)])))
+    assert dict(layer2) == {'a': 1}
+
+
+def test_layered_graph_mapping():
+    dsk = LayeredGraph({'x': tasks('x', 3), 'y': tasks('y', 3, 'x'),
+                        'z': {'z': (sum, [('y', i) for i in range(3)])}},
+                       {'y': set(['x']), 'z': set(['y'])})
+    expected = tasks('x', 3)
+    expected.update(tasks('y', 3, 'x'))
+    expected['z'] = (sum, [('y', i) for i in range(3)])
+    assert dict(dsk) == expected
+    assert len(dsk) == 7
+    assert 'z' in dsk and ('x', 3) not in dsk and [1] not in dsk
+    assert dsk.copy() == expected
+    assert get_sync(dsk, 'z') == 6
+    assert cull(dsk, 'z') == cull(expected, 'z')
+    assert dict(pickle.loads(pickle.dumps(dsk))) == expected
+
+
+def test_from_collections_shares_layers():
+    x = LayeredGraph.from_collections('x', tasks('x', 2))
+    y = LayeredGraph.from_collections('y', Deferred(tasks, 'y', 2, 'x'), [x])
+    z = LayeredGraph.from_collections('z', tasks('z', 2, 'x'), [x])
+    w = LayeredGraph.from_collections('w', {'w': (sum, [('y', 0), ('z', 1)])},
+                                      [y, z])
+    assert w.layers['x'] is x.layers['x']
+    assert w.layers['y'] is y.layers['y']
+    assert w.dependencies['w'] == set(['y', 'z'])
+    assert get_sync(w, 'w') == 3
+
+    # A plain dict graph becomes a layer of its own
+    v = LayeredGraph.from_collections('v', {'v': (inc, 'a')}, [{'a': 1}])
+    assert sorted(v.layers) == ['v', 'v-input-0']
+    assert get_sync(v, 'v') == 2
+
+
+def test_cull_builds_only_needed_tasks():
+    built = []
+
+    class Counted(Layer):
+        """ Builds single tasks on request, and counts them """
+        def __init__(self, name, dep, n):
+            self.name, self.dep, self.n = name, dep, n
+
+        def _build(self):
+            return dict(((self.name, i), self[(self.name, i)])
+                        for i in range(self.n))
+
+        def __contains__(self, key):
+            return (type(key) is tuple and key[0] == self.name and
+                    0 <= key[1] < self.n)
+
+        def __getitem__(self, key):
+            if key not in self:
+                raise KeyError(key)
+            built.append(key)
+            return (inc, (self.dep, key[1]))
+
+    unused = Deferred(lambda: 1 / 0)    # never built
+    dsk = LayeredGraph({'x': tasks('x', 100), 'y': Counted('y', 'x', 100),
+                        'u': unused},
+                       {'y': set(['x']), 'u': set(['x'])})
+    assert sorted(dsk.cull_layers([('y', 5)]).layers) == ['x', 'y']
+
+    result = dsk.cull([('y', 5), ('y', 7)])
+    assert result == {('y', 5): (inc, ('x', 5)), ('y', 7): (inc, ('x', 7)),
+                      ('x', 5): 5, ('x', 7): 7}
+    assert sorted(built) == [('y', 5), ('y', 7)]
+    assert unused._tasks is None
+
+    plain = {'a': 1}
+    assert materialize(plain, 'a') is plain
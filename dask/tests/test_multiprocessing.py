@@ -4,6 +4,7 @@ from dask.multiprocessing import get, pickle_apply_async
 from dask.multiprocessing import _dumps, _loads
 from dask.context import set_options
 import multiprocessing
+import os
 import pickle
 from operator import add
 from dask.utils import raises
@@ -32,7 +33,7 @@ def test_pickle_globals():
         _loads(_dumps(f)).__globals__.keys())
 
 
-def bad():
+def bad(*args):
     raise ValueError("12345")
 
 
@@ -75,3 +76,201 @@ def test_dumps_loads():
 def test_fuse_doesnt_clobber_intermediates():
     d = {'x': 1, 'y': (inc, 'x'), 'z': (add, 10, 'y')}
     assert get(d, ['y', 'z']) == (2, 12)
+
+
+def test_persistent_pool():
+    from dask.multiprocessing import default_pool, ProcessPool
+    pool = default_pool(2)
+    assert isinstance(pool, ProcessPool)
+    assert get({'x': (inc, 1)}, 'x', num_workers=2) == 2
+    assert default_pool(2) is pool
+    assert get({'x': 1, 'y': (add, 'x', 2)}, 'y', num_workers=2) == 3
+
+
+def test_process_pool():
+    from dask.multiprocessing import ProcessPool
+    pool = ProcessPool(2)
+    try:
+        with set_options(pool=pool):
+            dsk = dict((('x', i), (inc, i)) for i in range(20))
+            dsk['y'] = (sum, [('x', i) for i in range(20)])
+            assert get(dsk, 'y') == 210
+            assert get(dsk, 'y') == 210
+            assert raises(ValueError, lambda: get({'x': (bad,)}, 'x'))
+            assert get(dsk, 'y', batch=True) == 210
+        assert all(len(s) > 0 for s in pool.seen)
+    finally:
+        pool.close()
+    assert pool.closed
+    assert not any(p.is_alive() for p in pool.processes)
+
+
+def test_process_pool_caches_functions():
+    from dask.multiprocessing import ProcessPool
+    pool = ProcessPool(1)
+    f = lambda x: x + 1
+    try:
+        with set_options(pool=pool):
+            assert get({'x': (f, 1)}, 'x') == 2
+            assert get({'x': (f, 2)}, 'x') == 3
+        # f, execute_task and _process_get_id, each serialized once
+        assert len(pool._sfuncs) == 3
+    finally:
+        pool.close()
+
+
+def test_shared_pool_between_threads():
+    from dask.multiprocessing import ProcessPool
+    from multiprocessing.pool import ThreadPool
+    pool = ProcessPool(2)
+    try:
+        def compute(i):
+            dsk = dict((('x', j), (add, i, j)) for j in range(10))
+            dsk['y'] = (sum, [('x', j) for j in range(10)])
+            return get(dsk, 'y')
+        tp = ThreadPool(4)
+        with set_options(pool=pool):
+            result = tp.map(compute, range(8))
+        assert result == [10 * i + 45 for i in range(8)]
+        tp.close()
+    finally:
+        pool.close()
+
+
+def test_shutdown():
+    from dask.multiprocessing import default_pool, shutdown
+    pool = default_pool(1)
+    shutdown()
+    assert pool.closed
+    assert get({'x': (inc, 1)}, 'x', num_workers=1) == 2
+    assert default_pool(1) is not pool
+
+
+def test_shared_memory():
+    from dask.multiprocessing import default_pool, _shm_directory
+    directory = _shm_directory()
+    before = set(os.listdir(directory))
+
+    x = np.arange(1000000, dtype='f8')
+    dsk = {'x': x,
+           'y': (np.multiply, 'x', 2),
+           'z': (np.add, 'y', 1),
+           'w': (np.sum, 'z'),
+           'v': (np.asfortranarray, (np.reshape, 'z', (1000, 1000)))}
+    w, z, v = get(dsk, ['w', 'z', 'v'], shared_memory=True)
+    assert w == (x * 2 + 1).sum()
+    assert isinstance(z, np.memmap)
+    assert (z == x * 2 + 1).all()
+    assert v.flags.f_contiguous
+    assert (v == (x * 2 + 1).reshape((1000, 1000))).all()
+
+    assert set(os.listdir(directory)) == before
+    assert not any(default_pool()._files.values())
+
+
+def test_shared_memory_reuses_results():
+    x = np.ones(500000, dtype='i8')
+    dsk = {'a': (np.ones, 500000, 'i8'),
+           'b': (np.add, 'a', 1),
+           'c': (np.add, 'a', 'b'),
+           'd': (np.sum, 'c')}
+    with set_options(shared_memory=1000):
+        assert get(dsk, 'd', batch=True) == 3 * 500000
+
+
+def test_shared_memory_pandas():
+    pd = pytest.importorskip('pandas')
+    df = pd.DataFrame({'a': np.arange(200000), 'b': np.ones(200000)})
+    dsk = {'df': df, 'x': (lambda d: d + 1, 'df'), 'y': (len, 'x')}
+    x, y = get(dsk, ['x', 'y'], shared_memory=1000)
+    assert y == 200000
+    assert (x.a.values == df.a.values + 1).all()
+
+
+def test_resident():
+    from dask.multiprocessing import _worker_data
+    n = 8
+    dsk = dict((('x', i), (np.arange, 100000)) for i in range(n))
+    dsk.update(dict((('y', i), (add, ('x', i), ('x', (i + 1) % n)))
+                    for i in range(n)))
+    dsk.update(dict((('z', i), (np.sum, ('y', i))) for i in range(n)))
+    dsk['total'] = (sum, [('z', i) for i in range(n)])
+    expected = get(dsk, ['total', ('y', 0)])
+    total, y0 = get(dsk, ['total', ('y', 0)], resident=True)
+    assert total == expected[0]
+    assert (y0 == expected[1]).all()
+
+    with set_options(resident=True):
+        assert get(dsk, 'total') == expected[0]
+
+    # Resident data is released from the workers
+    assert get({'x': (len, (_worker_data.copy,))}, 'x') == 0
+
+
+def test_resident_errors():
+    dsk = {'x': (np.ones, 10), 'y': (bad, 'x'), 'z': (add, 'x', 'y')}
+    try:
+        get(dsk, 'z', resident=True)
+        assert False
+    except Exception as e:
+        assert isinstance(e, ValueError)
+        assert "12345" in str(e)
+    pool = multiprocessing.Pool(2)
+    try:
+        with set_options(pool=pool):
+            assert raises(ValueError, lambda: get(dsk, 'x', resident=True))
+    finally:
+        pool.close()
+
+
+def test_resident_callbacks_see_values():
+    from dask.async import as_completed
+    from dask.callbacks import Callback
+    dsk = {'a': (np.arange, 5), 'b': (inc, 'a'), 'c': (np.sum, 'b'),
+           'd': (np.max, 'b')}
+    seen = dict()
+
+    def posttask(key, value, dsk, state, id):
+        seen[key] = value
+
+    with Callback(posttask=posttask):
+        assert get(dsk, ['c', 'd'], resident=True) == (15, 5)
+    assert seen['b'].tolist() == [1, 2, 3, 4, 5]
+    assert seen['c'] == 15
+
+    assert sorted(as_completed(get, dsk, ['c', 'd'], resident=True)) == [
+        ('c', 15), ('d', 5)]
+
+    assert raises(ValueError, lambda: get(dsk, 'c', resident=True,
+                                          cache=dict()))
+
+
+def test_resident_batch():
+    dsk = dict(('x%d' % i, (inc, 'x%d' % (i - 1))) for i in range(1, 100))
+    dsk['x0'] = 0
+    assert get(dsk, 'x99', resident=True, batch=True) == 99
+
+
+def test_cancel_queued_tasks():
+    import time
+    from dask.async import execute_task
+    from dask.multiprocessing import ProcessPool, _process_get_id
+    pool = ProcessPool(1)
+    try:
+        queue = pool.queue()
+        for i in range(5):
+            pool.apply_async(execute_task, args=[('x', i), (time.sleep, 0.2),
+                                                 {}, queue, _process_get_id])
+        queue.cancel()
+        start = time.time()
+        msgs = [queue.get() for i in range(5)]
+        assert time.time() - start < 0.7
+        assert msgs.count(None) >= 3
+        assert pool.load == [0]
+        queue.close()
+
+        # The pool still works for other computations
+        with set_options(pool=pool):
+            assert get({'x': (add, 1, 2)}, 'x') == 3
+    finally:
+        pool.close()
@@ -1,10 +1,13 @@
 from itertools import count
-from operator import add, mul, getitem
+from operator import add, mul, sub, getitem
 from functools import partial
 from dask.utils import raises
 from dask.optimize import (cull, fuse, inline, inline_functions, functions_of,
         dealias, equivalent, sync_keys, merge_sync, fuse_getitem,
-        fuse_selections, identity)
+        fuse_selections, identity, compile_task, precompile, CompiledTask,
+        fuse_subgraphs, cse)
+from dask.analysis import GraphAnalysis
+from dask.core import get
 
 
 def inc(x):
@@ -155,6 +158,13 @@ def test_inline_doesnt_shrink_fast_functions_at_top():
     assert result == dsk
 
 
+def test_inline_functions_keeps_output():
+    dsk = {'out': (add, 'i', 1), 'i': (inc, 'x'), 'x': 1}
+    result = inline_functions(dsk, fast_functions=set([inc]),
+                              output=['out', 'i'])
+    assert result == dsk
+
+
 def test_inline_traverses_lists():
     x, y, i, d = 'xyid'
     dsk = {'out': (sum, [i, d]),
@@ -208,6 +218,12 @@ def test_dealias():
 
     assert dealias(dsk)  == expected
 
+    # Requested keys stay
+    dsk = {'a': (range, 5), 'b': 'a', 'c': (sum, 'b'), 'd': 'c'}
+    result = dealias(dsk, ['a', 'b', 'd'])
+    assert result == {'a': (range, 5), 'b': (identity, 'a'),
+                      'd': (sum, 'b')}
+
 
 def test_equivalent():
     t1 = (add, 'a', 'b')
@@ -271,6 +287,64 @@ def test_sync_uncomparable():
     assert sync_keys(dsk1, dsk2) == {'x': 'a', 'y': 'b'}
 
 
+def test_cse():
+    dsk = {'a': 1, 'b': 1, 'c': 1.0, 'd': True,
+           'x': (inc, 'a'), 'y': (inc, 'b'), 'z': (inc, 'c'), 'w': (inc, 'd'),
+           'out': (add, 'x', (add, 'y', (add, 'z', 'w')))}
+    result = cse(dsk, 'out')
+    assert sorted(result) == ['a', 'c', 'd', 'out', 'w', 'x', 'z']
+    assert result['out'] == (add, 'x', (add, 'x', (add, 'z', 'w')))
+    assert get(result, 'out') == get(dsk, 'out')
+
+    # Requested keys stay, excluded keys are not merged
+    result = cse(dsk, ['x', 'y'], exclude=['b'])
+    assert result['y'] == (inc, 'b')
+    result = cse(dsk, ['x', 'y'])
+    assert result['y'] == (identity, 'x')
+    assert get(result, ['x', 'y']) == [2, 2]
+
+    # Equivalent subgraphs under different names
+    dsk = {('a', 0): (range, 5), ('a', 1): (getitem, ('a', 0), slice(0, 2)),
+           ('b', 0): (range, 5), ('b', 1): (getitem, ('b', 0), slice(0, 2)),
+           ('c', 1): (getitem, ('b', 0), slice(0, 3)),
+           'p': (mul, (sum, ('a', 1)), 0.0), 'q': (mul, (sum, ('b', 1)), -0.0),
+           'r': (sum, ['p', 'q'])}
+    result = cse(dsk, ['r', ('c', 1)], analysis=GraphAnalysis())
+    assert sorted(result, key=str) == [('a', 0), ('a', 1), ('c', 1),
+                                       'p', 'q', 'r']
+    assert result['q'] == (mul, (sum, ('a', 1)), -0.0)
+    assert result[('c', 1)] == (getitem, ('a', 0), slice(0, 3))
+    assert get(result, 'r') == 0
+
+    dsk = {'x': 1, 'y': (inc, 'x')}
+    assert cse(dsk, 'y') is dsk
+
+    # Partials and closures built twice for the same work
+    def plus(n):
+        return lambda x: x + n
+
+    dsk = {'a': 1, 'x': (plus(1), 'a'), 'y': (plus(1), 'a'),
+           'z': (plus(1.0), 'a'), 'p': (partial(add, 1), 'a'),
+           'q': (partial(add, 1), 'a'), 'r': (partial(sub, 1), 'a'),
+           'out': (list, ['x', 'y', 'z', 'p', 'q', 'r'])}
+    result = cse(dsk, 'out')
+    assert sorted(result) == ['a', 'out', 'p', 'r', 'x', 'z']
+    assert get(result, 'out') == [2, 2, 2.0, 2, 2, 0]
+    assert type(get(result, 'out')[2]) is float
+
+    # Tasks of functions with _cse = False run once for each key
+    written = []
+
+    def write(x):
+        written.append(x)
+        return x
+    write._cse = False
+
+    dsk = {'a': (write, 1), 'b': (write, 1), 'out': (add, 'a', 'b')}
+    assert cse(dsk, 'out') is dsk
+    assert get(dsk, 'out') == 2 and written == [1, 1]
+
+
 def test_merge_sync():
     dsk1 = {'a': 1, 'b': (add, 'a', 10), 'c': (mul, 'b', 5)}
     dsk2 = {'x': 1, 'y': (add, 'x', 10), 'z': (mul, 'y', 2)}
@@ -334,3 +408,93 @@ def test_fuse_selections():
     dsk2 = fuse_selections(dsk, getitem, load, merge)
     dsk2 = cull(dsk2, 'y')
     assert dsk2 == {'y': (load, 'store', 'part', 'a')}
+
+
+def test_compile_task():
+    c = compile_task((add, (inc, 'x'), (double, (inc, 'x'))), ['x'])
+    assert c(1) == 2 + 4
+    assert len(c.code) == 4
+
+    # Constants, lists and tuples pass through as in _execute_task
+    c = compile_task((add, [('a', 1), (inc, 'x'), ('x',)], ['y', 1]),
+                     ['x', ('a', 1)])
+    assert c(1, 'A') == ['A', 2, ('x',), 'y', 1]
+    # Lists are new on every call
+    c = compile_task((list, [1, 2]), [])
+    a, b = c(), c()
+    assert a == b == [1, 2] and a is not b
+
+    c = compile_task((inc, 'x'), ['x'])
+    assert c.func is inc
+    assert 'inc' in repr(c)
+    assert raises(ValueError, lambda: compile_task('x', ['x']))
+
+
+def test_precompile():
+    from dask.async import get_sync
+    from dask.threaded import get
+    import pickle
+    dsk = {'x': 1, 'y': (inc, (double, 'x')), 'z': (add, 'y', [1, 'x']),
+           'w': (sum, ['y', 'x', 'y']), 'a': 'x'}
+    dsk2 = precompile(dsk)
+    assert isinstance(dsk2['y'][0], CompiledTask)
+    assert dsk2['y'][1:] == ('x',)
+    assert dsk2['w'][1:] == ('y', 'x')
+    assert dsk2['x'] == 1 and dsk2['a'] == 'x'
+    assert get_sync(dsk2, ['y', 'w', 'a']) == (3, 7, 1)
+    assert get(dsk, 'w', precompile=True) == 7
+    c = pickle.loads(pickle.dumps(dsk2['y'][0]))
+    assert c(1) == 3
+
+
+def test_fuse_subgraphs():
+    from dask.async import get_sync
+    from dask.resources import requires
+
+    # Tree
+    d = {'a': 1, 'b': (inc, 'a'), 'c': (double, 'a'), 'd': (add, 'b', 'c')}
+    assert fuse_subgraphs(d) == {'a': 1,
+                                 'd': (add, (inc, 'a'), (double, 'a'))}
+    assert fuse_subgraphs(d, keys=['b']) == {'a': 1, 'b': (inc, 'a'),
+                                             'd': (add, 'b', (double, 'a'))}
+
+    # Diamond, 'b' is computed once
+    calls = []
+
+    def count(x):
+        calls.append(x)
+        return x
+
+    d = {'a': 1, 'b': (count, 'a'), 'c': (inc, 'b'), 'd': (double, 'b'),
+         'e': (add, 'c', 'd')}
+    d2 = fuse_subgraphs(d)
+    assert sorted(d2) == ['a', 'e']
+    assert isinstance(d2['e'][0], CompiledTask)
+    assert d2['e'][1:] == ('a',)
+    assert get_sync(d2, 'e') == get_sync(d, 'e') == 4
+    assert calls == [1, 1]
+
+    # Repeated use
+    d = {'a': 1, 'b': (inc, 'a'), 'c': (add, 'b', 'b')}
+    d2 = fuse_subgraphs(d)
+    assert list(d2['c'][1:]) == ['a']
+    assert get_sync(d2, 'c') == 4
+
+    # Width and depth limits
+    d = dict((('x', i), (inc, i)) for i in range(5))
+    d['y'] = (sum, [('x', i) for i in range(5)])
+    assert len(fuse_subgraphs(d)) == 1
+    assert len(fuse_subgraphs(d, max_width=2)) == 4
+    d = {'a': 1, 'b': (inc, 'a'), 'c': (inc, 'b'), 'd': (add, 'c', 'a')}
+    assert sorted(fuse_subgraphs(d, max_depth=1)) == ['a', 'b', 'd']
+
+    # Boundaries
+    d = {'a': 1, 'b': (inc, 'a'), ('c', 0): (double, 'a'),
+         'd': (add, 'b', ('c', 0))}
+    assert 'b' in fuse_subgraphs(d, boundaries=[inc])
+    assert ('c', 0) in fuse_subgraphs(d, boundaries=['c'])
+    assert 'b' in fuse_subgraphs(d, boundaries=['b'])
+    assert 'b' in fuse_subgraphs(d, resources={'b': {'io': 1}})
+    load = requires({'io': 1})(lambda x: x)
+    assert 'b' in fuse_subgraphs(dict(d, b=(load, 'a')))
+
@@ -1,5 +1,6 @@
 from itertools import chain
-from dask.order import dfs, child_max, ndependents, order, inc, get_deps
+from dask.order import (dfs, child_max, ndependents, order, inc, get_deps,
+                        memory_peaks)
 
 
 def issorted(L, reverse=False):
@@ -165,3 +166,29 @@ def test_ndependents():
     deps = get_deps(dsk)
     assert ndependents(*deps) == {a: 3, b: 2, c: 1}
 
+
+
+def test_order_with_sizes():
+    # Reduce the large blocks of 'a' before we make the large result of 'e'
+    dsk = dict((('a', i), (f,)) for i in range(3))
+    dsk.update((('b', i), (f,)) for i in range(3))
+    dsk['r'] = (f, [('a', i) for i in range(3)])
+    dsk['e'] = (f, [('b', i) for i in range(3)])
+    dsk['out'] = (f, 'r', 'e')
+    sizes = {'a': 10, 'b': 1, 'r': 1, 'e': 30}
+
+    dependencies, dependents = get_deps(dsk)
+    peaks = memory_peaks(dependencies, dependents,
+                         lambda k: sizes.get(k[0] if isinstance(k, tuple)
+                                             else k, 1))
+    assert peaks['r'] == 31
+    assert peaks['e'] == 33
+    assert peaks['out'] == 34
+
+    o = order(dsk, sizes=sizes)
+    assert max(o[('a', i)] for i in range(3)) < min(o[('b', i)]
+                                                  for i in range(3))
+    for k, deps in dependencies.items():
+        assert all(o[dep] > o[k] for dep in deps)
+
+    assert order(dsk, sizes=lambda k: 1) == order(dsk, sizes={})
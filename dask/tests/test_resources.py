@@ -0,0 +1,68 @@
+import threading
+from time import sleep
+
+from dask.async import get_sync
+from dask.context import set_options
+from dask.resources import ResourcePool, requires, task_resources
+from dask.threaded import get
+
+
+class Concurrency(object):
+    """ Count how many calls of a function run at once """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most = 0
+
+    def __call__(self, x):
+        with self.lock:
+            self.running += 1
+            self.most = max(self.most, self.running)
+        sleep(0.01)
+        with self.lock:
+            self.running -= 1
+        return x
+
+
+def test_task_resources():
+    @requires({'io': 1})
+    def load(x):
+        return x
+
+    assert task_resources('x', (load, 1)) == {'io': 1}
+    assert task_resources('x', (load, 1), {'x': {'io': 2}}) == {'io': 2}
+    assert task_resources(('x', 0), (sum, []), {'x': {'io': 2}}) == {'io': 2}
+    assert task_resources('y', (sum, []), {sum: {'cpu': 1}}) == {'cpu': 1}
+    assert task_resources('y', (sum, []), {'x': {'io': 2}}) == {}
+
+
+def test_resource_pool():
+    pool = ResourcePool({'memory': 10},
+                        {'a': {'memory': 6}, 'b': {'memory': 6},
+                         'c': {'memory': 20}, 'd': {'memory': 1, 'io': 5}})
+    assert pool.acquire('a', None)
+    assert not pool.acquire('b', None)
+    assert not pool.acquire('c', None)
+    assert pool.acquire('d', None)          # fits, io is unlimited
+    assert pool.release('d') == []
+    assert pool.release('a') == ['b']
+    assert pool.acquire('b', None)
+    assert pool.release('b') == ['c']       # too big, runs alone
+    assert pool.acquire('c', None)
+    assert pool.used == {'memory': 20}
+    assert pool.release('c') == []
+    assert pool.release('unknown') == []
+
+
+def test_capacity():
+    load, compute = Concurrency(), Concurrency()
+    dsk = dict((('load', i), (load, i)) for i in range(8))
+    dsk.update((('compute', i), (compute, i)) for i in range(8))
+    dsk['total'] = (sum, list(dsk))
+    kwargs = dict(resources={'load': {'io': 1}}, capacity={'io': 1})
+    assert get(dsk, 'total', num_workers=4, **kwargs) == 56
+    assert load.most == 1
+    assert compute.most > 1
+
+    with set_options(**kwargs):
+        assert get_sync(dsk, 'total', batch=True) == 56
@@ -0,0 +1,29 @@
+import sys
+
+import pytest
+
+from dask.sizeof import sizeof
+
+
+def test_base():
+    assert sizeof(1) == sys.getsizeof(1)
+
+
+def test_containers():
+    assert sizeof([1, 2, [3]]) > sizeof([1, 2])
+    assert sizeof({'a': 'x' * 1000}) > 1000
+
+
+def test_numpy():
+    np = pytest.importorskip('numpy')
+    assert sizeof(np.empty(1000, dtype='f8')) == 8000
+    assert sizeof([np.empty(1000, dtype='f8')] * 2) > 16000
+
+
+def test_pandas():
+    pd = pytest.importorskip('pandas')
+    df = pd.DataFrame({'x': [1, 2, 3], 'y': [1.0, 2.0, 3.0]},
+                      index=[1, 2, 3])
+    assert sizeof(df) >= 3 * 8 * 3
+    assert sizeof(df.x) >= 3 * 8 * 2
+    assert sizeof(df.index) >= 3 * 8
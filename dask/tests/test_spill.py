@@ -0,0 +1,61 @@
+import os
+
+from dask.spill import Spill
+
+
+def test_spill():
+    s = Spill({'x': 1})
+    s['y'] = list(range(1000))
+    assert s.memory_bytes == s.nbytes['x'] + s.nbytes['y']
+
+    s.spill('y')
+    assert s.memory_bytes == s.nbytes['x']
+    assert 'y' in s and sorted(s) == ['x', 'y'] and len(s) == 2
+    assert os.path.exists(s.disk['y'])
+
+    assert s['y'] == list(range(1000))
+    assert 'y' in s.memory
+    assert sorted(s) == ['x', 'y'] and len(s) == 2
+
+    del s['y']
+    assert 'y' not in s and not s.disk
+    assert s.memory_bytes == s.nbytes['x']
+
+    directory = s.directory
+    s.close()
+    assert not os.path.exists(directory)
+
+
+def test_spill_writes_through():
+    data = {'x': 1}
+    s = Spill(data)
+    s['y'] = list(range(1000))
+    assert data['y'] == list(range(1000))
+    s.spill('y')
+    assert 'y' not in data
+    del s['x']
+    assert 'x' not in data
+    s.close()
+    assert data == {'y': list(range(1000))}
+
+
+def test_spill_to():
+    s = Spill(dict(('x%d' % i, 'x' * 1000) for i in range(10)))
+    order = dict(('x%d' % i, i) for i in range(10))
+    s.spill_to(3500, order.get)
+    assert sorted(s.memory) == ['x0', 'x1', 'x2']
+    assert len(s) == 10
+    s.close()
+
+
+class Unpicklable(object):
+    """ Can not be pickled by pickle, cloudpickle or dill """
+    def __reduce__(self):
+        raise TypeError('can not pickle')
+
+
+def test_unpicklable_values_stay_in_memory():
+    s = Spill({'f': Unpicklable()})
+    s.spill('f')
+    assert 'f' in s.memory
+    s.close()
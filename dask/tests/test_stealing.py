@@ -0,0 +1,160 @@
+import threading
+import time
+from operator import add
+
+import pytest
+
+from dask.async import CancelToken, CancelledError
+from dask.stealing import get
+from dask.context import set_options
+from dask.utils import raises
+import dask.threaded
+
+
+inc = lambda x: x + 1
+
+
+def bad(x):
+    raise ValueError('12345')
+
+
+def test_get():
+    dsk = {'x': 1, 'y': 2, 'z': (inc, 'x'), 'w': (add, 'z', 'y')}
+    assert get(dsk, 'w') == 4
+    assert get(dsk, ['w', 'z']) == (4, 2)
+    assert get(dsk, [['w'], ['x', 'y']]) == ((4,), (1, 2))
+    assert get({'x': 1}, 'x') == 1
+
+
+def test_many_tasks():
+    dsk = dict((('x', i), (inc, i)) for i in range(1000))
+    dsk.update(dict((('y', i), (add, ('x', i), ('x', (i + 1) % 1000)))
+                    for i in range(1000)))
+    dsk['total'] = (sum, [('y', i) for i in range(1000)])
+    expected = 2 * sum(range(1, 1001))
+    for i in range(20):
+        assert get(dsk, 'total', num_workers=4) == expected
+
+
+def test_errors():
+    dsk = {'x': 1, 'y': (bad, 'x'), 'z': (inc, 'y')}
+    try:
+        get(dsk, 'z')
+        assert False
+    except ValueError as e:
+        assert '12345' in str(e)
+
+
+def test_idle_workers_steal():
+    # All tasks become ready at once after 'x' and land on one deque
+    idents = set()
+
+    def work(x):
+        idents.add(threading.current_thread().ident)
+        time.sleep(0.05)
+        return x
+
+    dsk = {'x': (inc, 1)}
+    dsk.update(dict((('y', i), (work, 'x')) for i in range(8)))
+    dsk['total'] = (sum, [('y', i) for i in range(8)])
+    start = time.time()
+    assert get(dsk, 'total', num_workers=4) == 16
+    assert len(idents) > 1
+    assert time.time() - start < 0.05 * 8
+
+
+def test_callbacks():
+    log = []
+    start = lambda dsk: log.append('start')
+    pretask = lambda key, dsk, state: log.append(('pre', key))
+    posttask = lambda key, res, dsk, state, id: log.append(('post', key, res))
+    finish = lambda dsk, state, errored: log.append(('finish', errored))
+    dsk = {'x': 1, 'y': (inc, 'x'), 'z': (inc, 'y')}
+    with set_options(callbacks=[(start, pretask, posttask, finish)]):
+        assert get(dsk, 'z') == 3
+    assert log == ['start', ('pre', 'y'), ('post', 'y', 2),
+                   ('pre', 'z'), ('post', 'z', 3), ('finish', False)]
+
+    del log[:]
+    dsk = {'x': 1, 'y': (bad, 'x')}
+    assert raises(ValueError, lambda: get(dsk, 'y',
+        callbacks=[(start, pretask, posttask, finish)]))
+    assert log[-1] == ('finish', True)
+
+
+def test_threaded_get_steal():
+    dsk = {'x': 1, 'y': 2, 'z': (inc, 'x'), 'w': (add, 'z', 'y')}
+    assert dask.threaded.get(dsk, 'w', steal=True) == 4
+    with set_options(steal=True):
+        assert dask.threaded.get(dsk, ['w', 'z']) == (4, 2)
+
+
+def test_options():
+    dsk = {'x': 1, 'y': (inc, 'x')}
+    with pytest.raises(TypeError) as info:
+        get(dsk, 'y', memory_limit=1000, timeout=1)
+    assert 'memory_limit, timeout' in str(info.value)
+    with pytest.raises(TypeError):
+        dask.threaded.get(dsk, 'y', steal=True, checkpoint='/tmp/x')
+    with set_options(memory_limit=1000):
+        with pytest.raises(TypeError):
+            get(dsk, 'y')
+    # Keywords of optimizations pass through, as with get_async
+    assert get(dsk, 'y', fast_functions=set([inc]), priority=None) == 2
+    with set_options(resources={'y': {'disk': 1}}):
+        assert get(dsk, 'y') == 2
+
+
+def test_retries():
+    failures = [2]
+    log = []
+
+    def flaky(x):
+        if failures[0]:
+            failures[0] -= 1
+            raise ValueError('flaky')
+        return x + 1
+
+    def retry(key, exc, dsk, state, attempt):
+        log.append((key, attempt))
+
+    dsk = {'x': 1, 'y': (flaky, 'x'), 'z': (inc, 'y')}
+    assert get(dsk, 'z', retries=2,
+               callbacks=[(None, None, None, None, retry)]) == 3
+    assert log == [('y', 1), ('y', 2)]
+
+    failures[0] = 2
+    assert raises(ValueError, lambda: get(dsk, 'z', retries={'y': 1}))
+    failures[0] = 1
+    with set_options(retries=1):
+        assert get(dsk, 'z') == 3
+
+
+def test_exceptions():
+    dsk = {'x': 1, 'y': (bad, 'x')}
+    with pytest.raises(ValueError) as info:
+        get(dsk, 'y', raise_on_exception=True)
+    assert type(info.value) is ValueError
+    with pytest.raises(ValueError) as info:
+        get(dsk, 'y', rerun_exceptions_locally=True)
+    assert type(info.value) is ValueError
+
+
+def test_cancel():
+    token = CancelToken()
+
+    def slow(x):
+        time.sleep(0.05)
+        return x
+
+    dsk = dict((('x', i), (slow, i)) for i in range(40))
+    dsk['y'] = (sum, [('x', i) for i in range(40)])
+    cache = {'z': 1}
+    threading.Timer(0.1, token.cancel).start()
+    start = time.time()
+    with pytest.raises(CancelledError):
+        get(dsk, 'y', num_workers=2, cache=cache, cancel=token)
+    assert time.time() - start < 0.5
+    assert cache == {'z': 1}
+    assert raises(CancelledError, lambda: get({'x': (inc, 1)}, 'x',
+                                              cancel=token))
@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+from operator import add
+
+import pytest
+
+from dask.context import set_options
+from dask.multiprocessing import _free_port
+from dask.tcp import TcpPool, get, run_worker, WorkerLost
+from dask.utils import raises
+
+
+def inc(x):
+    return x + 1
+
+
+def bad(*args):
+    raise ValueError('bad')
+
+
+def test_get():
+    pool = TcpPool(2, local=True)
+    try:
+        dsk = dict((('x', i), (inc, i)) for i in range(20))
+        dsk['y'] = (sum, [('x', i) for i in range(20)])
+        dsk['z'] = (add, 'y', ('x', 0))
+        assert get(dsk, 'z', pool=pool) == 211
+        assert get(dsk, ['z', ('x', 3)], pool=pool) == (211, 4)
+        with set_options(pool=pool):
+            assert get(dsk, 'y') == 210
+            assert get(dsk, 'y', resident=False) == 210
+
+        # Tasks run on the workers
+        dsk = dict((('pid', i), (os.getpid,)) for i in range(10))
+        pids = get(dsk, list(dsk), pool=pool)
+        assert os.getpid() not in pids
+        assert pool.addresses[0] != pool.addresses[1]
+
+        assert raises(ValueError, lambda: get({'x': (bad, 1)}, 'x',
+                                              pool=pool))
+        assert get({'x': (inc, 1)}, 'x', pool=pool) == 2
+    finally:
+        pool.close()
+    assert not any(p.is_alive() for p in pool.processes)
+    assert raises(ValueError, lambda: get({'x': (inc, 1)}, 'x'))
+
+
+def test_remote_worker():
+    # A worker started on its own, as on another machine, before the
+    # scheduler listens
+    port = _free_port()
+    proc = multiprocessing.Process(target=run_worker,
+                                   args=(('localhost', port), b'secret'))
+    proc.start()
+    pool = TcpPool(1, address=('localhost', port), authkey='secret')
+    try:
+        assert get({'x': 1, 'y': (inc, 'x')}, 'y', pool=pool) == 2
+    finally:
+        pool.close()
+    proc.join(5)
+    assert not proc.is_alive()
+
+
+def test_worker_lost():
+    pool = TcpPool(2, local=True)
+    try:
+        pool.processes[0].terminate()
+        dsk = dict((('x', i), (inc, i)) for i in range(10))
+        with pytest.raises(WorkerLost):
+            get(dsk, list(dsk), pool=pool)
+    finally:
+        pool.terminate()
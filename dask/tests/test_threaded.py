@@ -1,5 +1,8 @@
+import threading
+import time
+
 from dask.threaded import get
-from dask.async import inc
+from dask.async import inc, TaskTimeoutError, CancelToken, CancelledError
 from dask.utils import raises
 from operator import add
 from dask.context import set_options
@@ -37,3 +40,105 @@ def test_reuse_pool():
     with set_options(pool=pool):
         assert get({'x': (inc, 1)}, 'x') == 2
         assert get({'x': (inc, 1)}, 'x') == 2
+
+
+class Flaky(object):
+    """ Fails the first ``n`` calls """
+    def __init__(self, n):
+        self.n = n
+        self.lock = threading.Lock()
+
+    def __call__(self, x):
+        with self.lock:
+            self.n -= 1
+            if self.n >= 0:
+                raise IOError("transient")
+        return x + 1
+
+
+def test_retries():
+    log = []
+    retry = lambda key, exc, dsk, state, attempt: log.append((key, attempt))
+    dsk = {'x': 1, 'y': (Flaky(2), 'x'), 'z': (inc, 'y')}
+    assert get(dsk, 'z', retries=2, callbacks=[(None, None, None, None, retry)]) == 3
+    assert log == [('y', 1), ('y', 2)]
+
+    dsk = {'x': 1, 'y': (Flaky(3), 'x'), 'z': (inc, 'y')}
+    assert raises(IOError, lambda: get(dsk, 'z', retries=2))
+
+    dsk = {'x': 1, 'y': (Flaky(1), 'x'), 'z': (Flaky(1), 'y')}
+    assert raises(IOError, lambda: get(dsk, 'z', retries={'y': 1}))
+    dsk = {'x': 1, 'y': (Flaky(1), 'x'), 'z': (Flaky(1), 'y')}
+    with set_options(retries={'y': 1, 'z': 1}):
+        assert get(dsk, 'z') == 3
+
+
+class SlowOnce(object):
+    """ Sleeps for a long time on the first call """
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, x):
+        with self.lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            time.sleep(2)
+        return x
+
+
+def test_timeout():
+    dsk = {'x': (SlowOnce(), 1), 'y': (inc, 'x')}
+    start = time.time()
+    with set_options(pool=ThreadPool(2)):
+        assert get(dsk, 'y', timeout=0.2, retries=1) == 2
+    assert time.time() - start < 1.5
+
+    dsk = {'x': (SlowOnce(), 1), 'y': (inc, 'x')}
+    assert raises(TaskTimeoutError, lambda: get(dsk, 'y', timeout=0.2))
+
+
+def test_speculative():
+    slow = SlowOnce()
+    dsk = dict((('x', i), (time.sleep, 0.02)) for i in range(6))
+    dsk[('x', 6)] = (slow, None)
+    dsk['total'] = (len, [('x', i) for i in range(7)])
+    start = time.time()
+    with set_options(pool=ThreadPool(4)):
+        assert get(dsk, 'total', speculative=3) == 7
+    assert time.time() - start < 1.5
+    assert slow.calls == 2
+
+
+class Counter(object):
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self, *args):
+        time.sleep(0.05)
+        self.n += 1
+
+
+def test_cancel():
+    counter = Counter()
+    dsk = dict((('x', i), (counter, i)) for i in range(40))
+    dsk['y'] = (len, [('x', i) for i in range(40)])
+    cache = {'z': 1}
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    start = time.time()
+    with set_options(pool=ThreadPool(2)):
+        assert raises(CancelledError, lambda: get(dsk, 'y', cache=cache,
+                                                  cancel=token))
+    assert time.time() - start < 0.5
+    assert cache == {'z': 1}    # intermediate results are released
+    time.sleep(0.2)
+    n = counter.n
+    assert n < 20
+    time.sleep(0.2)
+    assert counter.n == n       # queued tasks do not run
+
+    # A cancelled token cancels right away
+    assert raises(CancelledError, lambda: get(dsk, 'y', cancel=token))
+    assert counter.n == n
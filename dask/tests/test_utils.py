@@ -4,7 +4,8 @@ from itertools import product
 import numpy as np
 
 from dask.utils import (textblock, filetext, takes_multiple_arguments,
-                        Dispatch, tmpfile, next_linesep, different_seeds)
+                        Dispatch, tmpfile, next_linesep, different_seeds,
+                        key_split)
 
 
 def test_textblock():
@@ -55,6 +56,7 @@ def test_dispatch():
     assert foo(1.0) == 0.0
     assert foo(b) == b
     assert foo((1, 2.0, b)) == (2, 1.0, b)
+    assert foo.dispatch(Bar) is foo.dispatch(object)
 
 
 def test_nextlinesep():
@@ -132,3 +134,13 @@ def test_different_seeds():
     # Should be sorted
     smallseeds = different_seeds(10, 1234)
     assert smallseeds == sorted(smallseeds)
+
+
+def test_key_split():
+    assert key_split('x') == 'x'
+    assert key_split('x-1') == 'x'
+    assert key_split(('x-2', 1)) == 'x'
+    assert key_split('hello-world-1') == 'hello-world'
+    assert key_split(('sum-aa0b6b5e3d3ec8b3c5f0ae39c72cc2d0', 0)) == 'sum'
+    assert key_split('x_1') == 'x'
+    assert key_split(1) == '1'
@@ -19,7 +19,7 @@ def _thread_get_id():
     return current_thread().ident
 
 
-def get(dsk, result, cache=None, num_workers=None, **kwargs):
+def get(dsk, result, cache=None, num_workers=None, steal=None, **kwargs):
     """ Threaded cached implementation of dask.get
 
     Parameters
@@ -33,6 +33,10 @@ def get(dsk, result, cache=None, num_workers=None, **kwargs):
         The number of threads to use in the ThreadPool that will actually execute tasks
     cache: dict-like (optional)
         Temporary storage of results
+    steal: bool (optional)
+        Use worker threads that schedule their own work and steal tasks from
+        each other rather than a central scheduler thread.  See
+        ``dask.stealing``.  (False by default)
 
     Examples
     --------
@@ -43,6 +47,13 @@ def get(dsk, result, cache=None, num_workers=None, **kwargs):
     >>> get(dsk, ['w', 'y'])
     (4, 2)
     """
+    if steal is None:
+        steal = _globals.get('steal', False)
+    if steal:
+        from .stealing import get as get_stealing
+        return get_stealing(dsk, result, cache=cache, num_workers=num_workers,
+                            **kwargs)
+
     pool = _globals['pool']
 
     if pool is None:
@@ -57,3 +68,5 @@ def get(dsk, result, cache=None, num_workers=None, **kwargs):
                         **kwargs)
 
     return results
+
+get._takes_analysis = True  # see dask.base._scheduler_kwargs
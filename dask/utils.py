@@ -415,19 +415,25 @@ class Dispatch(object):
         else:
             self._lookup[type] = func
 
-    def __call__(self, arg):
-        # We dispatch first on type(arg), and fall back to iterating through
-        # the mro. This is significantly faster in the common case where
-        # type(arg) is in the lookup, with only a small penalty on fall back.
+    def dispatch(self, typ):
+        """Function registered for ``typ`` or the nearest of its bases"""
+        # We dispatch first on typ, and fall back to iterating through the
+        # mro. This is significantly faster in the common case where typ is
+        # in the lookup, with only a small penalty on fall back.
         lk = self._lookup
-        typ = type(arg)
         if typ in lk:
-            return lk[typ](arg)
+            return lk[typ]
         for cls in inspect.getmro(typ)[1:]:
             if cls in lk:
-                return lk[cls](arg)
+                return lk[cls]
         raise TypeError("No dispatch for {0} type".format(typ))
 
+    def __call__(self, arg):
+        typ = type(arg)
+        if typ in self._lookup:
+            return self._lookup[typ](arg)
+        return self.dispatch(typ)(arg)
+
 
 def ensure_not_exists(filename):
     """
@@ -500,6 +506,38 @@ def derived_from(original_klass, version=None, ua_args=[]):
     return wrapper
 
 
+def key_split(s):
+    """ The name of a key without its index and token
+
+    >>> key_split('x')
+    'x'
+    >>> key_split('x-1')
+    'x'
+    >>> key_split(('x-2', 1))
+    'x'
+    >>> key_split('hello-world-1')
+    'hello-world'
+    >>> key_split(('add-b9d5ed1e3bbc4ac43dcf41c2dd1f13b5', 0, 1))
+    'add'
+    >>> key_split('wrapped_3')
+    'wrapped'
+    """
+    if isinstance(s, tuple):
+        s = s[0] if s else ''
+    if not isinstance(s, (str, unicode)):
+        return str(s)
+    words = s.split('-')
+    while len(words) > 1 and (words[-1].isdigit() or
+                              (len(words[-1]) == 32 and
+                               all(c in '0123456789abcdef' for c in words[-1]))):
+        words.pop()
+    name = '-'.join(words)
+    head, _, tail = name.rpartition('_')
+    if head and tail.isdigit():
+        name = head
+    return name
+
+
 def funcname(func):
     """Get the name of a function."""
     while hasattr(func, 'func'):